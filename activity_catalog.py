@@ -0,0 +1,86 @@
+# activity_catalog.py
+#
+# Immutable, array-backed copy of the Activity table for /activities/random.
+#
+# The catalog is loaded once, each activity is serialized to JSON once, and a
+# request just samples indices and joins the pre-encoded fragments. A cheap
+# version probe (row count, max id and max updated_at, so inserts, deletes
+# and in-place edits all count) runs at most every `check_interval` seconds
+# and triggers a reload only when the table actually changed.
+
+import json
+import random
+import threading
+import time
+
+
+def encode(item):
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class _Snapshot:
+    __slots__ = ("version", "items", "encoded")
+
+    def __init__(self, version, items):
+        self.version = version
+        self.items = tuple(items)
+        self.encoded = tuple(encode(it) for it in self.items)
+
+
+class ActivityCatalog:
+    """Shared activity list with O(k) random sampling and pre-serialized JSON.
+
+    `loader()` returns a list of activity dicts and `version()` a hashable
+    value that changes whenever the underlying rows change.
+    """
+
+    def __init__(self, loader, version, fallback=None, check_interval=60):
+        self.loader = loader
+        self.version = version
+        self.fallback = fallback
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, version):
+        items = self.loader()
+        if not items and self.fallback is not None:
+            items = self.fallback()
+        return _Snapshot(version, items)
+
+    def snapshot(self):
+        now = time.monotonic()
+        snap = self._snapshot
+        if snap is not None and now - self._checked_at < self.check_interval:
+            return snap
+        with self._lock:
+            snap = self._snapshot
+            if snap is not None and now - self._checked_at < self.check_interval:
+                return snap
+            version = self.version()
+            if snap is None or snap.version != version:
+                snap = self._load(version)
+                self._snapshot = snap
+            self._checked_at = now
+        return snap
+
+    def refresh(self):
+        """Forces a reload on the next access (e.g. after seeding new activities)."""
+        self._checked_at = 0.0
+        self._snapshot = None
+
+    def __len__(self):
+        return len(self.snapshot().items)
+
+    def sample(self, count):
+        snap = self.snapshot()
+        n = len(snap.items)
+        return [snap.items[i] for i in random.sample(range(n), min(max(count, 0), n))]
+
+    def sample_json(self, count):
+        """Returns a JSON array (bytes) of `count` random activities."""
+        snap = self.snapshot()
+        n = len(snap.encoded)
+        picks = random.sample(range(n), min(max(count, 0), n))
+        return b"[" + b",".join(snap.encoded[i] for i in picks) + b"]"
@@ -0,0 +1,261 @@
+# affirmation_pool.py
+#
+# Per-user pool of pre-generated affirmations for /affirmation.
+#
+# One model call returns a batch of affirmations; clicks are served from
+# memory and the pool is topped up in a background thread when it runs low.
+# Entries expire after `ttl` seconds and are dropped with invalidate() when
+# the user's lifestyle or category selections change. Fills of one entry are
+# coalesced (single_flight.py): concurrent requests on a cold pool share one
+# model call, and a sync take() that finds the background refill running
+# waits for it instead of starting another.
+#
+# Expired entries are kept for a grace period so their dedupe history
+# survives a refresh; entries idle for longer than ttl + grace are dropped,
+# and the least recently used ones go once there are more than max_entries.
+
+import logging
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def build_batch_prompt(prompt, count):
+    """Turns the single-affirmation prompt into one asking for `count` of them."""
+    prompt = prompt.replace("Generate ONE short", f"Generate {count} different short")
+    prompt = prompt.replace("Return just the affirmation text.",
+                            "Return one affirmation per line, with no numbering.")
+    return prompt
+
+
+def parse_batch(text):
+    """Splits a batch reply into clean affirmation lines."""
+    items = []
+    for line in text.splitlines():
+        line = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip().strip('"“”').strip()
+        if line:
+            items.append(line)
+    return items
+
+
+def normalize(text):
+    return re.sub(r"[^a-z0-9 ]", "", text.lower()).strip()
+
+
+class _Entry:
+    def __init__(self, prompt, seen_limit):
+        self.prompt = prompt
+        self.items = deque()
+        self.seen = set()
+        self.seen_order = deque(maxlen=seen_limit)
+        self.served = deque(maxlen=20)
+        self.created = time.monotonic()
+        self.touched = self.created
+        self.refilling = False
+        self.lock = threading.Lock()
+
+    def remember(self, key):
+        # bounded memory of what this user has already been given
+        if len(self.seen_order) == self.seen_order.maxlen:
+            self.seen.discard(self.seen_order[0])
+        self.seen_order.append(key)
+        self.seen.add(key)
+
+
+class AffirmationPool:
+    """Serves affirmations from memory, refilling per user in batches.
+
+    `generate(prompt) -> str` performs the model call and returns the raw text.
+    """
+
+    def __init__(self, generate, batch_size=5, low_water=2, ttl=6 * 3600,
+                 seen_limit=200, workers=2, max_entries=5000, grace=None):
+        self.generate = generate
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.ttl = ttl
+        self.seen_limit = seen_limit
+        self.max_entries = max_entries
+        self.grace = ttl if grace is None else grace
+        self._entries = OrderedDict()  # key -> _Entry, least recently used first
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="affirmation-pool")
+
+    def _live(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created <= self.ttl:
+                self._touch(key, entry, now)
+                return entry
+        return None
+
+    def _touch(self, key, entry, now):
+        # caller holds self._lock
+        entry.touched = now
+        self._entries.move_to_end(key)
+
+    def _prune(self, now):
+        # caller holds self._lock; idle entries are at the front
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - entry.touched <= self.ttl + self.grace:
+                break
+            del self._entries[key]
+
+    def _entry(self, key, load_prompt):
+        entry = self._live(key)
+        if entry is not None:
+            return entry
+        return self._new_entry(key, load_prompt())
+
+    def _new_entry(self, key, prompt):
+        if prompt is None:
+            return None
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None and time.monotonic() - old.created <= self.ttl:
+                return old  # a concurrent request got here first; share its entry (and its fill)
+            entry = _Entry(prompt, self.seen_limit)
+            if old is not None:
+                # keep dedup history across expiry so repeats stay filtered
+                entry.seen, entry.seen_order = old.seen, old.seen_order
+                entry.served = old.served
+            self._entries[key] = entry
+            self._touch(key, entry, entry.created)
+            self._prune(entry.created)
+        return entry
+
+    def _fill(self, entry):
+        # keyed by the entry itself: an invalidated entry's fill is not shared with its replacement
+        return self._flights.do(entry, lambda: self._add(
+            entry, self.generate(build_batch_prompt(entry.prompt, self.batch_size))))
+
+    async def _afill(self, entry, agenerate):
+        async def fill():
+            return self._add(entry, await agenerate(build_batch_prompt(entry.prompt, self.batch_size)))
+        return await self._flights.ado(entry, fill)
+
+    def _add(self, entry, raw):
+        added = 0
+        with entry.lock:
+            for text in parse_batch(raw):
+                key = normalize(text)
+                if not key or key in entry.seen:
+                    continue
+                entry.remember(key)
+                entry.items.append(text)
+                added += 1
+        return added
+
+    def _background_fill(self, entry):
+        try:
+            self._fill(entry)
+        except Exception:
+            logger.exception("Affirmation pool refill failed")
+        finally:
+            entry.refilling = False
+
+    def take(self, key, load_prompt):
+        """Returns a fresh affirmation for `key`, or None if no prompt can be built.
+
+        `load_prompt()` is only called when the user has no live pool entry.
+        """
+        entry = self._entry(key, load_prompt)
+        if entry is None:
+            return None
+
+        text = self._pop(entry)
+        if text is None:
+            # cold pool: fill synchronously (one model call for the whole batch)
+            self._fill(entry)
+            text = self._pop(entry)
+        return self._served(entry, text)
+
+    async def atake(self, key, load_prompt, agenerate):
+        """Async take(): `load_prompt()` and `agenerate(prompt)` are coroutine functions.
+
+        Only a cold pool awaits the model; background refills still run on the
+        pool's threads with the sync `generate`.
+        """
+        entry = self._live(key) or self._new_entry(key, await load_prompt())
+        if entry is None:
+            return None
+
+        text = self._pop(entry)
+        if text is None:
+            await self._afill(entry, agenerate)
+            text = self._pop(entry)
+        return self._served(entry, text)
+
+    def take_nowait(self, key, load_prompt):
+        """take() that never waits for the model: None while the pool is cold (it refills in the background)."""
+        entry = self._entry(key, load_prompt)
+        if entry is None:
+            return None
+        return self._served(entry, self._pop(entry))
+
+    def pop(self, key):
+        """A pooled affirmation for `key` if one is ready, else None; never builds an entry or calls the model itself."""
+        entry = self._live(key)
+        if entry is None:
+            return None
+        return self._served(entry, self._pop(entry))
+
+    def _pop(self, entry):
+        with entry.lock:
+            return entry.items.popleft() if entry.items else None
+
+    def _served(self, entry, text):
+        with entry.lock:
+            low = len(entry.items) < self.low_water and not entry.refilling
+            if low:
+                entry.refilling = True
+            if text is not None:
+                entry.served.append(text)
+        if low:
+            self._executor.submit(self._background_fill, entry)
+        return text
+
+    def recent(self, key):
+        """Returns one previously served affirmation for `key` (used when the model is down)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        with entry.lock:
+            served = list(entry.served)
+        return random.choice(served) if served else None
+
+    def invalidate(self, key):
+        """Drops the pooled affirmations for `key` (its prompt inputs changed)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.created = float("-inf")
+                with entry.lock:
+                    entry.items.clear()
+
+    def size(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return 0
+        with entry.lock:
+            return len(entry.items)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def coalesced(self):
+        """How many requests were served by another request's fill."""
+        return self._flights.shared
@@ -1,160 +1,259 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
-from flask_sqlalchemy import SQLAlchemy
-import bcrypt
+#
+# Flask app factory + routes. Importing this module is cheap: the Gemini SDK
+# is only imported on the first chat/affirmation call (llm_gateway.py), and
+# the schema/activity catalog are set up by `flask --app app init-db` (or
+# AUTO_MIGRATE=1) instead of on every import.
+
+import click
+from flask import (Blueprint, Flask, render_template, request, redirect, url_for, session, jsonify,
+                   Response, stream_with_context, current_app)
+from flask.cli import with_appcontext
+from sqlalchemy.orm import joinedload
+from werkzeug.local import LocalProxy
 import json
+import math
 import os
-from datetime import datetime, date, timedelta
+from datetime import datetime, timedelta
 from categories_data import categories
-import google.generativeai as genai
-from dotenv import load_dotenv
+from config import Config
+from models import (db, passwords, Userdb, Activity, UserActivityCompletion, Lifestyle, UserCategorySelection,
+                    ChatHistory, WebSession, RateLimitBucket, Job, LifestyleSnapshot, TrendRollup)
+from chat_store import create_chat_store, serialize_history
+from chat_history import HistoryWindow, extractive_summary, history_tokens, estimate_tokens
+from affirmation_pool import AffirmationPool
+from llm_gateway import create_gateway, LLMUnavailable
+from user_context import UserContextCache
+from migrations import run_migrations
+from db_utils import insert_ignore, engine_options, apply_sqlite_pragmas, sqlite_pragmas
+from activity_catalog import ActivityCatalog
+from recommender import Recommender
+from password_hashing import HasherBusy
+from streaks import StreakService
+from trends import TrendService, category_names
+from catalog_sync import sync_activities, watch as watch_file
+from session_store import ServerSideSessionInterface, SessionSweeper, create_session_store, load_secret_key
+from page_cache import PageCache, init_bytecode_cache, precompile
+from assets import AssetBuilder, Assets, CRITICAL_BUDGET
+from metrics import REGISTRY, Instrumentation
+from rate_limit import create_rate_limiter
+from jobs import JobQueue, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, TASKS, UnknownTask, run_workers, task
 import random
 
-# Load environment variables
-load_dotenv()
+ACTIVITIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'data', 'activities.json')
 
+bp = Blueprint('main', __name__)
 
 
-# Table for User registration...
-app = Flask(__name__)
-# Use a persistent secret in production; for dev this is fine
-app.secret_key = os.urandom(24)
+class Services:
+    """Per-app service objects, built once in create_app()."""
 
-# Database Configurations
-app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///Database.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-
-# ---------------------------
-# MODELS
-# ---------------------------
-
-class Userdb(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    firstName = db.Column(db.String(50), nullable=False)
-    lastName = db.Column(db.String(50), nullable=False)
-    email = db.Column(db.String(50), nullable=False, unique=True)
-    phone = db.Column(db.String(15), nullable=False)
-    password = db.Column(db.String(128), nullable=False)  # hashed password
-    gender = db.Column(db.String(7), nullable=False)
-    birthDate = db.Column(db.Date, nullable=False)
-    eduLevel = db.Column(db.String(30), nullable=False)
-    fieldOfStudy = db.Column(db.String(30), nullable=False)
-
-    # Activity streak fields
-    activity_streak = db.Column(db.Integer, default=0)
-    last_activity_date = db.Column(db.Date, nullable=True)
-
-    # initializer and password check
-    def __init__(self, firstName, lastName, email, phone, password, gender, birthDate, eduLevel, fieldOfStudy):
-        self.firstName = firstName
-        self.lastName = lastName
-        self.email = email
-        self.phone = phone
-        # store hashed password as utf-8 string
-        # store hashed password
-        self.password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        self.gender = gender
-        self.birthDate = birthDate
-        self.eduLevel = eduLevel
-        self.fieldOfStudy = fieldOfStudy
-
-    def check_password(self, password):
-        return bcrypt.checkpw(password.encode('utf-8'), self.password.encode('utf-8'))
-
-# Table for lifestyle data...
-
-class Activity(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text, nullable=True)
-    est_time = db.Column(db.String(50), nullable=True)   # e.g. "2-5 min"
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-
-class UserActivityCompletion(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('userdb.id'), nullable=False)
-    activity_id = db.Column(db.Integer, db.ForeignKey('activity.id'), nullable=False)
-    completed_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    user = db.relationship('Userdb', backref='completions')
-    activity = db.relationship('Activity')
-
-
-# If the rest of your app expects 'Lifestyle', reintroduce it (original file had it commented).
-class Lifestyle(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('userdb.id'), nullable=False, unique=True)
-    diet = db.Column(db.String(50), nullable=False)
-    physicalActivity = db.Column(db.String(50), nullable=False)
-    socialInteraction = db.Column(db.String(50), nullable=False)
-    relaxHabit = db.Column(db.String(50), nullable=False)
-    screenTime = db.Column(db.Integer, nullable=False)
-    stressLevel = db.Column(db.Integer, nullable=False)
-    sleepHrs = db.Column(db.Integer, nullable=False)
-
-    user = db.relationship("Userdb", backref="lifestyle")
-
-
-class UserCategorySelection(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('userdb.id'), nullable=False)
-    category = db.Column(db.String(50), nullable=False)
-    subcategory = db.Column(db.String(100), nullable=False)
-    description = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    user = db.relationship("Userdb", backref="category_selections")
-
-
-# ---------------------------
-# CREATE TABLES & SEED ACTIVITIES
-# ---------------------------
-with app.app_context():
-    # ensure instance folder exists
-    instance_dir = os.path.join(app.root_path, 'instance')
-    os.makedirs(instance_dir, exist_ok=True)
-
-    # create DB tables
-    db.create_all()
-
-# --- Gemini API Configuration ---
-    # seed activities from static/data/activities.json if empty
+    def __init__(self, config):
+        self.llm = create_gateway(config)
+        self.user_context = UserContextCache(load_user_rows, ttl=config['USER_CONTEXT_TTL'])
+        self.chat_store = create_chat_store(config, db=db, model=ChatHistory)
+        self.history_window = HistoryWindow(
+            token_budget=config['CHAT_TOKEN_BUDGET'],
+            keep_turns=config['CHAT_KEEP_TURNS'],
+            summarizer=summarize_turns,
+        )
+        self.affirmation_pool = AffirmationPool(
+            self.llm.generate,
+            batch_size=config['AFFIRMATION_BATCH_SIZE'],
+            ttl=config['AFFIRMATION_POOL_TTL'],
+            max_entries=config['AFFIRMATION_POOL_MAX_ENTRIES'],
+        )
+        self.activity_catalog = ActivityCatalog(load_activity_rows, activity_table_version,
+                                                fallback=load_activity_file)
+        self.recommender = Recommender(self.activity_catalog,
+                                       max_users=config['RECOMMENDER_MAX_USERS'],
+                                       ttl=config['RECOMMENDER_TTL'])
+        self.streaks = StreakService(db, Userdb, UserActivityCompletion)
+        self.trends = TrendService(db, TrendRollup, LifestyleSnapshot, UserActivityCompletion, UserCategorySelection,
+                                   days=config['TRENDS_DAYS'], weeks=config['TRENDS_WEEKS'])
+        self.session_store = create_session_store(config, db=db, model=WebSession)
+        self.session_sweeper = SessionSweeper(self.session_store, interval=config['SESSION_SWEEP_INTERVAL'])
+        self.rate_limiter = create_rate_limiter(config, db=db, model=RateLimitBucket)
+        # the generic sweeper also reaps refilled bucket rows (a missing row is a full bucket)
+        self.bucket_sweeper = SessionSweeper(self.rate_limiter.store, interval=config['SESSION_SWEEP_INTERVAL'])
+        # ...and idle conversations (SQL rows otherwise stay until that user comes back)
+        self.chat_sweeper = SessionSweeper(self.chat_store, interval=config['SESSION_SWEEP_INTERVAL'])
+        self.jobs = JobQueue(db, Job, lease=config['JOBS_LEASE'], retry_delay=config['JOBS_RETRY_DELAY'],
+                             retention=config['JOBS_RETENTION'])
+        self.page_cache = PageCache()
+
+
+def register_gauges(services):
+    """Exposes the services' own counters on /metrics (read at scrape time)."""
+    REGISTRY.gauge("password_queue_depth", "bcrypt calls queued or running.",
+                   lambda: passwords.stats()["queue_depth"])
+    REGISTRY.gauge("password_rejected", "bcrypt calls rejected because the queue was full.",
+                   lambda: passwords.stats()["rejected"])
+    REGISTRY.gauge("password_failed", "bcrypt calls that timed out or lost their pool worker.",
+                   lambda: passwords.stats()["failed"])
+    REGISTRY.gauge("llm_circuit_open", "1 while the LLM circuit breaker is open.",
+                   lambda: int(services.llm.breaker.state == "open"))
+    REGISTRY.gauge("page_cache_lookups", "Page cache lookups by result.",
+                   lambda: {(k,): v for k, v in services.page_cache.stats().items() if k != "entries"},
+                   labels=("result",))
+    REGISTRY.gauge("chat_store_lookups", "Chat history store lookups by result.",
+                   lambda: {(k,): v for k, v in services.chat_store.stats_dict().items() if k in ("hits", "misses")},
+                   labels=("result",))
+    REGISTRY.gauge("chat_store_evictions", "Chat histories evicted (idle, over the size cap or purged).",
+                   lambda: services.chat_store.stats_dict()["evictions"])
+    REGISTRY.gauge("chat_store_resident_bytes", "Bytes of chat history held by the store.",
+                   lambda: services.chat_store.stats_dict()["resident_bytes"])
+    REGISTRY.gauge("llm_rate_limit_decisions", "Rate limiter decisions for model-backed routes.",
+                   lambda: {(k,): v for k, v in services.rate_limiter.stats().items()},
+                   labels=("result",))
+    REGISTRY.gauge("affirmation_coalesced", "Affirmation requests served by another request's model call.",
+                   services.affirmation_pool.coalesced)
+    REGISTRY.gauge("affirmation_pool_entries", "Users with an affirmation pool entry in memory.",
+                   lambda: len(services.affirmation_pool))
+    REGISTRY.gauge("recommender_users", "Users with cached activity scores.",
+                   lambda: len(services.recommender))
+    REGISTRY.gauge("jobs", "Background jobs by status.",
+                   lambda: {(k,): v for k, v in services.jobs.stats()["depth"].items()}, labels=("status",))
+    REGISTRY.gauge("jobs_oldest_queued_seconds", "Age of the oldest job waiting for a worker.",
+                   lambda: services.jobs.stats()["oldest_queued_seconds"])
+    REGISTRY.gauge("job_latency_seconds", "Queue wait and run time of jobs finished in the last 15 minutes.",
+                   lambda: {(stage, {"p50": "0.5", "p95": "0.95"}[q]): v
+                            for stage, qs in services.jobs.stats()["latency"].items()
+                            for q, v in qs.items() if v is not None},
+                   labels=("stage", "quantile"))
+
+
+def _service(name):
+    return LocalProxy(lambda: getattr(current_app.extensions['mannkibaat'], name))
+
+
+# the current app's services, usable from routes and helpers
+llm = _service('llm')
+user_context = _service('user_context')
+chat_store = _service('chat_store')
+history_window = _service('history_window')
+affirmation_pool = _service('affirmation_pool')
+activity_catalog = _service('activity_catalog')
+recommender = _service('recommender')
+streaks = _service('streaks')
+trends = _service('trends')
+page_cache = _service('page_cache')
+rate_limiter = _service('rate_limiter')
+jobs = _service('jobs')
+
+
+def migrate():
+    """Applies pending migrations plus the data steps some of them need; returns the versions applied.
+
+    The one path for init-db, migrate and AUTO_MIGRATE.
+    """
+    os.makedirs(current_app.instance_path, exist_ok=True)
+    applied = run_migrations(db)
+
+    # migration 9 added the trend tables: build their totals from the history there is
+    if 9 in applied:
+        current_app.logger.info("Backfilled trends: %s", trends.backfill())
+    return applied
+
+
+def init_db():
+    """Creates/upgrades the schema and syncs the activity catalog."""
+    # create / upgrade DB tables
+    applied = migrate()
+
+    # sync activities from static/data/activities.json (skips unchanged rows)
     try:
-        if Activity.query.count() == 0:
-            data_path = os.path.join(app.root_path, 'static', 'data', 'activities.json')
-            if os.path.exists(data_path):
-                with open(data_path, 'r', encoding='utf-8') as f:
-                    items = json.load(f)
-                for it in items:
-                    a = Activity(title=it.get('title', '')[:200],
-                                 description=it.get('description', ''),
-                                 est_time=it.get('est_time', ''))
-                    db.session.add(a)
-                db.session.commit()
-                print(f"Seeded {len(items)} activities into the database.")
+        result = sync_activities(db, Activity, ACTIVITIES_PATH)
+        if result['inserted'] or result['updated']:
+            current_app.logger.info("Synced activities: %s", result)
+            activity_catalog.refresh()
     except Exception as e:
-        # if the DB file existed but table not created, this will surface — helpful while debugging
-        print("Seeding error (non-fatal):", e)
-
-
-# ---------------------------
-# Gemini / Google AI configuration
-# ---------------------------
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    # keep failing early so developer knows to set the key (but if you want to run without chat, you can comment this out)
-    raise ValueError("API key not found. Please set the GOOGLE_API_KEY environment variable.")
-genai.configure(api_key=API_KEY)
-
-# --- Chat Session Management ---
-# In-memory chat sessions (lost on restart)
+        current_app.logger.warning("Activity sync error (non-fatal): %s", e)
+    return applied
+
+
+def create_app(config=None):
+    """Builds the Flask app; `config` (a dict) overrides values from config.Config."""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if config:
+        app.config.update(config)
+    init_bytecode_cache(app)
+    Assets(app)
+    Instrumentation(app)  # first, so its before_request hook sees every request
+    # stable across restarts and workers, so sessions survive both
+    app.secret_key = load_secret_key(app.instance_path, app.config['SECRET_KEY'])
+
+    # explicit SQLALCHEMY_ENGINE_OPTIONS entries win over the profile
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(app.config),
+                                               **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, sqlite_pragmas(app.config))
+    passwords.init_app(app)
+    services = app.extensions['mannkibaat'] = Services(app.config)
+    app.extensions['jobs'] = services.jobs
+    register_gauges(services)
+    app.session_interface = ServerSideSessionInterface(services.session_store, ttl=app.config['SESSION_TTL'])
+    app.before_request(lambda: services.session_sweeper.start(app))
+    app.before_request(lambda: services.bucket_sweeper.start(app))
+    app.before_request(lambda: services.chat_sweeper.start(app))
+    app.register_blueprint(bp)
+    for command in (init_db_command, migrate_command, sync_activities_command, rebuild_streaks_command,
+                    backfill_trends_command, purge_sessions_command, build_assets_command, worker_command,
+                    enqueue_command, jobs_command):
+        app.cli.add_command(command)
+
+    if app.config['TEMPLATE_PRECOMPILE']:
+        precompile(app)
+
+    if app.config['AUTO_MIGRATE']:
+        with app.app_context():
+            init_db()
+    return app
+
+
+# Replies used while the model is unavailable (circuit open, timeouts, overload)
+FALLBACK_CHAT_REPLY = (
+    "Sorry yaar, abhi mera dimaag thoda slow chal raha hai. "
+    "Thodi der mein phir se message karo, main yahin hoon. 💛"
+)
+FALLBACK_AFFIRMATIONS = [
+    "You are doing better than you think, one step at a time.",
+    "Your feelings are valid, and you are stronger than this moment.",
+    "Small steps every day add up to big changes.",
+]
 
 # ---------------------------
-# Chat session storage (in-memory)
+# Loaders used by the services
 # ---------------------------
-chat_sessions = {}
+def load_user_rows(email):
+    """Loads a user with their lifestyle and category selections in one joined query."""
+    user = (Userdb.query
+            .options(joinedload(Userdb.lifestyle), joinedload(Userdb.category_selections))
+            .filter_by(email=email)
+            .first())
+    if user is None:
+        return None
+    lifestyle = user.lifestyle[0] if user.lifestyle else None
+    return user, lifestyle, user.category_selections
+
+
+def summarize_turns(previous_summary, turns):
+    """Folds older chat turns into the rolling summary (falls back to an extractive one)."""
+    transcript = "\n".join(
+        f"{'Student' if t['role'] == 'user' else 'Dost'}: {' '.join(t['parts'])}" for t in turns
+    )
+    prompt = (
+        "Summarize this conversation between a student and the wellness chatbot Dost "
+        "in at most 5 short bullet points. Keep names, feelings and any advice given.\n\n"
+        f"Earlier summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+    )
+    try:
+        return llm.generate(prompt).strip()
+    except Exception as e:
+        current_app.logger.warning("Chat summary failed, using extractive summary: %s", e)
+        return extractive_summary(previous_summary, turns)
 
 
 def create_initial_prompt(user, lifestyle, categories_list):
@@ -181,96 +280,181 @@ def create_initial_prompt(user, lifestyle, categories_list):
     return prompt
 
 
+def sse_event(data, event=None):
+    """Formats one Server-Sent Event carrying a JSON payload."""
+    msg = f"event: {event}\n" if event else ""
+    return msg + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events):
+    return Response(stream_with_context(events), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+RATE_LIMIT_MSG = "You're going a little fast. Please wait a few seconds and try again."
+
+
+def rate_limit_payload(decision):
+    return {"error": RATE_LIMIT_MSG, "retry_after": decision.retry_after}
+
+
+def over_limit(email):
+    """A 429 response when `email` has used up its model-call budget, else None."""
+    decision = rate_limiter.hit(email)
+    if decision.allowed:
+        return None
+    return jsonify(rate_limit_payload(decision)), 429, {"Retry-After": str(decision.retry_after)}
+
+
+
 # ---------------------------
 # ROUTES
 # ---------------------------
 
-    try:
-        # Retrieve or create a chat session for the current user
-        if email not in chat_sessions:
-            # Fetch user data to create a personalized context for the first time
-            user = Userdb.query.filter_by(email=email).first()
-            lifestyle = Lifestyle.query.filter_by(user_id=user.id).first()
-            categories_sel = UserCategorySelection.query.filter_by(user_id=user.id).all()
-
-            if not all([user, lifestyle]):
-                return jsonify({"error": "Could not retrieve user data to personalize chat."}), 500
-
-            initial_prompt = create_initial_prompt(user, lifestyle, categories_sel)
-            model = genai.GenerativeModel('gemini-1.5-flash')
-
-            # Start a new chat session with this context
-            new_chat_session = model.start_chat(history=[
-                {"role": "user", "parts": [initial_prompt]},
-                {"role": "model", "parts": [f"Hi {user.firstName}! I'm Dost, your personal wellness friend. I can see you're dealing with a few things, and that's completely okay. We can talk about it. What's on your mind right now?"]}
-            ])
-            chat_sessions[email] = new_chat_session
-
-        # Get the ongoing chat session for the user and send their message
-        user_chat = chat_sessions[email]
-        response = user_chat.send_message(user_message)
+def build_affirmation_prompt(lifestyle, categories_sel):
+    """Builds the personalized prompt used by /affirmation."""
+    prompt = (
+        f"You are an empathetic wellness assistant. "
+        f"Generate ONE short, positive, uplifting affirmation. "
+        f"Make it motivational, relevant to their challenges and lifestyle. "
+        f"They sleep {lifestyle.sleepHrs} hours/night and have a stress level of {lifestyle.stressLevel}/10. "
+        "- The main challenges they've identified are:\n"
+    )
+    for selection in categories_sel:
+        prompt += (
+            f"  - Under '{selection.category}', the specific issue is '{selection.subcategory}' "
+            f"and the description is '{selection.description}'.\n"
+        )
+
+    prompt += (
+        "\nKeep it under 20 words. "
+        "Avoid quotes, numbering, or extra explanations. "
+        "Return just the affirmation text. "
+        "Make it unique."
+    )
+    return prompt
 
-        # Return the model's reply text (adapt as needed depending on genai SDK response shape)
-        return jsonify({"reply": response.text})
 
-    except Exception as e:
-        print(f"An error occurred in /chat route: {e}")
-        return jsonify({"error": "Sorry, I'm having a little trouble thinking right now. Please try again in a moment."}), 500
+def affirmation_prompt_for(ctx):
+    if ctx is None or ctx.lifestyle is None:
+        return None
+    return ctx.memo("affirmation_prompt", lambda c: build_affirmation_prompt(c.lifestyle, c.categories))
+
+
+def load_affirmation_prompt(email):
+    """Returns the affirmation prompt for `email`, or None if the user data is missing."""
+    return affirmation_prompt_for(user_context.get(email))
+
+
+def invalidate_user_caches(user_id):
+    """Drops per-user cached data after the user's lifestyle, categories or streak change."""
+    email = user_context.invalidate_user(user_id)
+    if email is None:
+        user = db.session.get(Userdb, user_id)
+        email = user.email if user else None
+    if email:
+        affirmation_pool.invalidate(email)
+        recommender.invalidate(email)
+
+
+def queued_affirmation(email):
+    """/affirmation?async=1: a pooled affirmation if one is ready, else a queued job; (payload, status)."""
+    text = affirmation_pool.pop(email)
+    if text is not None:
+        return {"affirmation": text.strip()}, 200
+    # a double-click finds the first click's job and polls the same one
+    job_id = jobs.enqueue("affirmation.generate", {"email": email}, priority=PRIORITY_INTERACTIVE,
+                          owner=email, dedupe_key=f"affirmation:{email}")
+    return job_accepted(job_id), 202
+
+
+def job_accepted(job_id):
+    return {"job": job_id, "status_url": f"/jobs/{job_id}"}
+
+
+def job_response(payload, status):
+    headers = {"Location": payload["status_url"]} if status == 202 else {}
+    return jsonify(payload), status, headers
+
 
 # Route for affirmations ...
-@app.route('/affirmation')
+@bp.route('/affirmation')
 def affirmation():
     email = session.get('email')
     if not email:
         return jsonify({"error": "Authentication required. Please log in again."}), 401
+    limited = over_limit(email)
+    if limited:
+        return limited
+    if request.args.get('async'):
+        return job_response(*queued_affirmation(email))
 
     try:
-        # Fetch user details
-        user = Userdb.query.filter_by(email=email).first()
-        lifestyle = Lifestyle.query.filter_by(user_id=user.id).first()
-        categories_sel = UserCategorySelection.query.filter_by(user_id=user.id).all()
-
-        if not all([user, lifestyle]):
-            return jsonify({"error": "Could not retrieve user data to personalize affirmation."}), 500
-
-        # Build a personalized prompt
-        prompt = (
-            f"You are an empathetic wellness assistant. "
-            f"Generate ONE short, positive, uplifting affirmation. "
-            f"Make it motivational, relevant to their challenges and lifestyle. "
-            f"They sleep {lifestyle.sleepHrs} hours/night and have a stress level of {lifestyle.stressLevel}/10. "
-            "- The main challenges they've identified are:\n"
-        )
-        for selection in categories_sel:
-            prompt += (
-                f"  - Under '{selection.category}', the specific issue is '{selection.subcategory}' "
-                f"and the description is '{selection.description}'.\n"
-            )
+        # served from the user's pre-generated pool when possible
+        text = affirmation_pool.take(email, lambda: load_affirmation_prompt(email))
+        if text is None:
+            prompt = load_affirmation_prompt(email)
+            if prompt is None:
+                return jsonify({"error": "Could not retrieve user data to personalize affirmation."}), 500
+            text = llm.generate(prompt)
 
-        prompt += (
-            "\nKeep it under 20 words. "
-            "Avoid quotes, numbering, or extra explanations. "
-            "Return just the affirmation text. "
-            "Make it unique."
-        )
-
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
+        return jsonify({"affirmation": text.strip()})
 
-        return jsonify({"affirmation": response.text.strip()})
+    except LLMUnavailable as e:
+        current_app.logger.warning("LLM unavailable for affirmation, serving cached one: %s", e)
+        text = affirmation_pool.recent(email) or random.choice(FALLBACK_AFFIRMATIONS)
+        return jsonify({"affirmation": text, "degraded": True})
 
-    except Exception as e:
-        print(f"Error generating affirmation: {e}")
+    except Exception:
+        current_app.logger.exception("Error generating affirmation")
         return jsonify({"error": "Failed to generate affirmation."}), 500
 
+
+@bp.route('/affirmation/stream')
+def affirmation_stream():
+    """Streams the affirmation as Server-Sent Events; /affirmation stays as the JSON fallback."""
+    email = session.get('email')
+    if not email:
+        return jsonify({"error": "Authentication required. Please log in again."}), 401
+    limited = over_limit(email)
+    if limited:
+        return limited
+
+    # a pooled affirmation is already complete, so send it as a single event
+    try:
+        pooled = affirmation_pool.take(email, lambda: load_affirmation_prompt(email))
+    except LLMUnavailable as e:
+        current_app.logger.warning("LLM unavailable for affirmation, serving cached one: %s", e)
+        pooled = affirmation_pool.recent(email) or random.choice(FALLBACK_AFFIRMATIONS)
+    except Exception:
+        current_app.logger.exception("Affirmation pool error")
+        pooled = None
+    if pooled:
+        return sse_response(iter([sse_event({"delta": pooled.strip()}), sse_event({}, event="done")]))
+
+    prompt = load_affirmation_prompt(email)
+    if prompt is None:
+        return jsonify({"error": "Could not retrieve user data to personalize affirmation."}), 500
+
+    def events():
+        try:
+            for text in llm.generate_stream(prompt):
+                yield sse_event({"delta": text})
+            yield sse_event({}, event="done")
+        except Exception:
+            current_app.logger.exception("Error streaming affirmation")
+            yield sse_event({"error": "Failed to generate affirmation."}, event="error")
+
+    return sse_response(events())
+
 # Route for landing page...
-@app.route('/')
+@bp.route('/')
 def index():
-    return render_template('index.html', show_quickLinks=True)
+    return page_cache.respond(page_cache.page('index', 'index.html', show_quickLinks=True))
 
 # Route for Login Page...
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email = request.form['email']
@@ -278,17 +462,25 @@ def login():
 
         user = Userdb.query.filter_by(email=email).first()
 
-        if user and user.check_password(password):
+        try:
+            valid = bool(user) and user.check_password(password)
+            if valid and user.rehash_if_needed(password):
+                db.session.commit()
+        except HasherBusy:
+            return render_template("login.html", errorMsg="* Too many sign-ins right now, please try again in a moment *"), 503
+
+        if valid:
+            session.regenerate()  # new session id on login (no session fixation)
             session['email'] = user.email
             return redirect('/dashboard')
         else:
             return render_template("login.html", errorMsg="* Invalid Username or Password *")
 
-    return render_template('login.html', show_quickLinks=True)
+    return page_cache.respond(page_cache.page('login', 'login.html', show_quickLinks=True))
 
 # Route for registration....
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         firstName = request.form['firstName']
@@ -306,24 +498,26 @@ def register():
             return "Email already registered! Please login."
 
         # Use the model's constructor (it hashes the password)
-        new_user = Userdb(firstName, lastName, email, phone, password, gender, birthDate, eduLevel, fieldOfStudy)
+        try:
+            new_user = Userdb(firstName, lastName, email, phone, password, gender, birthDate, eduLevel, fieldOfStudy)
+        except HasherBusy:
+            return "Too many sign-ups right now, please try again in a moment.", 503
         db.session.add(new_user)
         db.session.commit()
 
         # store user_id in session so they can fill lifestyle & categories
         session['user_id'] = new_user.id
 
-        return redirect(url_for('lifestyle'))
+        return redirect(url_for('.lifestyle'))
 
-    return render_template('register.html', show_quickLinks=True)
+    return page_cache.respond(page_cache.page('register', 'register.html', show_quickLinks=True))
 
 # Route for lifestyle data...
 
-# app.py
-@app.route("/lifestyle", methods=["GET", "POST"])
+@bp.route("/lifestyle", methods=["GET", "POST"])
 def lifestyle():
     if "user_id" not in session:
-        return redirect(url_for("login"))
+        return redirect(url_for(".login"))
 
     user_id = session["user_id"]
 
@@ -359,45 +553,74 @@ def lifestyle():
             )
             db.session.add(lifestyle)
 
+        # keep the history too: one snapshot per answer, counted in the trend rollups
+        trends.record_lifestyle(user_id, trends.categories(user_id), dict(
+            diet=diet, physicalActivity=physicalActivity, socialInteraction=socialInteraction,
+            relaxHabit=relaxHabit, screenTime=screenTime, stressLevel=stressLevel, sleepHrs=sleepHrs))
         db.session.commit()
-        return redirect(url_for("category"))
+        invalidate_user_caches(user_id)
+        return redirect(url_for(".category"))
 
     # If GET, render lifestyle.html form
-    return render_template("lifestyle.html")
+    return page_cache.respond(page_cache.page('lifestyle', 'lifestyle.html'))
 
 
 # Route for category selection....
-@app.route('/activities/random')
+def load_activity_rows():
+    rows = db.session.query(Activity.id, Activity.title, Activity.description, Activity.est_time, Activity.tags) \
+        .order_by(Activity.id).all()
+    return [
+        {'id': r.id, 'title': r.title, 'description': r.description or '', 'est_time': r.est_time or '',
+         'tags': [t for t in (r.tags or '').split(',') if t]}
+        for r in rows
+    ]
+
+
+def activity_table_version():
+    # count/max(id) catch inserts and deletes, max(updated_at) in-place edits (catalog_sync upserts)
+    return tuple(db.session.query(db.func.count(Activity.id), db.func.max(Activity.id),
+                                  db.func.max(Activity.updated_at)).one())
+
+
+def load_activity_file():
+    # used only while the activity table is empty
+    with open(ACTIVITIES_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+
+
+@bp.route('/activities/random')
 def activities_random():
-    import json, random
+    count = request.args.get('count', 5, type=int)
+    # sampled from the in-memory catalog; no DB rows are materialized per request
+    return Response(activity_catalog.sample_json(count), mimetype='application/json')
 
-    count = int(request.args.get('count', 5))
-    activities = Activity.query.all()
 
-    if not activities:  # fallback to static JSON
-        with open('static/data/activities.json') as f:
-            activities = json.load(f)
-        random.shuffle(activities)
-        return jsonify(activities[:count])
+@bp.route('/activities/recommended')
+def activities_recommended():
+    """Top activities for the logged-in user (random ones for anonymous visitors)."""
+    count = request.args.get('count', 5, type=int)
+    email = session.get('email')
+    ctx = user_context.get(email) if email else None
+    if ctx is None:
+        return Response(activity_catalog.sample_json(count), mimetype='application/json')
+    return jsonify(recommended_activities(email, ctx, count))
 
-    # if DB has rows
-    chosen = []
-    try:
-        chosen = random.sample(activities, min(count, len(activities)))
-    except Exception:
-        chosen = activities[:count]
 
-    return jsonify([
-        {
-            'id': a.id,
-            'title': a.title,
-            'description': a.description or '',
-            'est_time': a.est_time or ''
-        } for a in chosen
-    ])
+def recommended_activities(email, ctx, count):
+    scores = recommender.cached(email)
+    if scores is None:
+        since = datetime.utcnow().date() - timedelta(days=30)
+        completions = db.session.query(UserActivityCompletion.activity_id, UserActivityCompletion.completed_day) \
+            .filter(UserActivityCompletion.user_id == ctx.user_id,
+                    UserActivityCompletion.completed_day >= since).all()
+        scores = recommender.build(email, ctx.categories, ctx.lifestyle, completions,
+                                   today=datetime.utcnow().date())
+    return recommender.top(scores, count, today=datetime.utcnow().date())
 
 
-@app.route('/activities/complete', methods=['POST'])
+@bp.route('/activities/complete', methods=['POST'])
 def activities_complete():
     if 'email' not in session:
         return jsonify({'error': 'login required'}), 401
@@ -409,58 +632,66 @@ def activities_complete():
     activity_id = payload.get('activity_id') or payload.get('id')  # accept both keys
     if not activity_id:
         return jsonify({'error': 'missing activity_id'}), 400
-
-    # Prevent double counting for the same activity on the same day
-    today = datetime.utcnow().date()
-    already = UserActivityCompletion.query.filter(
-        UserActivityCompletion.user_id == user.id,
-        UserActivityCompletion.activity_id == activity_id,
-        db.func.date(UserActivityCompletion.completed_at) == today
-    ).first()
-    if already:
-        return jsonify({'success': True, 'message': 'already completed today', 'new_streak': user.activity_streak})
-
-    # create completion entry
-    completion = UserActivityCompletion(user_id=user.id, activity_id=activity_id)
-    db.session.add(completion)
-
-    # update streak: increment if yesterday, reset if older
-    if user.last_activity_date == today:
-        # already completed something today (but not this activity) => keep streak
-        pass
-    elif user.last_activity_date == (today - timedelta(days=1)):
-        user.activity_streak = (user.activity_streak or 0) + 1
-    else:
-        user.activity_streak = 1
-
-    user.last_activity_date = today
+    try:
+        activity_id = int(activity_id)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'invalid activity_id'}), 400
+
+    # Prevent double counting for the same activity on the same day:
+    # the unique (user_id, activity_id, completed_day) index rejects the duplicate
+    now = datetime.utcnow()
+    today = now.date()
+    inserted = insert_ignore(
+        db.session, UserActivityCompletion,
+        dict(user_id=user.id, activity_id=activity_id, completed_at=now, completed_day=today),
+        ['user_id', 'activity_id', 'completed_day'],
+    )
+    if not inserted:
+        db.session.rollback()
+        return jsonify({'success': True, 'message': 'already completed today',
+                        'new_streak': streaks.get(user.id, today)['current']})
+
+    # atomic conditional update: increments once per day, resets after a gap
+    streaks.record(user.id, today)
+    trends.record_completion(user.id, category_names(user_context.get(user.email)), today)
     db.session.commit()
-    return jsonify({'success': True, 'new_streak': user.activity_streak})
+    streaks.invalidate(user.id)
+    user_context.invalidate(user.email)
+    recommender.record_completion(user.email, activity_id, today=today)
+    return jsonify({'success': True, 'new_streak': streaks.get(user.id, today)['current']})
 
 
-@app.route("/activities/streak")
+@bp.route("/activities/streak")
 def get_streak():
-    if "user_id" not in session:
+    email = session.get("email")
+    ctx = user_context.get(email) if email else None
+    if ctx is None:
         return jsonify({"streak": 0})
 
-    user = Userdb.query.get(session["user_id"])
-    return jsonify({"streak": user.activity_streak or 0})
+    return jsonify(streak_payload(streaks.get(ctx.user_id, datetime.utcnow().date())))
+
 
+def streak_payload(stats):
+    return {"streak": stats["current"], "longest": stats["longest"], "week": stats["week"]}
 
-@app.route('/category', methods=['GET', 'POST'])
+
+@bp.route('/category', methods=['GET', 'POST'])
 def category():
     if request.method == 'GET':
-        return render_template('category.html', show_quickLinks=False, categories=categories)
+        return page_cache.respond(page_cache.page('category', 'category.html', show_quickLinks=False,
+                                                  categories=categories))
 
     user_id = session.get('user_id')
     if not user_id:
-        return redirect(url_for('register'))
+        return redirect(url_for('.register'))
 
     if request.method == 'POST':
         category_val = request.form.get('category')
         subcategory = request.form.get('subcategory')
         description = request.form.get('description')
 
+        # first time this category is picked: count the user's history so far towards it
+        trends.select_category(user_id, category_val)
         new_selection = UserCategorySelection(
             user_id=user_id,
             category=category_val,
@@ -469,44 +700,105 @@ def category():
         )
         db.session.add(new_selection)
         db.session.commit()
-    category = request.form.get('category')
-    subcategory = request.form.get('subcategory')
-    description = request.form.get('description')
-
+        invalidate_user_caches(user_id)
 
     # pop temporary session key after finishing onboarding
     session.pop('user_id', None)
 
-    return redirect(url_for('login'))
-
+    return redirect(url_for('.login'))
 
 
-    return render_template('category.html', show_quickLinks=False, categories=categories)
-
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     email = session.get('email')  # safer than session['email']
     if email:
-        user = Userdb.query.filter_by(email=email).first()
-        if not user:
+        ctx = user_context.get(email)
+        if not ctx:
             return redirect('/login')  # fallback if no user found
 
-        lifestyle = Lifestyle.query.filter_by(user_id=user.id).first()
-        categories_sel = UserCategorySelection.query.filter_by(user_id=user.id).all()
-        categories_list = UserCategorySelection.query.filter_by(user_id=user.id).all()
-
-        return render_template(
-            "dashboard.html",
-            user=user,
-            lifestyle=lifestyle,
-            categories=categories_sel,
-        )
+        # shared page shell + this user's profile fragment (re-rendered when their context changes)
+        shell = page_cache.shell('dashboard', 'dashboard.html', slots=('profile',))
+        profile = ctx.memo("dashboard_profile", lambda c: page_cache.fragment(
+            "components/dashboardProfile.html", user=c.user, lifestyle=c.lifestyle, categories=c.categories))
+        return page_cache.respond(shell.fill(profile=profile), cache_control="private, no-cache")
     else:
         return redirect('/login')
 
+
+@bp.route('/dashboard/bootstrap')
+def dashboard_bootstrap():
+    """What the dashboard needs on load -- streak, recommended activities, an affirmation -- in one response."""
+    email = session.get('email')
+    ctx = user_context.get(email) if email else None
+    if ctx is None:
+        return jsonify({"error": "Authentication required. Please log in again."}), 401
+
+    count = request.args.get('count', 5, type=int)
+    return jsonify({
+        "streak": streak_payload(streaks.get(ctx.user_id, datetime.utcnow().date())),
+        "activities": recommended_activities(email, ctx, count),
+        "affirmation": pooled_affirmation(email, ctx),
+    }), 200, {"Cache-Control": "private, no-store"}
+
+
+@bp.route('/dashboard/trends')
+def dashboard_trends():
+    """Daily and weekly stress/sleep/screen-time averages and completions, for the user and their categories."""
+    email = session.get('email')
+    ctx = user_context.get(email) if email else None
+    if ctx is None:
+        return jsonify({"error": "Authentication required. Please log in again."}), 401
+
+    return jsonify(trends.get(ctx.user_id, category_names(ctx), datetime.utcnow().date())), \
+        200, {"Cache-Control": "private, no-store"}
+
+
+def pooled_affirmation(email, ctx):
+    """An affirmation from the user's pool without waiting for the model (None while it warms up)."""
+    text = affirmation_pool.take_nowait(email, lambda: affirmation_prompt_for(ctx))
+    return (text or "").strip() or None
+
 # Route for logout ....
 
-@app.route('/chat', methods=['POST'])
+def load_chat_history(email):
+    """Returns the stored chat history for `email`, or a fresh personalized one (None if no user data)."""
+    history = chat_store.get(email)
+    if history is not None:
+        return history
+    return initial_chat_history(user_context.get(email))
+
+
+def initial_chat_history(ctx):
+    """Persona prompt + greeting that open a new conversation (None if the user data is missing)."""
+    if ctx is None or ctx.lifestyle is None:
+        return None
+
+    initial_prompt = ctx.memo("chat_prompt", lambda c: create_initial_prompt(c.user, c.lifestyle, c.categories))
+    return [
+        {"role": "user", "parts": [initial_prompt]},
+        {"role": "model", "parts": [f"Hi {ctx.user.firstName}! I'm Dost, your personal wellness friend. I can see you're dealing with a few things, and that's completely okay. We can talk about it. What's on your mind right now?"]}
+    ]
+
+
+def compact_history(history, user_message):
+    """Compacts the history to the token budget; returns (history, prompt tokens)."""
+    full_tokens = history_tokens(history)
+    history = history_window.compact(history)
+    prompt_tokens = history_tokens(history) + estimate_tokens(user_message)
+    current_app.logger.info("chat prompt tokens=%s (history before compaction=%s)", prompt_tokens, full_tokens)
+    return history, prompt_tokens
+
+
+def start_user_chat(history, user_message):
+    """Compacts the history to the token budget and opens a Gemini chat on it."""
+    history, prompt_tokens = compact_history(history, user_message)
+    return llm.start_chat(history), prompt_tokens
+
+
+CHAT_ERROR_MSG = "Sorry, I'm having a little trouble thinking right now. Please try again in a moment."
+
+
+@bp.route('/chat', methods=['POST'])
 def chat():
     """Handles the chatbot API calls for logged-in users."""
     email = session.get('email')
@@ -516,48 +808,301 @@ def chat():
     user_message = request.json.get('message')
     if not user_message:
         return jsonify({"error": "Message cannot be empty."}), 400
+    limited = over_limit(email)
+    if limited:
+        return limited
 
     try:
-        # Retrieve or create a chat session for the current user
-        if email not in chat_sessions:
-            # Fetch user data to create a personalized context for the first time
-            user = Userdb.query.filter_by(email=email).first()
-            lifestyle = Lifestyle.query.filter_by(user_id=user.id).first()
-            categories_list = UserCategorySelection.query.filter_by(user_id=user.id).all()
-
-            if not all([user, lifestyle]):
-                return jsonify({"error": "Could not retrieve user data to personalize chat."}), 500
-
-            initial_prompt = create_initial_prompt(user, lifestyle, categories_list)
-            model = genai.GenerativeModel('gemini-1.5-flash')
-
-            # start a new chat session
-            new_chat_session = model.start_chat(history=[
-                {"role": "user", "parts": [initial_prompt]},
-                {"role": "model", "parts": [f"Hi {user.firstName}! I'm Dost, your personal wellness friend. I can see you're dealing with a few things, and that's completely okay. We can talk about it. What's on your mind right now?"]}
-            ])
-            chat_sessions[email] = new_chat_session
-
-        # Use ongoing session
-        user_chat = chat_sessions[email]
+        history = load_chat_history(email)
+        if history is None:
+            return jsonify({"error": "Could not retrieve user data to personalize chat."}), 500
+
+        user_chat, prompt_tokens = start_user_chat(history, user_message)
         response = user_chat.send_message(user_message)
 
-        return jsonify({"reply": response.text})
+        # persist the updated conversation so any worker can pick it up
+        chat_store.put(email, serialize_history(user_chat.history))
 
-    except Exception as e:
-        print(f"An error occurred in /chat route: {e}")
-        return jsonify({"error": "Sorry, I'm having a little trouble thinking right now. Please try again in a moment."}), 500
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and getattr(usage, "prompt_token_count", None):
+            prompt_tokens = usage.prompt_token_count
+
+        return jsonify({"reply": response.text, "prompt_tokens": prompt_tokens})
 
+    except LLMUnavailable as e:
+        current_app.logger.warning("LLM unavailable in /chat route: %s", e)
+        return jsonify({"reply": FALLBACK_CHAT_REPLY, "degraded": True})
 
-@app.route('/logout')
+    except Exception:
+        current_app.logger.exception("An error occurred in /chat route")
+        return jsonify({"error": CHAT_ERROR_MSG}), 500
+
+
+@bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Same as /chat but forwards the reply as Server-Sent Events while Gemini generates it."""
+    email = session.get('email')
+    if not email:
+        return jsonify({"error": "Authentication required. Please log in again."}), 401
+
+    user_message = (request.json or {}).get('message')
+    if not user_message:
+        return jsonify({"error": "Message cannot be empty."}), 400
+    limited = over_limit(email)
+    if limited:
+        return limited
+
+    history = load_chat_history(email)
+    if history is None:
+        return jsonify({"error": "Could not retrieve user data to personalize chat."}), 500
+
+    def events():
+        try:
+            user_chat, prompt_tokens = start_user_chat(history, user_message)
+            for text in user_chat.send_message_stream(user_message):
+                yield sse_event({"delta": text})
+            # history is only complete once the stream has been consumed
+            chat_store.put(email, serialize_history(user_chat.history))
+            yield sse_event({"prompt_tokens": prompt_tokens}, event="done")
+        except LLMUnavailable as e:
+            current_app.logger.warning("LLM unavailable in /chat/stream route: %s", e)
+            yield sse_event({"delta": FALLBACK_CHAT_REPLY})
+            yield sse_event({"degraded": True}, event="done")
+        except Exception:
+            current_app.logger.exception("An error occurred in /chat/stream route")
+            yield sse_event({"error": CHAT_ERROR_MSG}, event="error")
+
+    return sse_response(events())
+
+
+@bp.route('/chat/summary', methods=['POST'])
+def chat_summary():
+    """Queues a summary of the conversation so far; the reply points at the job to poll."""
+    email = session.get('email')
+    if not email:
+        return jsonify({"error": "Authentication required. Please log in again."}), 401
+
+    # the history is sent with the job: with CHAT_STORE=memory a worker could not read it
+    summary, turns = history_window.split(chat_store.get(email) or [])
+    if not turns:
+        return jsonify({"error": "Nothing to summarize yet."}), 400
+    limited = over_limit(email)
+    if limited:
+        return limited
+    job_id = jobs.enqueue("chat.summary", {"summary": summary, "turns": turns}, priority=PRIORITY_INTERACTIVE,
+                          owner=email, dedupe_key=f"chat-summary:{email}")
+    return job_response(job_accepted(job_id), 202)
+
+
+# seconds a /jobs/<id>?wait=N request may be held open: here it pins a worker thread,
+# the async twin in main.py only parks a coroutine between polls
+JOB_WAIT_MAX = 2
+JOB_WAIT_MAX_ASYNC = 20
+
+
+def job_wait(value, limit):
+    """The ?wait=N of a job status request, clamped to [0, limit]."""
+    try:
+        wait = float(value or 0)
+    except ValueError:
+        return 0
+    if not math.isfinite(wait):
+        return 0
+    return min(max(wait, 0), limit)
+
+
+def job_payload(job):
+    payload = {"job": job['id'], "kind": job['kind'], "status": job['status'], "attempts": job['attempts']}
+    if job['status'] == 'done':
+        payload["result"] = job['result']
+    elif job['status'] == 'failed':
+        payload["error"] = "The job failed. Please try again."
+    return payload
+
+
+@bp.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    """Status and result of one of the user's jobs; ?wait=N holds the reply until it finishes (max 2s)."""
+    email = session.get('email')
+    if not email:
+        return jsonify({"error": "Authentication required. Please log in again."}), 401
+
+    job = jobs.get(job_id)
+    if job is None or job['owner'] != email:
+        return jsonify({"error": "Job not found."}), 404
+    wait = job_wait(request.args.get('wait'), JOB_WAIT_MAX)
+    if wait:
+        job = jobs.wait(job_id, wait) or job
+
+    response = jsonify(job_payload(job))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@bp.route('/logout')
 def logout():
     session.pop('email', None)
     return redirect('/')
 
 
+# ---------------------------
+# Background jobs (run by `flask --app app worker`)
+# ---------------------------
+@task("affirmation.generate")
+def generate_affirmation_job(email):
+    prompt = load_affirmation_prompt(email)
+    if prompt is None:
+        raise ValueError("no user data to personalize the affirmation")
+    return {"affirmation": llm.generate(prompt).strip()}
+
+
+@task("chat.summary")
+def chat_summary_job(summary, turns):
+    return {"summary": summarize_turns(summary, turns)}
+
+
+@task("streaks.rebuild", max_attempts=1)
+def rebuild_streaks_job():
+    return {"users": streaks.rebuild_all()}
+
+
+@task("trends.backfill", max_attempts=1)
+def backfill_trends_job(chunk_size=10000):
+    return trends.backfill(chunk_size=chunk_size)
+
+
+@task("catalog.sync", max_attempts=1)
+def sync_activities_job(path=None):
+    return sync_activities(db, Activity, path or ACTIVITIES_PATH)
+
+
+def load_app():
+    """The module-level app; `flask worker` children are spawned with this as their factory."""
+    return app
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Apply migrations and sync the activity catalog (run once per deploy)."""
+    applied = init_db()
+    print(f"Database ready (applied migrations: {applied or 'none'}).")
+
+
+@click.command("sync-activities")
+@click.option("--path", default=None, help="Catalog JSON file (defaults to static/data/activities.json).")
+@click.option("--watch", is_flag=True, help="Keep running and re-sync whenever the file changes.")
+@with_appcontext
+def sync_activities_command(path, watch):
+    """Bulk upsert the activity catalog from JSON."""
+    path = path or ACTIVITIES_PATH
+
+    def run():
+        print(f"Synced activities: {sync_activities(db, Activity, path)}")
+        activity_catalog.refresh()
+
+    if watch:
+        watch_file(path, run)
+    else:
+        run()
+
+
+@click.command("rebuild-streaks")
+@with_appcontext
+def rebuild_streaks_command():
+    """Recompute every user's streaks from their activity completions."""
+    count = streaks.rebuild_all()
+    print(f"Rebuilt streaks for {count} users.")
+
+
+@click.command("backfill-trends")
+@click.option("--chunk-size", type=int, default=10000, help="Snapshot/completion ids per transaction.")
+@with_appcontext
+def backfill_trends_command(chunk_size):
+    """Rebuild the dashboard trend rollups from lifestyle snapshots and completions."""
+    print(f"Backfilled trends: {trends.backfill(chunk_size=chunk_size)}")
+
+
+@click.command("purge-sessions")
+@with_appcontext
+def purge_sessions_command():
+    """Delete expired server-side sessions (the background sweep does this too)."""
+    removed = current_app.extensions['mannkibaat'].session_store.purge_expired()
+    print(f"Removed {removed} expired sessions.")
+
+
+@click.command("build-assets")
+@click.option("--clean", is_flag=True, help="Delete outputs of previous builds first.")
+@click.option("--critical-budget", type=int, default=CRITICAL_BUDGET // 1024, show_default=True,
+              help="KB of critical CSS a page may inline; pages over it link their stylesheets.")
+@with_appcontext
+def build_assets_command(clean, critical_budget):
+    """Fingerprint, precompress and resize static files into static/dist."""
+    builder = AssetBuilder(current_app.static_folder, os.path.join(current_app.static_folder, 'dist'),
+                           template_dir=os.path.join(current_app.root_path, current_app.template_folder),
+                           critical_budget=critical_budget * 1024)
+    builder.build(clean=clean)
+    before = sum(size for _, size, _ in builder.report)
+    after = sum(smallest for _, _, smallest in builder.report)
+    for path, size, smallest in builder.report:
+        print(f"{path:<32} {size / 1024:8.1f} KB -> {smallest / 1024:7.1f} KB")
+    print(f"Built {len(builder.manifest)} assets: {before / 1024:.0f} KB -> {after / 1024:.0f} KB "
+          f"(smallest full-size variant per file).")
+    for page, (size, inlined) in builder.critical.items():
+        print(f"critical CSS {page:<19} {size / 1024:8.1f} KB "
+              f"({'inlined' if inlined else f'over the {critical_budget} KB budget, stylesheets linked'})")
+    current_app.extensions['assets'].reload()
+
+
+@click.command("worker")
+@click.option("--processes", type=int, default=None, help="Worker processes (defaults to JOBS_WORKERS).")
+@with_appcontext
+def worker_command(processes):
+    """Run background jobs until stopped (SIGTERM lets running jobs finish)."""
+    processes = processes or current_app.config['JOBS_WORKERS']
+    print(f"Starting {processes} job worker(s); tasks: {', '.join(sorted(TASKS))}.")
+    run_workers(current_app._get_current_object(), load_app, processes)
+
+
+@click.command("enqueue")
+@click.argument("kind")
+@click.option("--payload", default="{}", help="Task keyword arguments as JSON.")
+@click.option("--priority", type=int, default=PRIORITY_BACKGROUND)
+@with_appcontext
+def enqueue_command(kind, payload, priority):
+    """Queue a background job, e.g. `flask --app app enqueue streaks.rebuild`."""
+    try:
+        job_id = jobs.enqueue(kind, json.loads(payload), priority=priority)
+    except UnknownTask:
+        raise click.BadParameter(f"unknown task (known: {', '.join(sorted(TASKS))})", param_hint="KIND")
+    print(f"Queued job {job_id} ({kind}).")
+
+
+@click.command("jobs")
+@with_appcontext
+def jobs_command():
+    """Show queue depth and recent job latency."""
+    print(json.dumps(jobs.stats(), indent=2))
+
+
+@click.command("migrate")
+@with_appcontext
+def migrate_command():
+    """Apply pending schema migrations."""
+    applied = migrate()
+    print(f"Applied migrations: {applied or 'none (up to date)'}")
+
+
 # ---------------------------
 # RUN
 # ---------------------------
+app = create_app()
+
 if __name__ == "__main__":
+    with app.app_context():
+        init_db()
     app.run(debug=True)
  
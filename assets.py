@@ -0,0 +1,390 @@
+# assets.py
+#
+# Static asset pipeline.
+#
+# `flask --app app build-assets` turns static/css, static/images (and any
+# other folder under static/, except data/) into static/dist/:
+#
+# - every file gets a content hash in its name (css/index.3f2a9c1d0b.css), so
+#   it can be cached forever and a new build simply changes the URL;
+# - text assets get precompressed .gz and .br siblings;
+# - raster images get WebP and AVIF variants (plus resized copies in their own
+#   format) at several widths, with the intrinsic size recorded;
+# - manifest.json maps each source path to its build outputs.
+#
+# Templates never hard-code a path: {{ asset_url('css/index.css') }} and
+# {{ picture('images/about1.png', alt=...) }} read the manifest, and the
+# /assets/ route serves the hashed files with `immutable` cache headers and
+# the best precompressed encoding the client accepts. Without a build (a
+# fresh checkout) the helpers fall back to plain /static/ URLs.
+#
+# Stylesheets are hashed after the fonts/images they reference, with their
+# url()s rewritten to the hashed files. JavaScript modules likewise come after
+# the modules they import, with relative import specifiers rewritten, and
+# {{ module_script('js/x/main.js') }} adds modulepreload links for the whole
+# import graph so it downloads in parallel. Each page template that lists its CSS
+# in {{ stylesheets(...) }} also gets its critical rules extracted
+# (critical_css.py); the helper inlines them and loads the full files without
+# blocking rendering. A page whose critical CSS is over CRITICAL_BUDGET gets
+# plain <link>s instead: inlining more than fits in the first round trip
+# delays the page as much as the stylesheet request it saves.
+#
+# Pillow and brotli are only needed by the build; without them images are
+# copied as-is and only gzip variants are written.
+
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import abort, request, send_from_directory, url_for
+from jinja2 import pass_context
+from markupsafe import Markup, escape
+
+import critical_css
+
+MANIFEST = "manifest.json"
+URL_PREFIX = "/assets/"
+SKIP_DIRS = ("data", "dist")
+SKIP_EXTS = (".md",)
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+JS_IMPORT = re.compile(r"""(\b(?:import|export)\b[\w\s{},*$]*?\bfrom\s*|\bimport\s*\(?\s*)(['"])(\.{1,2}/[^'"]+)\2""")
+COMPRESSIBLE = (".css", ".js", ".mjs", ".json", ".svg", ".html", ".txt", ".map")
+RASTER = (".png", ".jpg", ".jpeg")
+WIDTHS = (480, 960, 1440)
+IMAGE_FORMATS = (("avif", "image/avif", dict(quality=55)), ("webp", "image/webp", dict(quality=80, method=6)))
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+ONE_YEAR = 365 * 24 * 3600
+CRITICAL_BUDGET = 14 * 1024  # bytes of inlined CSS per page, about one initial TCP window
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def hashed_name(path, data, suffix=""):
+    """css/index.css -> css/index.<hash>.css (suffix goes before the hash, e.g. '.480w')."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}{suffix}.{content_hash(data)}{ext}"
+
+
+# ---------------------------
+# Build
+# ---------------------------
+class AssetBuilder:
+    def __init__(self, static_dir, out_dir, template_dir=None, widths=WIDTHS, critical_budget=CRITICAL_BUDGET):
+        self.static_dir = static_dir
+        self.out_dir = out_dir
+        self.template_dir = template_dir
+        self.widths = widths
+        self.critical_budget = critical_budget
+        self.manifest = {}
+        self.report = []  # (source path, bytes, smallest variant's bytes)
+        self.critical = {}  # template name -> (critical CSS bytes, inlined?)
+
+    def sources(self):
+        """(relative path, full path) of every source file; modules after their imports, stylesheets last."""
+        found = []
+        for root, dirs, files in os.walk(self.static_dir):
+            if root == self.static_dir:
+                dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            for name in files:
+                if not name.endswith(SKIP_EXTS):
+                    full = os.path.join(root, name)
+                    found.append((os.path.relpath(full, self.static_dir).replace(os.sep, "/"), full))
+        depths = {}
+        return sorted(found, key=lambda item: (item[0].endswith(".css"), self.import_depth(item[0], depths), item[0]))
+
+    def imports(self, rel):
+        """Static files a JavaScript module imports through relative specifiers."""
+        if not rel.endswith((".js", ".mjs")):
+            return []
+        with open(os.path.join(self.static_dir, rel), encoding="utf-8") as f:
+            specifiers = [m.group(3) for m in JS_IMPORT.finditer(f.read())]
+        return [posixpath.normpath(posixpath.join(posixpath.dirname(rel), s)) for s in specifiers]
+
+    def import_depth(self, rel, depths, seen=()):
+        """0 for files that import nothing, else 1 + the deepest import (cycles count as 0)."""
+        if rel not in depths:
+            deps = [d for d in self.imports(rel) if d not in seen and os.path.isfile(os.path.join(self.static_dir, d))]
+            depths[rel] = 1 + max(self.import_depth(d, depths, seen + (rel,)) for d in deps) if deps else 0
+        return depths[rel]
+
+    def write(self, rel, data):
+        target = os.path.join(self.out_dir, rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        return rel
+
+    def build(self, clean=False):
+        """Builds every source; old outputs are kept (running workers may still link them) unless `clean`."""
+        if clean and os.path.isdir(self.out_dir):
+            shutil.rmtree(self.out_dir)
+        os.makedirs(self.out_dir, exist_ok=True)
+        for rel, full in self.sources():
+            with open(full, "rb") as f:
+                data = f.read()
+            ext = os.path.splitext(rel)[1].lower()
+            entry = {}
+            if ext == ".css":
+                data = self.rewrite_urls(rel, data.decode("utf-8")).encode("utf-8")
+            elif ext in (".js", ".mjs") and self.imports(rel):
+                data = self.rewrite_imports(rel, data.decode("utf-8")).encode("utf-8")
+                entry["imports"] = [d for d in self.imports(rel) if d in self.manifest]
+            entry["file"] = self.write(hashed_name(rel, data), data)
+            smallest = len(data)
+            if ext in COMPRESSIBLE:
+                entry["encodings"], smallest = self.compress(entry["file"], data)
+            elif ext in RASTER:
+                smallest = self.image(rel, data, entry) or smallest
+            self.manifest[rel] = entry
+            self.report.append((rel, len(data), smallest))
+        if self.template_dir:
+            self.extract_critical()
+        self.write(MANIFEST, json.dumps(self.manifest, indent=1, sort_keys=True).encode("utf-8"))
+        return self.manifest
+
+    def rewrite_urls(self, rel, css):
+        """Points relative url()s in a stylesheet at the hashed build outputs."""
+        def resolve(match):
+            url = match.group(2).strip()
+            if url.startswith(("data:", "http:", "https:", "//", "/", "#")):
+                return match.group(0)
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(rel), re.split(r"[?#]", url)[0]))
+            entry = self.manifest.get(target)
+            if entry is None:
+                return match.group(0)
+            return f'url("{URL_PREFIX}{entry["file"]}")'
+
+        return CSS_URL.sub(resolve, css)
+
+    def rewrite_imports(self, rel, js):
+        """Points a module's relative imports at the hashed build outputs."""
+        def resolve(match):
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(rel), match.group(3)))
+            entry = self.manifest.get(target)
+            if entry is None:
+                return match.group(0)
+            quote = match.group(2)
+            return f"{match.group(1)}{quote}{URL_PREFIX}{entry['file']}{quote}"
+
+        return JS_IMPORT.sub(resolve, js)
+
+    def extract_critical(self):
+        """Writes critical/<page>.<hash>.css for every page template that calls stylesheets()
+        and whose critical CSS fits the budget; the others keep plain <link>s."""
+        for name, vocabulary, sheets in critical_css.pages(self.template_dir):
+            css = []
+            for path in sheets:
+                entry = self.manifest.get(path)
+                if entry is not None:
+                    with open(os.path.join(self.out_dir, entry["file"]), encoding="utf-8") as f:
+                        css.append(critical_css.extract(f.read(), vocabulary))
+            data = critical_css.prune("".join(css)).encode("utf-8")
+            inlined = len(data) <= self.critical_budget
+            if inlined:
+                stem = "critical/" + os.path.splitext(name)[0] + ".css"
+                self.manifest["critical:" + name] = {"file": self.write(hashed_name(stem, data), data)}
+            self.critical[name] = (len(data), inlined)
+
+    def compress(self, rel, data):
+        """Writes .br/.gz next to `rel` when they are smaller; returns (encodings, smallest size)."""
+        variants = [("gzip", ".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+        try:
+            import brotli
+
+            variants.insert(0, ("br", ".br", brotli.compress(data, quality=11)))
+        except ImportError:
+            pass
+        written = []
+        for encoding, ext, packed in variants:
+            if len(packed) < len(data):
+                self.write(rel + ext, packed)
+                written.append(encoding)
+        return written, min([len(data)] + [len(p) for _, _, p in variants])
+
+    def image(self, rel, data, entry):
+        """Adds width/height and AVIF/WebP/resized variants to `entry`; returns the smallest full-size one."""
+        try:
+            from PIL import Image, features
+        except ImportError:
+            return None
+
+        with Image.open(io.BytesIO(data)) as im:
+            im.load()
+            width, height = im.size
+            widths = sorted({w for w in self.widths if w < width} | {width})
+            resized = {w: im if w == width else im.resize((w, round(height * w / width)), Image.LANCZOS)
+                       for w in widths}
+            variants = {}
+            for fmt, _, options in IMAGE_FORMATS:
+                if features.check(fmt):
+                    variants[fmt] = [[w, self.save_image(rel, resized[w], fmt, w, **options)] for w in widths]
+            # smaller copies in the original format for browsers without AVIF/WebP;
+            # the untouched original is the full-size one
+            options = {"quality": 82} if im.format == "JPEG" else {}
+            variants["fallback"] = [[w, self.save_image(rel, resized[w], im.format, w, optimize=True, **options)]
+                                    for w in widths[:-1]]
+
+        entry.update(width=width, height=height, variants=variants)
+        full = [os.path.getsize(os.path.join(self.out_dir, sizes[-1][1]))
+                for fmt, sizes in variants.items() if fmt != "fallback"]
+        return min(full) if full else None
+
+    def save_image(self, rel, im, fmt, width, **options):
+        if fmt == "JPEG" and im.mode != "RGB":
+            im = im.convert("RGB")
+        out = io.BytesIO()
+        im.save(out, fmt.upper(), **options)
+        blob = out.getvalue()
+        stem, ext = os.path.splitext(rel)
+        if fmt.lower() in ("avif", "webp"):
+            ext = "." + fmt.lower()
+        return self.write(hashed_name(stem + ext, blob, f".{width}w"), blob)
+
+
+# ---------------------------
+# Serving / templates
+# ---------------------------
+class Assets:
+    """Reads the build manifest and exposes asset_url()/img_srcset()/picture()/module_script() to templates."""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self._mtime = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.out_dir = os.path.join(app.static_folder, "dist")
+        self._inline = {}
+        self.reload()
+        app.add_url_rule(URL_PREFIX + "<path:filename>", "assets", self.serve)
+
+        @pass_context
+        def stylesheets(context, *paths):
+            return self.stylesheets(context.name, *paths)
+
+        app.jinja_env.globals.update(asset_url=self.url, img_srcset=self.srcset, picture=self.picture,
+                                     stylesheets=stylesheets, module_script=self.module_script)
+        app.extensions["assets"] = self
+
+    def reload(self):
+        path = os.path.join(self.out_dir, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            self.manifest, self._mtime = {}, None
+            return
+        if mtime != self._mtime:
+            with open(path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            self._mtime = mtime
+
+    def entry(self, path):
+        if self.app.jinja_env.auto_reload:
+            self.reload()  # pick up a rebuild while developing
+        return self.manifest.get(path)
+
+    def url(self, path):
+        """URL of a static file: the hashed build output if there is one, else /static/<path>."""
+        entry = self.entry(path)
+        if entry is None:
+            return url_for("static", filename=path)
+        return url_for("assets", filename=entry["file"])
+
+    def srcset(self, path, fmt="fallback"):
+        """'url 480w, url 960w, ...' for an image in `fmt` ('avif', 'webp' or 'fallback')."""
+        entry = self.entry(path)
+        if entry is None or fmt not in entry.get("variants", {}):
+            return ""
+        sizes = entry["variants"][fmt]
+        if fmt == "fallback":
+            sizes = sizes + [[entry["width"], entry["file"]]]
+        return ", ".join(f"{url_for('assets', filename=f)} {w}w" for w, f in sizes)
+
+    def picture(self, path, alt="", sizes="100vw", loading="lazy", **attrs):
+        """<picture> with AVIF/WebP sources and an <img> fallback; `class_` sets the class."""
+        entry = self.entry(path) or {}
+        img = {"src": self.url(path), "alt": alt, "loading": loading, "decoding": "async"}
+        if "width" in entry:
+            img.update(width=entry["width"], height=entry["height"])
+        if self.srcset(path):
+            img.update(srcset=self.srcset(path), sizes=sizes)
+        for key, value in attrs.items():
+            img[key.rstrip("_")] = value
+
+        html = ["<picture>"]
+        for fmt, mime, _ in IMAGE_FORMATS:
+            srcset = self.srcset(path, fmt)
+            if srcset:
+                html.append(f'<source type="{mime}" srcset="{escape(srcset)}" sizes="{escape(sizes)}">')
+        html.append("<img " + " ".join(f'{k}="{escape(v)}"' for k, v in img.items()) + ">")
+        html.append("</picture>")
+        return Markup("".join(html))
+
+    def critical(self, template):
+        """The page's critical CSS from the build, or None."""
+        entry = self.entry("critical:" + template)
+        if entry is None:
+            return None
+        css = self._inline.get(entry["file"])
+        if css is None:
+            with open(os.path.join(self.out_dir, entry["file"]), encoding="utf-8") as f:
+                css = self._inline[entry["file"]] = f.read()
+        return css
+
+    def stylesheets(self, template, *paths):
+        """<link>s for a page's stylesheets.
+
+        With a build, the page's critical CSS is inlined and the full files are
+        fetched without blocking the first paint (media="print" swapped to "all"
+        once loaded; <noscript> keeps plain links). Without one, or when the
+        page's critical CSS was over budget, plain links.
+        """
+        urls = [escape(self.url(path)) for path in paths]
+        critical = self.critical(template)
+        if critical is None:
+            return Markup("".join(f'<link rel="stylesheet" href="{url}">' for url in urls))
+        html = [f"<style>{critical}</style>"]
+        html += [f'<link rel="stylesheet" href="{url}" media="print" onload="this.media=\'all\'">' for url in urls]
+        html.append("<noscript>" + "".join(f'<link rel="stylesheet" href="{url}">' for url in urls) + "</noscript>")
+        return Markup("".join(html))
+
+    def module_script(self, path):
+        """<script type="module"> for an entry module, with a modulepreload link for each module it
+        (transitively) imports, so the browser doesn't discover them one import level at a time."""
+        html, seen, queue = [], set(), list((self.entry(path) or {}).get("imports", []))
+        while queue:
+            dep = queue.pop(0)
+            if dep in seen:
+                continue
+            seen.add(dep)
+            html.append(f'<link rel="modulepreload" href="{escape(self.url(dep))}">')
+            queue += (self.entry(dep) or {}).get("imports", [])
+        html.append(f'<script type="module" src="{escape(self.url(path))}"></script>')
+        return Markup("".join(html))
+
+    def serve(self, filename):
+        """A hashed build file, cached for a year, precompressed when the client allows it."""
+        if os.path.basename(filename) == MANIFEST:
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        for encoding, ext in ENCODINGS:
+            if request.accept_encodings[encoding] and os.path.isfile(os.path.join(self.out_dir, filename + ext)):
+                response = send_from_directory(self.out_dir, filename + ext, mimetype=mimetype, max_age=ONE_YEAR)
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(self.out_dir, filename, mimetype=mimetype, max_age=ONE_YEAR)
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
@@ -0,0 +1,96 @@
+"""Benchmark: /activities/random, old ORM route vs. the in-memory ActivityCatalog.
+
+Builds a throwaway Flask app on a temp SQLite file with N activities and
+times both handlers through the Flask test client.
+
+    python benchmarks/bench_activities_random.py --sizes 10000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from flask import Flask, Response, jsonify, request
+from flask_sqlalchemy import SQLAlchemy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from activity_catalog import ActivityCatalog  # noqa: E402
+
+
+def build_app(size):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    db = SQLAlchemy(app)
+
+    class Activity(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        title = db.Column(db.String(200), nullable=False)
+        description = db.Column(db.Text, nullable=True)
+        est_time = db.Column(db.String(50), nullable=True)
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Activity.__table__.insert(), [
+            {"title": f"Activity {i}", "description": f"Do something nice #{i}", "est_time": "5 min"}
+            for i in range(size)
+        ])
+        db.session.commit()
+
+    @app.route("/old")
+    def old():
+        # the route as it was before the catalog
+        count = int(request.args.get("count", 5))
+        activities = Activity.query.all()
+        chosen = random.sample(activities, min(count, len(activities)))
+        return jsonify([
+            {"id": a.id, "title": a.title, "description": a.description or "", "est_time": a.est_time or ""}
+            for a in chosen
+        ])
+
+    def load_rows():
+        rows = db.session.query(Activity.id, Activity.title, Activity.description, Activity.est_time).all()
+        return [{"id": r.id, "title": r.title, "description": r.description or "",
+                 "est_time": r.est_time or ""} for r in rows]
+
+    def version():
+        return db.session.query(db.func.count(Activity.id), db.func.max(Activity.id)).one()
+
+    catalog = ActivityCatalog(load_rows, version)
+
+    @app.route("/new")
+    def new():
+        count = request.args.get("count", 5, type=int)
+        return Response(catalog.sample_json(count), mimetype="application/json")
+
+    return app
+
+
+def bench(client, path, seconds):
+    client.get(path)  # warm up (loads the catalog once)
+    n = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        assert client.get(path).status_code == 200
+        n += 1
+    elapsed = time.perf_counter() - t0
+    return elapsed / n, n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        client = build_app(size).test_client()
+        for name in ("old", "new"):
+            latency, rps = bench(client, f"/{name}?count=5", args.seconds)
+            print(f"{size:>8,} activities  {name}: {latency * 1e3:9.3f} ms/request  {rps:10.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
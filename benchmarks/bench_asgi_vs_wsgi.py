@@ -0,0 +1,156 @@
+"""Load test: /chat under Gunicorn sync workers (app:app) vs. uvicorn (main:app).
+
+Starts each server on a throwaway SQLite database with the stub LLM backend
+(LLM_BACKEND=stub) and a fixed model latency standing in for Gemini, logs a
+few users in, then keeps `--concurrency` chats in flight until `--requests`
+have completed. Sync workers can only hold one chat each, so their
+throughput is capped at workers / latency; the ASGI process is not.
+
+    python benchmarks/bench_asgi_vs_wsgi.py --concurrency 200 --requests 1000 --latency 1.0
+
+Requires gunicorn and uvicorn on PATH.
+"""
+
+import argparse
+import asyncio
+import http.cookiejar
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def server_env(args):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"),
+        "AUTO_MIGRATE": "1",
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_LATENCY": str(args.latency),
+        "PASSWORD_POOL_SIZE": "0",
+        "BCRYPT_ROUNDS": "4",
+    })
+    return env
+
+
+def start(kind, args):
+    bind = f"127.0.0.1:{args.port}"
+    if kind == "gunicorn":
+        # --preload: AUTO_MIGRATE runs once in the master instead of racing in every worker
+        cmd = ["gunicorn", "--preload", "-w", str(args.workers), "-b", bind,
+               "--timeout", "120", "--backlog", "4096", "app:app"]
+    else:
+        cmd = ["uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port),
+               "--backlog", "4096", "--no-access-log"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=server_env(args),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://{bind}/", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    sys.exit(f"{kind} did not start")
+
+
+def login_cookie(base, n):
+    """Registers and logs in user `n`; returns its Cookie header."""
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+    def post(path, data):
+        opener.open(base + path, urllib.parse.urlencode(data).encode()).read()
+
+    email = f"bench{n}-{os.getpid()}@example.com"
+    post("/register", dict(firstName="Bench", lastName=str(n), email=email, phone="1", password="pw",
+                           gender="M", birthDate="2000-01-01", eduLevel="UG", fieldOfStudy="CS"))
+    post("/lifestyle", dict(diet="veg", physicalActivity="low", socialInteraction="low", relaxHabit="music",
+                            screenTime=5, stressLevel=6, sleepHrs=7))
+    post("/category", dict(category="Health", subcategory="Poor sleep", description="bench"))
+    post("/login", dict(email=email, password="pw"))
+    return "; ".join(f"{c.name}={c.value}" for c in jar)
+
+
+async def chat_once(host, port, cookie, timeout):
+    body = json.dumps({"message": "How do I stop overthinking before exams?"}).encode()
+    head = (f"POST /chat HTTP/1.1\r\nHost: {host}\r\nCookie: {cookie}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+    started = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(head.encode() + body)
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    status = int(data.split(b" ", 2)[1]) if data else 0
+    return status, time.perf_counter() - started
+
+
+async def load(args, cookies):
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(cookies[i % len(cookies)])
+
+    async def client():
+        nonlocal errors
+        while not queue.empty():
+            cookie = queue.get_nowait()
+            try:
+                status, elapsed = await chat_once("127.0.0.1", args.port, cookie, args.timeout)
+                if status == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+            except (OSError, asyncio.TimeoutError):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def run(kind, args):
+    proc = start(kind, args)
+    try:
+        base = f"http://127.0.0.1:{args.port}"
+        cookies = [login_cookie(base, n) for n in range(args.users)]
+        latencies, errors, wall = asyncio.run(load(args, cookies))
+    finally:
+        proc.terminate()
+        proc.wait()
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+    label = f"gunicorn sync x{args.workers}" if kind == "gunicorn" else "uvicorn main:app x1"
+    print(f"{label:>22}: {len(latencies) / wall:7.1f} chats/s  "
+          f"p50 {pct(0.5):7.0f} ms  p95 {pct(0.95):7.0f} ms  p99 {pct(0.99):7.0f} ms  "
+          f"errors {errors}  ({wall:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=200, help="chats in flight")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=1.0, help="simulated model latency (s)")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn sync workers")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--servers", nargs="+", default=["gunicorn", "uvicorn"])
+    args = parser.parse_args()
+    print(f"/chat, {args.concurrency} in flight, {args.requests} requests, model latency {args.latency}s")
+    for kind in args.servers:
+        run(kind, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Load benchmark: /register and /login throughput at different password pool sizes.
+
+Each pool size runs in a fresh interpreter against a temp SQLite database
+with the stub LLM backend. While C client threads register and log in, a
+probe thread times a cheap route to show how much bcrypt starves the rest
+of the worker.
+
+    python benchmarks/bench_auth.py --pool-sizes 0 1 2 4 --clients 8
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def child(args):
+    sys.path.insert(0, ROOT)
+    import app as mkb
+
+    stop = time.perf_counter() + args.seconds
+    counts = {"register": 0, "login": 0, "busy": 0}
+    lock = threading.Lock()
+
+    def client_loop():
+        client = mkb.app.test_client()
+        while time.perf_counter() < stop:
+            email = f"{uuid.uuid4().hex[:12]}@bench.local"
+            r = client.post("/register", data=dict(
+                firstName="Bench", lastName="User", email=email, phone="1", password="pw-123456",
+                gender="M", birthDate="2000-01-01", eduLevel="UG", fieldOfStudy="CS"))
+            key = "register" if r.status_code == 302 else "busy"
+            r2 = client.post("/login", data=dict(email=email, password="pw-123456"))
+            key2 = "login" if r2.status_code == 302 else "busy"
+            with lock:
+                counts[key] += 1
+                counts[key2] += 1
+
+    probe_latencies = []
+
+    def probe_loop():
+        client = mkb.app.test_client()
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            client.get("/activities/random?count=5")
+            probe_latencies.append(time.perf_counter() - t0)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=client_loop) for _ in range(args.clients)]
+    threads.append(threading.Thread(target=probe_loop))
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    probe_latencies.sort()
+    print(json.dumps({
+        "pool_size": args.child,
+        "register_per_s": counts["register"] / elapsed,
+        "login_per_s": counts["login"] / elapsed,
+        "rejected": counts["busy"],
+        "probe_p50_ms": statistics.median(probe_latencies) * 1e3,
+        "probe_p95_ms": probe_latencies[int(len(probe_latencies) * 0.95) - 1] * 1e3,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        return child(args)
+
+    print(f"{'pool':>4} {'register/s':>11} {'login/s':>9} {'rejected':>9} {'probe p50':>10} {'probe p95':>10}")
+    for size in args.pool_sizes:
+        env = dict(os.environ,
+                   DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"),
+                   GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "bench"),
+                   LLM_BACKEND="stub",
+                   BCRYPT_ROUNDS=str(args.rounds),
+                   PASSWORD_POOL_SIZE=str(size))
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", str(size), "--clients", str(args.clients),
+             "--seconds", str(args.seconds)],
+            env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{r['pool_size']:>4} {r['register_per_s']:>11.1f} {r['login_per_s']:>9.1f} {r['rejected']:>9} "
+              f"{r['probe_p50_ms']:>8.1f}ms {r['probe_p95_ms']:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
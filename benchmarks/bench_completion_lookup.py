@@ -0,0 +1,102 @@
+"""Benchmark: duplicate-completion lookup in /activities/complete at 1M rows.
+
+Compares the old query (date(completed_at) filter, no index) with the new
+stored completed_day column behind the unique (user_id, activity_id,
+completed_day) index, plus the insert-or-ignore upsert that replaced it.
+
+    python benchmarks/bench_completion_lookup.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+OLD_SCHEMA = """
+CREATE TABLE user_activity_completion (
+    id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, activity_id INTEGER NOT NULL,
+    completed_at DATETIME, completed_day DATE)
+"""
+NEW_INDEXES = [
+    "CREATE UNIQUE INDEX uq_completion_user_activity_day "
+    "ON user_activity_completion (user_id, activity_id, completed_day)",
+    "CREATE INDEX ix_completion_user_day ON user_activity_completion (user_id, completed_day)",
+]
+OLD_LOOKUP = ("SELECT id FROM user_activity_completion WHERE user_id = ? AND activity_id = ? "
+              "AND date(completed_at) = ? LIMIT 1")
+NEW_LOOKUP = ("SELECT id FROM user_activity_completion WHERE user_id = ? AND activity_id = ? "
+              "AND completed_day = ? LIMIT 1")
+UPSERT = ("INSERT INTO user_activity_completion (user_id, activity_id, completed_at, completed_day) "
+          "VALUES (?, ?, ?, ?) ON CONFLICT (user_id, activity_id, completed_day) DO NOTHING")
+
+
+def populate(conn, rows, users, activities):
+    start = datetime(2024, 1, 1)
+    seen = set()
+
+    def gen():
+        while len(seen) < rows:
+            u, a, d = random.randrange(users), random.randrange(activities), random.randrange(365)
+            if (u, a, d) in seen:
+                continue
+            seen.add((u, a, d))
+            ts = start + timedelta(days=d, seconds=random.randrange(86400))
+            yield u, a, ts.isoformat(" "), ts.date().isoformat()
+
+    conn.executemany("INSERT INTO user_activity_completion (user_id, activity_id, completed_at, completed_day) "
+                     "VALUES (?, ?, ?, ?)", gen())
+    conn.commit()
+
+
+def time_queries(conn, sql, probes):
+    t0 = time.perf_counter()
+    for p in probes:
+        conn.execute(sql, p).fetchone()
+    return (time.perf_counter() - t0) / len(probes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--activities", type=int, default=200)
+    parser.add_argument("--probes", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    conn = sqlite3.connect(path)
+    conn.execute(OLD_SCHEMA)
+    t0 = time.perf_counter()
+    populate(conn, args.rows, args.users, args.activities)
+    print(f"populated {args.rows:,} rows in {time.perf_counter() - t0:.1f}s")
+
+    probes = [(random.randrange(args.users), random.randrange(args.activities),
+               (datetime(2024, 1, 1) + timedelta(days=random.randrange(365))).date().isoformat())
+              for _ in range(args.probes)]
+
+    old = time_queries(conn, OLD_LOOKUP, probes)
+    print(f"old  date(completed_at) lookup, no index : {old * 1e3:9.3f} ms/query")
+
+    t0 = time.perf_counter()
+    for ddl in NEW_INDEXES:
+        conn.execute(ddl)
+    conn.commit()
+    print(f"built indexes in {time.perf_counter() - t0:.1f}s")
+
+    new = time_queries(conn, NEW_LOOKUP, probes)
+    print(f"new  completed_day lookup, unique index  : {new * 1e3:9.3f} ms/query")
+
+    t0 = time.perf_counter()
+    for u, a, d in probes:
+        conn.execute(UPSERT, (u, a, d + " 12:00:00", d))
+    conn.commit()
+    upsert = (time.perf_counter() - t0) / len(probes)
+    print(f"new  insert-or-ignore upsert             : {upsert * 1e3:9.3f} ms/write")
+    print(f"lookup speedup: {old / new:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
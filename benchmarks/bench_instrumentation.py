@@ -0,0 +1,150 @@
+"""Benchmark: cost of the request/DB/LLM instrumentation in metrics.py.
+
+Times representative routes through the Flask test client on a throwaway
+database, alternating rounds between an app built with METRICS_ENABLED=0
+(with the global SQL listeners removed for its rounds) and one with
+METRICS_ENABLED=1, and microbenchmarks the pieces that run on every request
+and every statement.
+
+    python benchmarks/bench_instrumentation.py --requests 2000
+    python benchmarks/bench_instrumentation.py --budget-us 50   # exit 1 if the hooks cost more
+
+End-to-end differences of a few tens of microseconds are within run-to-run
+noise on a 1ms request, so --budget-us is checked against the microbenchmarked
+cost of the before/after request hooks, not the route timings.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+tmp = tempfile.mkdtemp()
+os.environ.update({
+    "DATABASE_URL": "sqlite:///" + os.path.join(tmp, "bench.db"),
+    "AUTO_MIGRATE": "1",
+    "LLM_BACKEND": "stub",
+    "PASSWORD_POOL_SIZE": "0",
+    "BCRYPT_ROUNDS": "4",
+    "SLOW_REQUEST_MS": "0",
+})
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import metrics  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from flask import Response  # noqa: E402
+
+from app import create_app  # noqa: E402
+
+ROUTES = ["/", "/activities/random?count=5", "/activities/streak", "/dashboard/bootstrap"]
+
+
+def login(client):
+    client.post("/register", data=dict(firstName="Bench", lastName="User", email="bench@example.com", phone="1",
+                                       password="pw", gender="M", birthDate="2000-01-01", eduLevel="UG",
+                                       fieldOfStudy="CS"))
+    client.post("/lifestyle", data=dict(diet="veg", physicalActivity="low", socialInteraction="low",
+                                        relaxHabit="music", screenTime=5, stressLevel=6, sleepHrs=7))
+    client.post("/category", data=dict(category="Health", subcategory="Poor sleep", description="bench"))
+    client.post("/login", data=dict(email="bench@example.com", password="pw"))
+
+
+def timed_us(client, path, n):
+    started = time.perf_counter()
+    for _ in range(n):
+        client.get(path)
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def sql_listeners(on):
+    for name, fn in (("before_cursor_execute", metrics._before_cursor_execute),
+                     ("after_cursor_execute", metrics._after_cursor_execute)):
+        if on and not event.contains(Engine, name, fn):
+            event.listen(Engine, name, fn)
+        elif not on and event.contains(Engine, name, fn):
+            event.remove(Engine, name, fn)
+
+
+def measure(n, rounds):
+    """Best-of-`rounds` mean latency in microseconds per (enabled, path); the minimum is the least noisy."""
+    clients = {}
+    for enabled in (False, True):
+        clients[enabled] = create_app({"METRICS_ENABLED": enabled}).test_client()
+    login(clients[False])
+    clients[True].post("/login", data=dict(email="bench@example.com", password="pw"))
+
+    best = {}
+    for _ in range(rounds):
+        for enabled, client in clients.items():
+            sql_listeners(enabled)
+            for path in ROUTES:
+                timed_us(client, path, 20)  # warm up
+                us = timed_us(client, path, n)
+                best[enabled, path] = min(best.get((enabled, path), us), us)
+    sql_listeners(True)
+    return best, clients[True].application
+
+
+def micro_us(fn, n):
+    started = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route and round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--budget-us", type=float, help="exit 1 if instrumentation adds more than this per request")
+    args = parser.parse_args()
+
+    best, app = measure(args.requests, args.rounds)
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{'route':<30} {'off us':>9} {'on us':>9} {'overhead':>9}")
+    for path in ROUTES:
+        off, on = best[False, path], best[True, path]
+        print(f"{path:<30} {off:9.1f} {on:9.1f} {on - off:+8.1f}us ({(on - off) / off:+.1%})")
+
+    n = 200000
+    histogram = metrics.Histogram("bench_seconds", "", ("route", "method"))
+    counter = metrics.Counter("bench_total", "", ("route", "method", "status"))
+    stats = metrics.RequestStats()
+    conn = type("Conn", (), {"info": {}})()
+
+    def statement():
+        metrics._before_cursor_execute(conn, None, "SELECT 1", (), None, False)
+        metrics._after_cursor_execute(conn, None, "SELECT 1", (), None, False)
+
+    token = metrics._current.set(stats)
+    listener = micro_us(statement, n)
+    metrics._current.reset(token)
+
+    hooks = app.extensions["metrics"]
+    with app.test_request_context("/"):
+        response = Response("ok")
+
+        def request_hooks():
+            hooks._before()
+            hooks._after(response)
+
+        per_request = micro_us(request_hooks, n // 10)
+    print()
+    print(f"request hooks            {per_request:6.2f}us per request")
+    print(f"Histogram.observe        {micro_us(lambda: histogram.observe(0.012, route='/', method='GET'), n):6.2f}us")
+    print(f"Counter.inc              {micro_us(lambda: counter.inc(route='/', method='GET', status='200'), n):6.2f}us")
+    print(f"SQL listener pair        {listener:6.2f}us per statement")
+    print(f"REGISTRY.render          {micro_us(metrics.REGISTRY.render, 200):6.1f}us")
+
+    if args.budget_us is not None and per_request > args.budget_us:
+        print(f"OVER BUDGET: {per_request:.1f}us > {args.budget_us:.1f}us")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Benchmark: page rendering before/after page_cache.py.
+
+For /, /login, /register, /category and /dashboard it compares the old
+handler (render_template on every hit) with the cached route on a throwaway
+database: the time to produce the body, requests/sec through the Flask test
+client, and requests/sec for a conditional GET answered with 304. It also
+times compiling every template from source vs. from the bytecode cache.
+
+    python benchmarks/bench_page_cache.py --requests 500
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+tmp = tempfile.mkdtemp()
+os.environ.update({
+    "DATABASE_URL": "sqlite:///" + os.path.join(tmp, "bench.db"),
+    "AUTO_MIGRATE": "1",
+    "LLM_BACKEND": "stub",
+    "PASSWORD_POOL_SIZE": "0",
+    "BCRYPT_ROUNDS": "4",
+})
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import render_template  # noqa: E402
+from jinja2 import ChoiceLoader, DictLoader, Environment, FileSystemBytecodeCache, FileSystemLoader  # noqa: E402
+
+from app import create_app  # noqa: E402
+from categories_data import categories  # noqa: E402
+
+OLD_PAGES = {
+    "index": ("index.html", dict(show_quickLinks=True)),
+    "login": ("login.html", dict(show_quickLinks=True)),
+    "register": ("register.html", dict(show_quickLinks=True)),
+    "category": ("category.html", dict(show_quickLinks=False, categories=categories)),
+}
+
+
+def timed(client, path, n, headers=None):
+    client.get(path, headers=headers)  # warm up
+    started = time.perf_counter()
+    for _ in range(n):
+        response = client.get(path, headers=headers)
+    elapsed = time.perf_counter() - started
+    return elapsed / n * 1000, n / elapsed, response.status_code
+
+
+def login(client):
+    client.post("/register", data=dict(firstName="Bench", lastName="User", email="bench@example.com", phone="1",
+                                       password="pw", gender="M", birthDate="2000-01-01", eduLevel="UG",
+                                       fieldOfStudy="CS"))
+    client.post("/lifestyle", data=dict(diet="veg", physicalActivity="low", socialInteraction="low",
+                                        relaxHabit="music", screenTime=5, stressLevel=6, sleepHrs=7))
+    client.post("/category", data=dict(category="Health", subcategory="Poor sleep", description="bench"))
+    client.post("/login", data=dict(email="bench@example.com", password="pw"))
+
+
+def cold_compile(app, bytecode_dir):
+    env = Environment(loader=FileSystemLoader(os.path.join(app.root_path, app.template_folder)),
+                      bytecode_cache=FileSystemBytecodeCache(bytecode_dir) if bytecode_dir else None)
+    started = time.perf_counter()
+    for name in env.list_templates():
+        env.get_template(name)
+    return (time.perf_counter() - started) * 1000
+
+
+def render_ms(app, fn, n):
+    """Time spent producing the body, without the HTTP/test-client overhead."""
+    with app.test_request_context():
+        fn()
+        started = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - started) / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app()
+    services = app.extensions["mannkibaat"]
+
+    # the dashboard template as it was (profile block inline), for the "before" numbers
+    root = os.path.join(app.root_path, app.template_folder)
+    with open(os.path.join(root, "dashboard.html"), encoding="utf-8") as f:
+        source = f.read()
+    with open(os.path.join(root, "components", "dashboardProfile.html"), encoding="utf-8") as f:
+        source = source.replace("{{ profile }}", f.read())
+    app.jinja_env.loader = ChoiceLoader([DictLoader({"dashboard_old.html": source}), app.jinja_env.loader])
+
+    @app.route("/__old/<name>")
+    def old_page(name):
+        template, context = OLD_PAGES[name]
+        return render_template(template, **context)
+
+    @app.route("/__old_dashboard")
+    def old_dashboard():
+        ctx = services.user_context.get("bench@example.com")
+        return render_template("dashboard_old.html", user=ctx.user, lifestyle=ctx.lifestyle,
+                               categories=ctx.categories)
+
+    client = app.test_client()
+    login(client)
+    with app.app_context():
+        ctx = services.user_context.get("bench@example.com")
+    cache = services.page_cache
+
+    print(f"{'page':<11} {'render before':>14} {'after':>8} {'rps before':>11} {'after':>7} {'304':>7}")
+
+    def row(path, old_path, before, after):
+        b_ms = render_ms(app, before, args.requests)
+        a_ms = render_ms(app, after, args.requests)
+        _, b_rps, _ = timed(client, old_path, args.requests)
+        _, a_rps, _ = timed(client, path, args.requests)
+        etag = client.get(path).headers["ETag"]
+        _, n_rps, status = timed(client, path, args.requests, headers={"If-None-Match": etag})
+        assert status == 304
+        print(f"{path:<11} {b_ms:11.3f} ms {a_ms:5.3f} ms {b_rps:11.0f} {a_rps:7.0f} {n_rps:7.0f}")
+
+    for name, (template, context) in OLD_PAGES.items():
+        path = "/" if name == "index" else "/" + name
+        row(path, f"/__old/{name}",
+            lambda: render_template(template, **context),
+            lambda: cache.page(name, template, **context))
+
+    def dashboard_after():
+        shell = cache.shell("dashboard", "dashboard.html", slots=("profile",))
+        profile = ctx.memo("dashboard_profile", lambda c: cache.fragment(
+            "components/dashboardProfile.html", user=c.user, lifestyle=c.lifestyle, categories=c.categories))
+        return shell.fill(profile=profile)
+
+    row("/dashboard", "/__old_dashboard",
+        lambda: render_template("dashboard_old.html", user=ctx.user, lifestyle=ctx.lifestyle,
+                                categories=ctx.categories),
+        dashboard_after)
+
+    bytecode_dir = os.path.join(tmp, "jinja_cache")
+    os.makedirs(bytecode_dir)
+    no_cache = cold_compile(app, None)
+    cold_compile(app, bytecode_dir)  # populate
+    warm = cold_compile(app, bytecode_dir)
+    print(f"\ncompile all templates: {no_cache:.1f} ms from source, {warm:.1f} ms from bytecode cache")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
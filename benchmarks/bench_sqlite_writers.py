@@ -0,0 +1,138 @@
+"""Benchmark: concurrent writers on SQLite, default engine vs. the production profile.
+
+Simulates Gunicorn workers (processes) with a few request threads each. Every
+thread runs a mix like /activities/complete + /activities/streak: one write
+transaction (insert a completion, bump the user's streak) followed by a few
+reads. The "default" profile is a bare create_engine() (rollback journal,
+synchronous=FULL); "tuned" uses db_utils.engine_options() and
+apply_sqlite_pragmas() exactly as create_app() does.
+
+    python benchmarks/bench_sqlite_writers.py --workers 4 --threads 4 --ops 200
+
+Reports throughput, write latency and how many operations failed with
+"database is locked".
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from db_utils import apply_sqlite_pragmas, engine_options, sqlite_pragmas  # noqa: E402
+
+USERS = 200
+READS_PER_WRITE = 3
+
+
+def make_engine(profile, path, busy_timeout_ms):
+    url = "sqlite:///" + path
+    if profile == "default":
+        return create_engine(url)
+    config = {"SQLALCHEMY_DATABASE_URI": url, "SQLITE_BUSY_TIMEOUT_MS": busy_timeout_ms}
+    engine = create_engine(url, **engine_options(config))
+    apply_sqlite_pragmas(engine, sqlite_pragmas(config))
+    return engine
+
+
+def setup(path):
+    engine = create_engine("sqlite:///" + path)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, streak INTEGER, last_day DATE)"))
+        conn.execute(text("CREATE TABLE completions (id INTEGER PRIMARY KEY, user_id INTEGER, "
+                          "activity_id INTEGER, day DATE)"))
+        conn.execute(text("CREATE INDEX ix_completions_user_day ON completions (user_id, day)"))
+        conn.execute(text("INSERT INTO users (id, streak) VALUES (:id, 0)"),
+                     [{"id": i} for i in range(USERS)])
+    engine.dispose()
+
+
+def worker(profile, path, threads, ops, busy_timeout_ms, results):
+    engine = make_engine(profile, path, busy_timeout_ms)
+    latencies, errors, done = [], [], [0]
+    lock = threading.Lock()
+    since = (date.today() - timedelta(days=7)).isoformat()
+
+    def run():
+        rng = random.Random()
+        for _ in range(ops):
+            user = rng.randrange(USERS)
+            started = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("INSERT INTO completions (user_id, activity_id, day) "
+                                      "VALUES (:u, :a, :d)"),
+                                 {"u": user, "a": rng.randrange(50), "d": date.today().isoformat()})
+                    conn.execute(text("UPDATE users SET streak = streak + 1, last_day = :d WHERE id = :u"),
+                                 {"u": user, "d": date.today().isoformat()})
+                elapsed = time.perf_counter() - started
+                for _ in range(READS_PER_WRITE):
+                    with engine.connect() as conn:
+                        conn.execute(text("SELECT COUNT(*) FROM completions WHERE user_id = :u AND day >= :d"),
+                                     {"u": user, "d": since}).scalar()
+                with lock:
+                    latencies.append(elapsed)
+                    done[0] += 1
+            except OperationalError as e:
+                with lock:
+                    errors.append("locked" if "locked" in str(e) else str(e.orig))
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    engine.dispose()
+    results.put((latencies, errors, done[0]))
+
+
+def run_profile(profile, args):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    setup(path)
+    results = mp.Queue()
+    procs = [mp.Process(target=worker, args=(profile, path, args.threads, args.ops, args.busy_timeout_ms, results))
+             for _ in range(args.workers)]
+    started = time.perf_counter()
+    for p in procs:
+        p.start()
+    collected = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(l for c in collected for l in c[0])
+    errors = [e for c in collected for e in c[1]]
+    done = sum(c[2] for c in collected)
+    total = args.workers * args.threads * args.ops
+    p50 = statistics.median(latencies) * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0
+    locked = sum(1 for e in errors if e == "locked")
+    print(f"{profile:>8}: {done}/{total} ok in {wall:6.2f}s  {done / wall:7.0f} writes/s  "
+          f"write p50 {p50:7.2f} ms  p99 {p99:8.2f} ms  locked {locked}  other errors {len(errors) - locked}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4, help="processes (Gunicorn workers)")
+    parser.add_argument("--threads", type=int, default=4, help="request threads per worker")
+    parser.add_argument("--ops", type=int, default=200, help="write transactions per thread")
+    parser.add_argument("--busy-timeout-ms", type=int, default=5000)
+    parser.add_argument("--profiles", nargs="+", default=["default", "tuned"])
+    args = parser.parse_args()
+    print(f"{args.workers} workers x {args.threads} threads x {args.ops} writes "
+          f"(+{READS_PER_WRITE} reads each)")
+    for profile in args.profiles:
+        run_profile(profile, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark: worker boot time (`import app`, which builds the app via create_app()).
+
+Each run starts a fresh interpreter with `python -X importtime -c "import app"`,
+the same work a Gunicorn worker does before it can serve a request. Reports
+the median wall time, the slowest imports, and whether any of the heavy SDK
+modules (google.generativeai, grpc) were loaded at boot.
+
+    python benchmarks/bench_startup.py --runs 5 --target-ms 1500
+
+Exits non-zero when the median boot time is over the target or the SDK was
+imported eagerly.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+LAZY_MODULES = ("google.generativeai", "grpc", "google.api_core")
+
+
+def parse_importtime(stderr):
+    """Returns {module: (self_us, cumulative_us)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative))
+    return modules
+
+
+def boot_once(env):
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        sys.exit(proc.stderr[-2000:])
+    return elapsed, parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=1500,
+                        help="budget for one worker boot (interpreter start + import app)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # no API key and no auto-migrate: booting must not need either
+    env.pop("GOOGLE_API_KEY", None)
+    env["AUTO_MIGRATE"] = "0"
+
+    walls, imports, modules = [], [], {}
+    for _ in range(args.runs):
+        wall, modules = boot_once(env)
+        walls.append(wall)
+        imports.append(modules["app"][1] / 1000)
+
+    wall_ms = statistics.median(walls)
+    import_ms = statistics.median(imports)
+    print(f"boot (interpreter + import app): median {wall_ms:.0f} ms over {args.runs} runs")
+    print(f"import app (cumulative):          median {import_ms:.0f} ms")
+
+    top_level = {name: cum for name, (_, cum) in modules.items() if "." not in name and name != "app"}
+    print("\nslowest top-level imports (last run):")
+    for name, cum in sorted(top_level.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {name:<28} {cum / 1000:8.1f} ms")
+
+    eager = [name for name in LAZY_MODULES if name in modules]
+    print(f"\nlazy modules loaded at boot: {', '.join(eager) or 'none'}")
+    ok = wall_ms <= args.target_ms and not eager
+    print(f"target {args.target_ms:.0f} ms per worker: {'OK' if ok else 'FAIL'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Benchmark: dashboard trends from rollups vs aggregating the raw history.
+
+Fills a throwaway SQLite database with `--snapshots` lifestyle snapshots and
+`--completions` activity completions spread over a year for `--users` users
+(each working on one or two categories), then times
+
+  * TrendService.backfill() (rows per second, chunked),
+  * the dashboard read: TrendService.get() against the same numbers
+    computed from lifestyle_snapshot / user_activity_completion with GROUP BY,
+  * one live write (record_completion) at this history size.
+
+    python benchmarks/bench_trends.py --snapshots 1000000 --completions 1000000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+tmp = tempfile.mkdtemp()
+os.environ.update({
+    "DATABASE_URL": "sqlite:///" + os.path.join(tmp, "bench.db"),
+    "AUTO_MIGRATE": "1",
+    "LLM_BACKEND": "stub",
+    "PASSWORD_POOL_SIZE": "0",
+})
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, trends  # noqa: E402
+from categories_data import categories  # noqa: E402
+from models import db, LifestyleSnapshot, UserActivityCompletion, UserCategorySelection  # noqa: E402
+
+TODAY = date.today()
+RAW_SNAPSHOTS = text(
+    "SELECT recorded_day, COUNT(*), SUM(stressLevel), SUM(sleepHrs), SUM(screenTime) FROM lifestyle_snapshot"
+    " WHERE user_id IN (SELECT user_id FROM user_category_selection WHERE category = :category)"
+    " AND recorded_day >= :since GROUP BY recorded_day")
+RAW_COMPLETIONS = text(
+    "SELECT completed_day, COUNT(*) FROM user_activity_completion"
+    " WHERE user_id IN (SELECT user_id FROM user_category_selection WHERE category = :category)"
+    " AND completed_day >= :since GROUP BY completed_day")
+
+
+def populate(users, snapshots, completions, batch=50000):
+    names = sorted(categories)
+    selected = {u: random.sample(names, random.randint(1, 2)) for u in range(1, users + 1)}
+    start = datetime.combine(TODAY - timedelta(days=364), datetime.min.time())
+
+    def stamps(n):
+        for _ in range(n):
+            yield start + timedelta(days=random.randrange(365), seconds=random.randrange(86400))
+
+    def snapshot_rows():
+        for ts in stamps(snapshots):
+            yield dict(user_id=random.randint(1, users), diet="veg", physicalActivity="low",
+                       socialInteraction="low", relaxHabit="music", screenTime=random.randint(1, 10),
+                       stressLevel=random.randint(1, 10), sleepHrs=random.randint(4, 9),
+                       recorded_at=ts, recorded_day=ts.date())
+
+    def completion_rows():
+        seen = set()
+        while len(seen) < completions:
+            u, a, ts = random.randint(1, users), random.randint(1, 12), next(stamps(1))
+            if (u, a, ts.date()) in seen:
+                continue
+            seen.add((u, a, ts.date()))
+            yield dict(user_id=u, activity_id=a, completed_at=ts, completed_day=ts.date())
+
+    with db.engine.begin() as conn:
+        conn.execute(UserCategorySelection.__table__.insert(), [
+            dict(user_id=u, category=c, subcategory="bench", created_at=start)
+            for u, cats in selected.items() for c in cats])
+        for model, rows in ((LifestyleSnapshot, snapshot_rows()), (UserActivityCompletion, completion_rows())):
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == batch:
+                    conn.execute(model.__table__.insert(), chunk)
+                    chunk = []
+            if chunk:
+                conn.execute(model.__table__.insert(), chunk)
+    return selected
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--snapshots", type=int, default=200000)
+    parser.add_argument("--completions", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        selected = populate(args.users, args.snapshots, args.completions)
+        print(f"populated {args.snapshots} snapshots + {args.completions} completions "
+              f"for {args.users} users in {time.perf_counter() - t0:.1f}s")
+
+        t0 = time.perf_counter()
+        result = trends.backfill(chunk_size=args.chunk_size)
+        wall = time.perf_counter() - t0
+        rows = result["snapshots"] + result["completions"]
+        print(f"backfill: {result} in {wall:.1f}s ({rows / wall:,.0f} rows/s, chunk {args.chunk_size})")
+
+        probes = random.sample(sorted(selected), min(args.repeat, len(selected)))
+        since = TODAY - timedelta(weeks=trends.weeks)
+
+        def rollup_read():
+            for u in probes:
+                trends.get(u, selected[u], TODAY)
+
+        def raw_read():
+            with db.engine.connect() as conn:
+                for u in probes:
+                    for category in selected[u]:
+                        conn.execute(RAW_SNAPSHOTS, {"category": category, "since": since}).all()
+                        conn.execute(RAW_COMPLETIONS, {"category": category, "since": since}).all()
+
+        rollup_ms = best_of(rollup_read, 3) / len(probes) * 1000
+        raw_ms = best_of(raw_read, 3) / len(probes) * 1000
+        print(f"dashboard read per user: rollups {rollup_ms:.2f}ms, raw GROUP BY {raw_ms:.2f}ms "
+              f"({raw_ms / rollup_ms:.0f}x)")
+
+        u = probes[0]
+
+        def write():
+            trends.record_completion(u, selected[u], TODAY)
+            db.session.rollback()
+
+        print(f"record_completion: {best_of(write, args.repeat) * 1e6:.0f}us per write")
+
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Load test: the whole user journey, with per-route latency percentiles.
+
+Starts the app (uvicorn main:app by default) on a throwaway SQLite database
+with the stub LLM backend and a configurable model latency, then runs
+`--users` virtual users, `--concurrency` at a time. Each one replays
+
+    register -> lifestyle -> category -> login -> dashboard (+ bootstrap)
+
+and then `--iterations` rounds of
+
+    activities/random -> activities/complete -> chat -> affirmation
+
+Every request is timed on its own (redirects are not followed) and the
+report gives count, errors, p50/p95/p99 latency and throughput per route.
+A first user is run before timing starts so template compilation and
+connection setup do not land in the numbers.
+
+    python benchmarks/load_test.py --users 50 --concurrency 10 --latency 0.2 --out load.json
+    python benchmarks/load_test.py --baseline load.json   # exit 1 on regressions
+    python benchmarks/load_test.py --url http://127.0.0.1:5000   # an already running server
+
+With --baseline, a route regresses when its p95 grows by more than
+--tolerance and by at least --min-delta-ms, when its throughput drops by
+more than --tolerance, or when it starts returning errors. Latency and
+throughput are only compared for routes with --min-count requests in both
+runs: a p95 of a handful of samples is noise. Compare runs made with the
+same arguments on the same machine.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+# ---------------------------
+# Server
+# ---------------------------
+def server_env(args):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(tempfile.mkdtemp(), "load.db"),
+        "AUTO_MIGRATE": "1",
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_LATENCY": str(args.latency),
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+    })
+    return env
+
+
+def start(args):
+    if args.server == "gunicorn":
+        # --preload: AUTO_MIGRATE runs once in the master instead of racing in every worker
+        cmd = ["gunicorn", "--preload", "-w", str(args.workers), "-b", f"127.0.0.1:{args.port}",
+               "--timeout", "120", "app:app"]
+    else:
+        cmd = ["uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port), "--no-access-log"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=server_env(args),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{args.port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and proc.poll() is None:
+        try:
+            requests.get(base + "/", timeout=5)
+            return proc, base
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.kill()
+    sys.exit(f"{args.server} did not start (port {args.port} in use?)")
+
+
+# ---------------------------
+# Journey
+# ---------------------------
+class Recorder:
+    """Collects (route, seconds, ok) samples from all virtual users."""
+
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.enabled = True
+
+    def add(self, route, seconds, ok):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.samples.setdefault(route, []).append((seconds, ok))
+
+
+class User:
+    def __init__(self, base, n, recorder, timeout):
+        self.base = base
+        self.email = f"load{n}-{os.getpid()}@example.com"
+        self.http = requests.Session()
+        self.recorder = recorder
+        self.timeout = timeout
+
+    def call(self, method, route, expect=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base + route, allow_redirects=False,
+                                         timeout=self.timeout, **kwargs)
+            ok = response.status_code in expect
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.add(f"{method} {route.split('?')[0]}", time.perf_counter() - started, ok)
+        return response if ok else None
+
+    def onboard(self):
+        self.call("POST", "/register", (302,), data=dict(
+            firstName="Load", lastName="User", email=self.email, phone="1", password="pw", gender="M",
+            birthDate="2000-01-01", eduLevel="UG", fieldOfStudy="CS"))
+        self.call("POST", "/lifestyle", (302,), data=dict(
+            diet="veg", physicalActivity="low", socialInteraction="low", relaxHabit="music",
+            screenTime=5, stressLevel=6, sleepHrs=7))
+        self.call("POST", "/category", (302,), data=dict(
+            category="Health", subcategory="Poor sleep", description="load test"))
+        self.call("POST", "/login", (302,), data=dict(email=self.email, password="pw"))
+        self.call("GET", "/dashboard")
+        self.call("GET", "/dashboard/bootstrap")
+
+    def loop(self):
+        response = self.call("GET", "/activities/random?count=5")
+        activities = response.json() if response is not None else []
+        if activities and activities[0].get("id") is not None:
+            self.call("POST", "/activities/complete", json={"activity_id": activities[0]["id"]})
+        self.call("POST", "/chat", json={"message": "How do I stop overthinking before exams?"})
+        self.call("GET", "/affirmation")
+
+    def run(self, iterations):
+        self.onboard()
+        for _ in range(iterations):
+            self.loop()
+        self.http.close()
+
+
+# ---------------------------
+# Report
+# ---------------------------
+def percentile(values, p):
+    """Nearest-rank percentile of sorted `values`."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+
+def summarize(samples, wall):
+    report = {}
+    for route, rows in sorted(samples.items()):
+        latencies = sorted(s for s, ok in rows if ok)
+        report[route] = {
+            "count": len(rows),
+            "errors": sum(1 for _, ok in rows if not ok),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "rps": round(len(rows) / wall, 2),
+        }
+    return report
+
+
+def compare(routes, baseline, tolerance, min_count=20, min_delta_ms=5.0):
+    failures = []
+    for route, old in baseline.items():
+        new = routes.get(route)
+        if new is None:
+            failures.append(f"{route}: missing")
+            continue
+        if min(old["count"], new["count"]) >= min_count:
+            if old["p95_ms"] and new["p95_ms"] > old["p95_ms"] * (1 + tolerance) \
+                    and new["p95_ms"] - old["p95_ms"] >= min_delta_ms:
+                failures.append(f"{route}: p95 {old['p95_ms']}ms -> {new['p95_ms']}ms")
+            if new["rps"] < old["rps"] * (1 - tolerance):
+                failures.append(f"{route}: {old['rps']} -> {new['rps']} req/s")
+        if new["errors"] > old["errors"]:
+            failures.append(f"{route}: errors {old['errors']} -> {new['errors']}")
+    return failures
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50, help="virtual users (each runs the whole journey)")
+    parser.add_argument("--concurrency", type=int, default=10, help="users running at the same time")
+    parser.add_argument("--iterations", type=int, default=3, help="activity/chat/affirmation rounds per user")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated model latency (s)")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn sync workers")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--url", help="test this running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8798)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--out", help="write the report as JSON")
+    parser.add_argument("--baseline", help="JSON report to compare against; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth / throughput drop")
+    parser.add_argument("--min-count", type=int, default=20,
+                        help="requests a route needs in both runs before its latency/throughput is compared")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="smallest p95 growth reported (ms)")
+    args = parser.parse_args()
+
+    proc, base = (None, args.url.rstrip("/")) if args.url else start(args)
+    recorder = Recorder()
+    try:
+        recorder.enabled = False
+        User(base, "warmup", recorder, args.timeout).run(1)
+        recorder.enabled = True
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for n in range(args.users):
+                pool.submit(User(base, n, recorder, args.timeout).run, args.iterations)
+        wall = time.perf_counter() - started
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    routes = summarize(recorder.samples, wall)
+    total = sum(r["count"] for r in routes.values())
+    print(f"{args.users} users, {args.concurrency} concurrent, {args.iterations} rounds, "
+          f"model latency {args.latency}s: {total} requests in {wall:.1f}s ({total / wall:.1f} req/s)")
+    print(f"{'route':<28} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for route, r in routes.items():
+        print(f"{route:<28} {r['count']:>6} {r['errors']:>6} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['rps']:>8.1f}")
+
+    if args.out:
+        skip = ("out", "baseline", "tolerance", "min_count", "min_delta_ms")
+        params = {k: v for k, v in vars(args).items() if k not in skip}
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"commit": git_commit(), "python": platform.python_version(), "params": params,
+                       "seconds": round(wall, 2), "routes": routes}, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = compare(routes, json.load(f)["routes"], args.tolerance, args.min_count, args.min_delta_ms)
+        for failure in failures:
+            print("REGRESSION", failure)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
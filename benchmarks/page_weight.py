@@ -0,0 +1,211 @@
+"""Report: page weight and request count per template.
+
+Renders /, /login, /register, /lifestyle, /category and /dashboard on a
+throwaway database (logged in where needed) and follows what a browser would
+fetch from the HTML: stylesheets, scripts, preloaded modules and images (for
+<picture>, the first <source> candidate closest to 960px). The page and
+same-origin files are fetched through the test client with `Accept-Encoding:
+br, gzip`, so bytes are transfer sizes (inline css is counted uncompressed);
+third-party URLs are counted as requests but cannot be sized offline. Fonts
+referenced from CSS are not counted.
+
+"blocking" is the number of requests the browser must finish before the
+first paint: <head> stylesheets without a non-screen media and <head>
+scripts without defer/async.
+
+    python benchmarks/page_weight.py --out page_weight.json
+    python benchmarks/page_weight.py --baseline page_weight.json   # exit 1 on regressions
+
+Run `flask --app app build-assets` first to measure the built assets.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from html.parser import HTMLParser
+
+tmp = tempfile.mkdtemp()
+os.environ.update({
+    "DATABASE_URL": "sqlite:///" + os.path.join(tmp, "bench.db"),
+    "AUTO_MIGRATE": "1",
+    "LLM_BACKEND": "stub",
+    "PASSWORD_POOL_SIZE": "0",
+    "BCRYPT_ROUNDS": "4",
+})
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import create_app  # noqa: E402
+
+PAGES = {
+    "index.html": "/",
+    "login.html": "/login",
+    "register.html": "/register",
+    "lifestyle.html": "/lifestyle",
+    "category.html": "/category",
+    "dashboard.html": "/dashboard",
+}
+VIEWPORT = 960
+
+
+class Resources(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.in_head = True
+        self.in_noscript = False
+        self.in_style = False
+        self.inline_css = 0
+        self.found = []  # (kind, url, blocking)
+        self._picture = None
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        if tag == "body":
+            self.in_head = False
+        elif tag == "noscript":
+            self.in_noscript = True
+        elif tag == "style":
+            self.in_style = True
+        if self.in_noscript:
+            return
+        rel = (a.get("rel") or "").split()
+        if tag == "link" and "stylesheet" in rel:
+            blocking = self.in_head and a.get("media", "all") in ("all", "screen")
+            self.found.append(("css", a["href"], blocking))
+        elif tag == "link" and "modulepreload" in rel:
+            self.found.append(("js", a["href"], False))
+        elif tag == "script" and a.get("src"):
+            blocking = self.in_head and "defer" not in a and "async" not in a and a.get("type") != "module"
+            self.found.append(("js", a["src"], blocking))
+        elif tag == "picture":
+            self._picture = []
+        elif tag == "source" and self._picture is not None and a.get("srcset"):
+            self._picture.append(a["srcset"])
+        elif tag == "img":
+            srcset = self._picture[0] if self._picture else a.get("srcset")
+            self.found.append(("img", pick(srcset) if srcset else a.get("src"), False))
+            self._picture = None
+
+    def handle_endtag(self, tag):
+        if tag == "noscript":
+            self.in_noscript = False
+        elif tag == "style":
+            self.in_style = False
+        elif tag == "head":
+            self.in_head = False
+
+    def handle_data(self, data):
+        if self.in_style and not self.in_noscript:
+            self.inline_css += len(data.encode("utf-8"))
+
+
+def pick(srcset):
+    """The srcset candidate a ~960px-wide viewport would choose."""
+    candidates = []
+    for part in srcset.split(","):
+        url, _, width = part.strip().partition(" ")
+        candidates.append((int(width.rstrip("w") or 0), url))
+    candidates.sort()
+    return next((url for w, url in candidates if w >= VIEWPORT), candidates[-1][1])
+
+
+def register(client):
+    client.post("/register", data=dict(firstName="Bench", lastName="User", email="bench@example.com", phone="1",
+                                       password="pw", gender="M", birthDate="2000-01-01", eduLevel="UG",
+                                       fieldOfStudy="CS"))
+
+
+def complete_profile(client):
+    """Fills in the lifestyle/category steps and logs in, so /dashboard renders."""
+    client.post("/lifestyle", data=dict(diet="veg", physicalActivity="low", socialInteraction="low",
+                                        relaxHabit="music", screenTime=5, stressLevel=6, sleepHrs=7))
+    client.post("/category", data=dict(category="Health", subcategory="Poor sleep", description="bench"))
+    client.post("/login", data=dict(email="bench@example.com", password="pw"))
+
+
+def decode(response):
+    data = response.get_data()
+    if response.content_encoding == "br":
+        import brotli
+
+        data = brotli.decompress(data)
+    elif response.content_encoding == "gzip":
+        data = gzip.decompress(data)
+    return data.decode("utf-8")
+
+
+def measure(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "br, gzip"})
+    size = len(response.get_data())
+    parser = Resources()
+    parser.feed(decode(response))
+    row = {"html": size, "inline_css": parser.inline_css, "requests": 1,
+           "blocking": 0, "third_party": 0, "bytes": size, "css": 0, "js": 0, "img": 0}
+    for kind, url, blocking in parser.found:
+        row["requests"] += 1
+        row["blocking"] += blocking
+        if re.match(r"(https?:)?//", url):
+            row["third_party"] += 1
+            continue
+        asset = client.get(url, headers={"Accept-Encoding": "br, gzip"})
+        size = len(asset.get_data())
+        asset.close()
+        row[kind] += size
+        row["bytes"] += size
+    return row
+
+
+def compare(report, baseline, tolerance):
+    failures = []
+    for page, row in report.items():
+        old = baseline.get(page)
+        if old is None:
+            continue
+        if row["bytes"] > old["bytes"] * (1 + tolerance):
+            failures.append(f"{page}: {old['bytes']} -> {row['bytes']} bytes")
+        for key in ("requests", "blocking", "third_party"):
+            if row[key] > old[key]:
+                failures.append(f"{page}: {key} {old[key]} -> {row[key]}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", help="write the report as JSON")
+    parser.add_argument("--baseline", help="JSON report to compare against; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="allowed growth in bytes (fraction)")
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    register(client)  # /lifestyle is only shown to a freshly registered user
+
+    report = {}
+    print(f"{'page':<16} {'requests':>8} {'blocking':>8} {'3rd-party':>9} {'html':>8} {'inline css':>10} "
+          f"{'css':>8} {'js':>8} {'img':>8} {'total':>9}")
+    for template, path in PAGES.items():
+        if template == "category.html":
+            complete_profile(client)
+        row = report[template] = measure(client, path)
+        kb = lambda key: f"{row[key] / 1024:7.1f}K"  # noqa: E731
+        print(f"{template:<16} {row['requests']:>8} {row['blocking']:>8} {row['third_party']:>9} {kb('html')} "
+              f"{row['inline_css'] / 1024:9.1f}K {kb('css')} {kb('js')} {kb('img')} {row['bytes'] / 1024:8.1f}K")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = compare(report, json.load(f), args.tolerance)
+        for failure in failures:
+            print("REGRESSION", failure)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# catalog_sync.py
+#
+# Syncs static/data/activities.json into the activity table.
+#
+# The JSON array is streamed (never fully loaded), every entry gets a stable
+# content key (its "key" field, or a hash of the normalized title) and a
+# content hash. Rows whose hash is unchanged are skipped; new and changed
+# rows are written in batches with INSERT ... ON CONFLICT (key) DO UPDATE.
+# Activities that disappear from the file are left alone, since completions
+# still reference them.
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+from db_utils import dialect_insert
+
+
+def activity_key(title):
+    """Stable key for an activity without an explicit "key" field."""
+    normalized = " ".join(title.lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(row):
+    payload = json.dumps([row["title"], row["description"], row["est_time"], row["tags"]],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def iter_json_array(fp, chunk_size=1 << 16):
+    """Yields the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    started = False
+    eof = False
+    while True:
+        if not eof and len(buf) < chunk_size:
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buf += chunk
+        buf = buf.lstrip()
+        if not started:
+            if not buf:
+                if eof:
+                    return
+                continue
+            if buf[0] != "[":
+                raise ValueError("expected a JSON array")
+            buf = buf[1:]
+            started = True
+            continue
+        if buf.startswith("]"):
+            return
+        if buf.startswith(","):
+            buf = buf[1:]
+            continue
+        try:
+            item, end = decoder.raw_decode(buf)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # element spans the chunk boundary; read more
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buf += chunk
+            continue
+        yield item
+        buf = buf[end:]
+
+
+def to_row(item):
+    title = (item.get("title") or "").strip()[:200]
+    row = {
+        "title": title,
+        "description": item.get("description", "") or "",
+        "est_time": item.get("est_time", "") or "",
+        "tags": ",".join(item.get("tags", []) or []),
+    }
+    row["key"] = item.get("key") or activity_key(title)
+    row["content_hash"] = content_hash(row)
+    return row
+
+
+def sync_activities(db, model, path, batch_size=2000):
+    """Upserts activities from `path`; returns {'inserted', 'updated', 'unchanged', 'seconds'}."""
+    started = time.perf_counter()
+    existing = dict(db.session.query(model.key, model.content_hash).filter(model.key.isnot(None)))
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0}
+    table = model.__table__
+    now = datetime.utcnow()
+
+    def flush(batch):
+        if not batch:
+            return
+        stmt = dialect_insert(db.session, table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={c: stmt.excluded[c]
+                  for c in ("title", "description", "est_time", "tags", "content_hash", "updated_at")},
+        )
+        db.session.execute(stmt, batch)
+        batch.clear()
+
+    batch = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as fp:
+        for item in iter_json_array(fp):
+            row = to_row(item)
+            if not row["title"] or row["key"] in seen:
+                continue
+            seen.add(row["key"])
+            old_hash = existing.get(row["key"], False)
+            if old_hash == row["content_hash"]:
+                stats["unchanged"] += 1
+                continue
+            stats["inserted" if old_hash is False else "updated"] += 1
+            row["created_at"] = row["updated_at"] = now
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush(batch)
+    flush(batch)
+    db.session.commit()
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def watch(path, on_change, interval=2.0):
+    """Polls `path` and calls on_change() whenever its mtime changes (blocking)."""
+    last = None
+    while True:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime is not None and mtime != last:
+            last = mtime
+            on_change()
+        time.sleep(interval)
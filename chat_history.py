@@ -0,0 +1,101 @@
+# chat_history.py
+#
+# Keeps the /chat context inside a token budget.
+#
+# Layout of a compacted history:
+#   [persona prompt, greeting]          <- always kept
+#   [summary (user), ack (model)]       <- optional rolling summary of older turns
+#   [user, model, user, model, ...]     <- the most recent turns, verbatim
+#
+# The summary lives inside the history itself, so it is cached together with
+# the conversation in chat_store and only recomputed when turns fall out of
+# the window. Folding has hysteresis: the history may grow to `grow` times
+# the window (turns or tokens) before it is folded back down to the window,
+# so the summarizer (a model call) runs once every few messages instead of
+# on every message once a conversation is long.
+
+SUMMARY_PREFIX = "[Summary of our earlier conversation]\n"
+SUMMARY_ACK = "Thanks, I remember. Let's continue."
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def history_tokens(history):
+    return sum(estimate_tokens(p) for item in history for p in item["parts"])
+
+
+def extractive_summary(previous, turns, max_chars=2000):
+    """Fallback summarizer: keeps the first sentence of every folded message."""
+    lines = [previous] if previous else []
+    for item in turns:
+        text = " ".join(item["parts"]).strip()
+        first = text.split(". ")[0][:160]
+        who = "Student" if item["role"] == "user" else "Dost"
+        lines.append(f"- {who}: {first}")
+    # keep the newest part if the summary itself grows too large
+    return "\n".join(lines)[-max_chars:]
+
+
+class HistoryWindow:
+    """Sliding window over a chat history with a rolling summary of older turns.
+
+    `summarizer(previous_summary, folded_items) -> str` is called only when
+    turns are folded; it defaults to extractive_summary.
+    """
+
+    def __init__(self, token_budget=3000, keep_turns=6, head_size=2, summarizer=None, grow=1.5):
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.head_size = head_size
+        self.summarizer = summarizer or extractive_summary
+        self.grow = grow
+
+    def _split(self, history):
+        head = history[:self.head_size]
+        rest = history[self.head_size:]
+        summary = ""
+        if rest and rest[0]["role"] == "user" and rest[0]["parts"] \
+                and rest[0]["parts"][0].startswith(SUMMARY_PREFIX):
+            summary = rest[0]["parts"][0][len(SUMMARY_PREFIX):]
+            rest = rest[2:]
+        return head, summary, rest
+
+    def split(self, history):
+        """(rolling summary, verbatim turns) of a history, without the persona head."""
+        _, summary, turns = self._split(history)
+        return summary, turns
+
+    def _build(self, head, summary, turns):
+        out = list(head)
+        if summary:
+            out.append({"role": "user", "parts": [SUMMARY_PREFIX + summary]})
+            out.append({"role": "model", "parts": [SUMMARY_ACK]})
+        out.extend(turns)
+        return out
+
+    def compact(self, history):
+        """Returns the history unchanged while it is within `grow` times the window, else
+        folded back into the window (as far as head + one turn allow)."""
+        head, summary, turns = self._split(history)
+
+        # a turn is a user message plus the model reply
+        keep = self.keep_turns * 2
+        if len(turns) <= keep * self.grow and \
+                history_tokens(self._build(head, summary, turns)) <= self.token_budget * self.grow:
+            return history
+
+        folded = turns[:-keep] if len(turns) > keep else []
+        turns = turns[len(folded):]
+
+        # still over budget: fold the oldest remaining turns one at a time
+        while len(turns) > 2 and \
+                history_tokens(self._build(head, summary, turns)) > self.token_budget:
+            folded.extend(turns[:2])
+            turns = turns[2:]
+
+        if folded:
+            summary = self.summarizer(summary, folded)
+        return self._build(head, summary, turns)
@@ -0,0 +1,236 @@
+# chat_store.py
+#
+# Storage for /chat conversation history.
+#
+# We keep the *history* (plain role/parts dicts) instead of live genai
+# ChatSession objects, so a conversation can be serialized, size-accounted
+# and resumed by any Gunicorn worker via model.start_chat(history=...).
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+def serialize_history(history):
+    """Turns a genai ChatSession.history (Content objects or dicts) into plain dicts."""
+    out = []
+    for item in history:
+        if isinstance(item, dict):
+            role = item.get("role", "user")
+            parts = item.get("parts", [])
+        else:
+            role = item.role
+            parts = item.parts
+        texts = []
+        for p in parts:
+            if isinstance(p, str):
+                texts.append(p)
+            elif isinstance(p, dict):
+                texts.append(p.get("text", ""))
+            else:
+                texts.append(getattr(p, "text", ""))
+        out.append({"role": role, "parts": texts})
+    return out
+
+
+class StoreStats:
+    """Thread-safe hit / miss / eviction counters plus resident bytes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resident_bytes = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "resident_bytes": self.resident_bytes,
+            }
+
+
+class ChatSessionStore:
+    """Interface every backend implements. Keys are user emails."""
+
+    def __init__(self):
+        self.stats = StoreStats()
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def put(self, key, history):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Removes idle conversations; returns how many (run by the app's sweeper thread)."""
+        return 0
+
+    def stats_dict(self):
+        return self.stats.as_dict()
+
+
+class MemoryChatStore(ChatSessionStore):
+    """In-process LRU store bounded by entry count, total bytes and idle TTL.
+
+    Histories are kept JSON-encoded so the byte accounting is exact and
+    callers can never mutate a cached history in place.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=32 * 1024 * 1024, ttl=3600):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (blob, last_access)
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        blob, _ = self._data.pop(key)
+        self.stats.incr("resident_bytes", -len(blob))
+
+    def _evict_idle(self, now):
+        # LRU order means idle entries are at the front
+        while self._data:
+            key, (_, last) = next(iter(self._data.items()))
+            if now - last <= self.ttl:
+                break
+            self._drop(key)
+            self.stats.incr("evictions")
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.incr("misses")
+                return None
+            self._data[key] = (entry[0], now)
+            self._data.move_to_end(key)
+        self.stats.incr("hits")
+        return json.loads(entry[0])
+
+    def put(self, key, history):
+        blob = json.dumps(serialize_history(history), ensure_ascii=False).encode("utf-8")
+        now = time.monotonic()
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (blob, now)
+            self.stats.incr("resident_bytes", len(blob))
+            self._evict_idle(now)
+            while self._data and (len(self._data) > self.max_entries
+                                  or self.stats.resident_bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.stats.incr("evictions")
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+
+    def purge_expired(self):
+        with self._lock:
+            before = len(self._data)
+            self._evict_idle(time.monotonic())
+            return before - len(self._data)
+
+
+class SQLChatStore(ChatSessionStore):
+    """Shared store backed by a database table, so every worker sees the same chats.
+
+    `model` is a db.Model with `email`, `history` (text) and `updated_at` columns.
+    Rows idle for longer than `ttl` seconds count as misses and are removed.
+    """
+
+    def __init__(self, db, model, ttl=24 * 3600, bytes_max_age=60):
+        super().__init__()
+        self.db = db
+        self.model = model
+        self.ttl = ttl
+        self.bytes_max_age = bytes_max_age
+        self._bytes = (0.0, None)
+
+    def _expired(self, row):
+        return (datetime.utcnow() - row.updated_at).total_seconds() > self.ttl
+
+    def get(self, key):
+        row = self.db.session.get(self.model, key)
+        if row is None:
+            self.stats.incr("misses")
+            return None
+        if self._expired(row):
+            self.db.session.delete(row)
+            self.db.session.commit()
+            self.stats.incr("misses")
+            self.stats.incr("evictions")
+            return None
+        self.stats.incr("hits")
+        return json.loads(row.history)
+
+    def put(self, key, history):
+        blob = json.dumps(serialize_history(history), ensure_ascii=False)
+        row = self.db.session.get(self.model, key)
+        if row is None:
+            row = self.model(email=key, history=blob, updated_at=datetime.utcnow())
+            self.db.session.add(row)
+        else:
+            row.history = blob
+            row.updated_at = datetime.utcnow()
+        self.db.session.commit()
+
+    def delete(self, key):
+        row = self.db.session.get(self.model, key)
+        if row is not None:
+            self.db.session.delete(row)
+            self.db.session.commit()
+
+    def purge_expired(self):
+        """Bulk-deletes idle conversations; returns the number of rows removed."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        removed = self.model.query.filter(self.model.updated_at < cutoff).delete()
+        self.db.session.commit()
+        self.stats.incr("evictions", removed)
+        return removed
+
+    def resident_bytes(self):
+        """Total stored history size; a table scan, so reused for `bytes_max_age` seconds."""
+        read_at, cached = self._bytes
+        if cached is not None and time.monotonic() - read_at < self.bytes_max_age:
+            return cached
+        total = self.db.session.query(
+            self.db.func.coalesce(self.db.func.sum(self.db.func.length(self.model.history)), 0)
+        ).scalar()
+        self._bytes = (time.monotonic(), int(total or 0))
+        return self._bytes[1]
+
+    def stats_dict(self):
+        data = self.stats.as_dict()
+        data["resident_bytes"] = self.resident_bytes()
+        return data
+
+
+def create_chat_store(config, db=None, model=None):
+    """Builds the store selected by app.config['CHAT_STORE'] ('memory' or 'sql')."""
+    backend = config.get("CHAT_STORE", "memory")
+    if backend == "sql":
+        return SQLChatStore(db, model, ttl=config.get("CHAT_STORE_TTL", 24 * 3600))
+    return MemoryChatStore(
+        max_entries=config.get("CHAT_STORE_MAX_ENTRIES", 1000),
+        max_bytes=config.get("CHAT_STORE_MAX_BYTES", 32 * 1024 * 1024),
+        ttl=config.get("CHAT_STORE_TTL", 3600),
+    )
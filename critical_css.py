@@ -0,0 +1,295 @@
+# critical_css.py
+#
+# Per-page critical CSS, extracted at build time (assets.py).
+#
+# No headless browser is involved: a page's vocabulary is the classes, ids,
+# attribute names and elements in its first-screen markup -- the template up
+# to its {# fold #} comment, with {% include %}s expanded, <script> blocks
+# ignored, and string literals inside Jinja tags counted as possible class
+# names -- and a rule is critical when every class, id, attribute and element
+# in one of its selectors appears in it. Rules that only apply after
+# interaction (:hover, :focus, ...), in print, or to components that are never
+# on the first screen (modals, dropdown menus, the footer, ...) are left out,
+# and so are declarations that cannot change the first paint (transitions,
+# cursors, ...) and custom properties (--x: ...) that no kept rule reads. The
+# result is inlined in <head> so the first paint needs no stylesheet request;
+# the full stylesheets load without blocking and cover the rest of the page
+# and whatever scripts add later.
+#
+# Markup rendered into a page from elsewhere (e.g. the dashboard's profile
+# fragment) is declared with a Jinja comment: {# critical: components/x.html #}
+
+import os
+import re
+
+WORD = re.compile(r"[\w-]+")
+TAG = re.compile(r"<([a-zA-Z][\w-]*)")
+ATTRIBUTE = re.compile(r"""\s([a-zA-Z][\w-]*)=["']""")
+NAMES = re.compile(r"""\s(?:class|id)=(?:"([^"]*)"|'([^']*)')""")
+JINJA = re.compile(r"{[{%].*?[}%]}", re.S)
+SCRIPT = re.compile(r"<script\b.*?</script>", re.S | re.I)
+INCLUDE = re.compile(r"""{%-?\s*include\s+['"]([^'"]+)['"]""")
+EXTRA = re.compile(r"{#\s*critical:\s*(\S+)\s*#}")
+FOLD = re.compile(r"{#\s*fold\s*#}")
+OFFSCREEN = re.compile(r"[.#](?:modal|dropdown-(?:menu|item|divider|header)|offcanvas|tooltip|popover|toast|"
+                       r"footer|btn-close)[\w-]*|(?:^|[\s>+~])footer\b"
+                       r"|::?(?:-webkit-file-upload-button|file-selector-button|-webkit-datetime-edit|"
+                       r"-webkit-calendar-picker-indicator|-webkit-search|-webkit-inner-spin-button|"
+                       r"-webkit-outer-spin-button|-moz-focus-inner)")
+NO_PAINT = re.compile(r"(?:-[a-z]+-)?(?:transition|cursor|user-select|will-change|pointer-events|touch-action|"
+                      r"tap-highlight-color)(?:-[\w-]+)?\s*:")
+VAR = re.compile(r"var\(\s*(--[\w-]+)")
+INTERACTIVE = re.compile(r":(hover|focus|focus-visible|focus-within|active|visited|checked|invalid|valid|disabled)\b")
+STYLESHEETS = re.compile(r"stylesheets\(([^)]*)\)")
+QUOTED = re.compile(r"""'([^']+)'|"([^"]+)\"""")
+ALWAYS_TAGS = {"html", "body", "picture", "img", "source"}  # picture() emits the last three
+ALWAYS_ATTRIBUTES = {"srcset", "sizes", "loading", "decoding", "width", "height"}
+GROUPS = ("media", "supports", "container", "layer")
+
+
+# ---------------------------
+# Parsing
+# ---------------------------
+def _skip_string(css, i):
+    quote, i = css[i], i + 1
+    while i < len(css) and css[i] != quote:
+        i += 2 if css[i] == "\\" else 1
+    return i + 1
+
+
+def strip_comments(css):
+    out, i, start = [], 0, 0
+    while i < len(css):
+        if css[i] in "\"'":
+            i = _skip_string(css, i)
+        elif css.startswith("/*", i):
+            out.append(css[start:i])
+            end = css.find("*/", i + 2)
+            i = start = len(css) if end < 0 else end + 2
+        else:
+            i += 1
+    out.append(css[start:])
+    return "".join(out)
+
+
+def blocks(css):
+    """Top-level (prelude, body) pairs of a comment-free stylesheet; body is None for `@x ...;` statements."""
+    out, i, start, depth, open_at = [], 0, 0, 0, 0
+    while i < len(css):
+        c = css[i]
+        if c in "\"'":
+            i = _skip_string(css, i)
+            continue
+        if c == "{":
+            if depth == 0:
+                open_at = i
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                out.append((css[start:open_at].strip(), css[open_at + 1:i]))
+                start = i + 1
+        elif c == ";" and depth == 0:
+            out.append((css[start:i].strip(), None))
+            start = i + 1
+        i += 1
+    return out
+
+
+def split_selectors(prelude):
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(prelude):
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(prelude[start:i].strip())
+            start = i + 1
+    parts.append(prelude[start:].strip())
+    return parts
+
+
+def declarations(body):
+    """A rule body split into its declarations (semicolons inside strings and parentheses kept)."""
+    out, i, start, depth = [], 0, 0, 0
+    while i < len(body):
+        c = body[i]
+        if c in "\"'":
+            i = _skip_string(body, i)
+            continue
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == ";" and depth == 0:
+            out.append(body[start:i])
+            start = i + 1
+        i += 1
+    out.append(body[start:])
+    return [d.strip() for d in out if d.strip()]
+
+
+def _custom_name(declaration):
+    return declaration.split(":", 1)[0].strip() if declaration.startswith("--") else None
+
+
+def prune(css):
+    """Drops declarations that cannot change the first paint, then custom properties that no
+    remaining declaration reads (directly or through other ones)."""
+    defined, used = {}, set()
+
+    def collect(css):
+        for prelude, body in blocks(css):
+            if body is None:
+                continue
+            if prelude.startswith("@") and re.match(r"@([\w-]+)", prelude).group(1).lower() in GROUPS:
+                collect(body)
+                continue
+            if prelude.startswith("@"):
+                used.update(VAR.findall(body))  # @keyframes, @font-face
+                continue
+            for d in declarations(body):
+                name = _custom_name(d)
+                if NO_PAINT.match(d):
+                    continue
+                if name is None:
+                    used.update(VAR.findall(d))
+                else:
+                    defined.setdefault(name, []).append(d)
+
+    collect(css)
+    queue = list(used)
+    while queue:
+        for d in defined.get(queue.pop(), ()):
+            for name in VAR.findall(d.split(":", 1)[1]):
+                if name not in used:
+                    used.add(name)
+                    queue.append(name)
+
+    def rewrite(css):
+        out = []
+        for prelude, body in blocks(css):
+            if body is None:
+                out.append(prelude + ";")
+            elif prelude.startswith("@") and re.match(r"@([\w-]+)", prelude).group(1).lower() in GROUPS:
+                inner = rewrite(body)
+                if inner:
+                    out.append(f"{prelude}{{{inner}}}")
+            elif prelude.startswith("@"):
+                out.append(f"{prelude}{{{body}}}")
+            else:
+                kept = [d for d in declarations(body)
+                        if not NO_PAINT.match(d) and _custom_name(d) in (None, *used)]
+                if kept:
+                    out.append(f"{prelude}{{{';'.join(kept)}}}")
+        return "".join(out)
+
+    return rewrite(css)
+
+
+def minify(css):
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};,])\s*", r"\1", css).replace(";}", "}").strip()
+
+
+# ---------------------------
+# Extraction
+# ---------------------------
+class Vocabulary:
+    """Class/id names, attributes and elements a page's markup can produce."""
+
+    def __init__(self, markup):
+        markup = SCRIPT.sub("", markup)
+        self.words = set()
+        for a, b in NAMES.findall(markup):
+            self.words.update(WORD.findall(a or b))
+        for tag in JINJA.findall(markup):
+            for a, b in QUOTED.findall(tag):
+                self.words.update(WORD.findall(a or b))
+        self.tags = {t.lower() for t in TAG.findall(markup)} | ALWAYS_TAGS
+        self.attributes = {a.lower() for a in ATTRIBUTE.findall(markup)} | ALWAYS_ATTRIBUTES
+
+    def matches(self, selector):
+        if INTERACTIVE.search(selector) or OFFSCREEN.search(selector):
+            return False
+        attributes = re.findall(r"\[\s*([\w-]+)", selector)
+        if not all(a.lower() in self.attributes for a in attributes):
+            return False
+        s = re.sub(r"\[[^\]]*\]", "", selector)
+        previous = None
+        while previous != s:  # drop :not(...)/:is(...) arguments, innermost first
+            previous, s = s, re.sub(r"\([^()]*\)", "", s)
+        s = re.sub(r"::?[\w-]+", "", s)
+        names = re.findall(r"[.#](-?[_a-zA-Z][\w-]*)", s)
+        tags = re.findall(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)", s)
+        return all(n in self.words for n in names) and all(t.lower() in self.tags for t in tags)
+
+
+def extract(css, vocabulary):
+    """The rules of `css` whose selectors the page can match (plus @font-face and used @keyframes)."""
+    keyframes = []
+    kept = _extract(strip_comments(css), vocabulary, keyframes)
+    used = "".join(kept)
+    for name, rule in keyframes:
+        if re.search(r"(?<![\w-])" + re.escape(name) + r"(?![\w-])", used):
+            kept.append(rule)
+    return minify("".join(kept))
+
+
+def _extract(css, vocabulary, keyframes):
+    out = []
+    for prelude, body in blocks(css):
+        if body is None:
+            continue  # @charset / @import
+        if prelude.startswith("@"):
+            name = re.match(r"@([\w-]+)", prelude).group(1).lower()
+            if name == "media" and re.match(r"@media\s+print\b", prelude):
+                continue
+            if name in GROUPS:
+                inner = _extract(body, vocabulary, keyframes)
+                if inner:
+                    out.append(f"{prelude}{{{''.join(inner)}}}")
+            elif name in ("font-face", "property"):
+                out.append(f"{prelude}{{{body}}}")
+            elif name.endswith("keyframes"):
+                keyframes.append((prelude.split(None, 1)[1].strip(), f"{prelude}{{{body}}}"))
+            continue
+        selectors = [s for s in split_selectors(prelude) if vocabulary.matches(s)]
+        if selectors:
+            out.append(f"{','.join(selectors)}{{{body}}}")
+    return out
+
+
+# ---------------------------
+# Templates
+# ---------------------------
+def template_markup(template_dir, name, seen=None):
+    """A template's source up to its {# fold #} comment, with {% include %}s expanded."""
+    seen = seen if seen is not None else set()
+    if name in seen:
+        return ""
+    seen.add(name)
+    with open(os.path.join(template_dir, name), encoding="utf-8") as f:
+        source = FOLD.split(f.read(), 1)[0]
+    source = EXTRA.sub(lambda m: template_markup(template_dir, m.group(1), seen), source)
+    return INCLUDE.sub(lambda m: template_markup(template_dir, m.group(1), seen), source)
+
+
+def page_stylesheets(source):
+    """Paths passed to {{ stylesheets(...) }} in a template, in order."""
+    match = STYLESHEETS.search(source)
+    if match is None:
+        return []
+    return [a or b for a, b in QUOTED.findall(match.group(1))]
+
+
+def pages(template_dir):
+    """(template name, markup vocabulary, stylesheet paths) for every top-level page using stylesheets()."""
+    for name in sorted(os.listdir(template_dir)):
+        if not name.endswith(".html"):
+            continue
+        markup = template_markup(template_dir, name)
+        sheets = page_stylesheets(markup)
+        if sheets:
+            yield name, Vocabulary(markup), sheets
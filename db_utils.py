@@ -0,0 +1,120 @@
+# db_utils.py
+#
+# Small helpers for dialect-specific SQL that SQLAlchemy core doesn't unify.
+
+
+def dialect_insert(session, table):
+    """Returns an INSERT for `table` that supports on_conflict_do_nothing/do_update.
+
+    `session` may also be a Connection.
+    """
+    bind = session.get_bind() if hasattr(session, "get_bind") else session
+    name = bind.dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"upserts are not supported on {name}")
+    return insert(table)
+
+
+def insert_ignore_stmt(session, model, values, conflict_columns):
+    stmt = dialect_insert(session, model.__table__).values(**values)
+    return stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+
+
+def insert_ignore(session, model, values, conflict_columns):
+    """Inserts one row unless it collides with a unique index; returns True if inserted."""
+    return session.execute(insert_ignore_stmt(session, model, values, conflict_columns)).rowcount > 0
+
+
+async def ainsert_ignore(session, model, values, conflict_columns):
+    """insert_ignore() on an AsyncSession."""
+    result = await session.execute(insert_ignore_stmt(session, model, values, conflict_columns))
+    return result.rowcount > 0
+
+
+# ---------------------------------------------------------------------------
+# Engine profile
+#
+# SQLite (the default) gets WAL + pragmas on every new connection so readers
+# never block the writer and writers wait (busy_timeout) instead of failing
+# with "database is locked". Postgres gets a pre-pinged, recycled pool.
+# Pool sizes are per worker process.
+# ---------------------------------------------------------------------------
+
+def normalize_database_url(url):
+    """Hosted Postgres URLs often use the 'postgres://' scheme SQLAlchemy no longer accepts."""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def sqlite_pragmas(config):
+    return {
+        "journal_mode": "WAL",
+        "synchronous": config.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": config.get("SQLITE_BUSY_TIMEOUT_MS", 5000),
+        "mmap_size": config.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        # negative = KiB rather than pages
+        "cache_size": -config.get("SQLITE_CACHE_SIZE_KB", 64 * 1024),
+        "temp_store": "MEMORY",
+    }
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database URL."""
+    from sqlalchemy.engine import make_url
+
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    options = {
+        "pool_size": config.get("DB_POOL_SIZE", 5),
+        "max_overflow": config.get("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": config.get("DB_POOL_TIMEOUT", 10),
+    }
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            # in-memory databases live in a single connection
+            return {}
+        # busy waits are done by the busy_timeout pragma; the driver-level
+        # timeout only covers connecting while another process holds a lock
+        options["connect_args"] = {
+            "timeout": config.get("SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000,
+            "check_same_thread": False,
+        }
+    else:
+        options["pool_pre_ping"] = True
+        options["pool_recycle"] = config.get("DB_POOL_RECYCLE", 1800)
+    return options
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Runs `PRAGMA key=value` on every new DBAPI connection of a SQLite engine."""
+    from sqlalchemy import event
+
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f"PRAGMA {key}={value}")
+        finally:
+            cursor.close()
+
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def create_async_twin(engine, config):
+    """Async engine on the same database as `engine` (aiosqlite/asyncpg), with the same profile."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = engine.url.set(drivername=ASYNC_DRIVERS[engine.url.get_backend_name()])
+    options = engine_options({**config, "SQLALCHEMY_DATABASE_URI": url})
+    async_engine = create_async_engine(url, **options)
+    apply_sqlite_pragmas(async_engine.sync_engine, sqlite_pragmas(config))
+    return async_engine
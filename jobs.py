@@ -0,0 +1,289 @@
+# jobs.py
+#
+# Durable background jobs in the app database, run by `flask --app app worker`.
+#
+# Routes enqueue a job (kind + JSON payload) and answer right away; clients
+# poll GET /jobs/<id> (optionally long-polling with ?wait=N: up to 2s on the
+# Flask route, 20s on its async twin in main.py) for the result.
+# A worker claims the highest-priority job that is due with one UPDATE (FOR
+# UPDATE SKIP LOCKED on Postgres; SQLite serializes writers), runs the task
+# registered for its kind inside an app context and stores the JSON result.
+# Failures are retried with exponential backoff up to max_attempts. A job
+# whose worker died is requeued once its lease runs out. Finished jobs are
+# deleted after JOBS_RETENTION seconds.
+#
+# Tasks are plain functions registered with @task("kind"); they take the
+# payload as keyword arguments and return something JSON-serializable.
+
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+PRIORITY_INTERACTIVE = 10  # a user is waiting for it
+PRIORITY_BACKGROUND = 0
+
+TASKS = {}
+
+
+class UnknownTask(Exception):
+    """Raised when enqueueing a kind no task is registered for."""
+
+
+def task(kind, max_attempts=3):
+    """Registers the decorated function as the task for jobs of `kind`."""
+    def register(fn):
+        fn.max_attempts = max_attempts
+        TASKS[kind] = fn
+        return fn
+    return register
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class JobQueue:
+    """Enqueue/claim/finish on the `model` table (models.Job)."""
+
+    def __init__(self, db, model, lease=600, retry_delay=5, retention=86400):
+        self.db = db
+        self.model = model
+        self.lease = lease
+        self.retry_delay = retry_delay
+        self.retention = retention
+        self._stats = (0.0, None)
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+    def enqueue(self, kind, payload=None, priority=PRIORITY_BACKGROUND, delay=0, owner=None, dedupe_key=None,
+                max_attempts=None):
+        """Adds a job and returns its id.
+
+        With `dedupe_key`, a queued or running job with the same key is reused
+        instead (best effort: two enqueues racing can both insert).
+        """
+        if kind not in TASKS:
+            raise UnknownTask(kind)
+        t = self.table
+        now = datetime.utcnow()
+        with self.db.engine.begin() as conn:
+            if dedupe_key is not None:
+                existing = conn.execute(
+                    select(t.c.id).where(t.c.dedupe_key == dedupe_key, t.c.status.in_((QUEUED, RUNNING)))
+                ).scalar()
+                if existing is not None:
+                    return existing
+            return conn.execute(t.insert().values(
+                kind=kind, payload=json.dumps(payload or {}), owner=owner, dedupe_key=dedupe_key,
+                status=QUEUED, priority=priority, attempts=0,
+                max_attempts=max_attempts or TASKS[kind].max_attempts,
+                run_at=now + timedelta(seconds=delay), created_at=now,
+            )).inserted_primary_key[0]
+
+    def get(self, job_id):
+        """The job row as a dict (result decoded), or None."""
+        t = self.table
+        with self.db.engine.connect() as conn:
+            row = conn.execute(select(t).where(t.c.id == job_id)).mappings().first()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def wait(self, job_id, timeout, interval=0.25):
+        """get() that polls until the job has finished or `timeout` seconds have passed."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in (DONE, FAILED) or time.monotonic() >= deadline:
+                return job
+            time.sleep(interval)
+
+    def claim(self, worker_id):
+        """Marks the next due job as running and returns (id, kind, payload, attempts, max_attempts)."""
+        t = self.table
+        now = datetime.utcnow()
+        next_id = (select(t.c.id)
+                   .where(t.c.status == QUEUED, t.c.run_at <= now)
+                   .order_by(t.c.priority.desc(), t.c.id)
+                   .limit(1)
+                   .with_for_update(skip_locked=True)
+                   .scalar_subquery())
+        with self.db.engine.begin() as conn:
+            row = conn.execute(
+                t.update()
+                .where(t.c.id == next_id, t.c.status == QUEUED)
+                .values(status=RUNNING, attempts=t.c.attempts + 1, locked_by=worker_id, started_at=now)
+                .returning(t.c.id, t.c.kind, t.c.payload, t.c.attempts, t.c.max_attempts)
+            ).first()
+        if row is None:
+            return None
+        return row.id, row.kind, json.loads(row.payload), row.attempts, row.max_attempts
+
+    def finish(self, job_id, result):
+        t = self.table
+        with self.db.engine.begin() as conn:
+            conn.execute(t.update().where(t.c.id == job_id).values(
+                status=DONE, result=json.dumps(result), error=None, locked_by=None,
+                finished_at=datetime.utcnow()))
+
+    def fail(self, job_id, error, attempts, max_attempts):
+        """Requeues the job with backoff, or marks it failed after its last attempt."""
+        t = self.table
+        now = datetime.utcnow()
+        if attempts < max_attempts:
+            values = dict(status=QUEUED, run_at=now + timedelta(seconds=self.retry_delay * 2 ** (attempts - 1)))
+        else:
+            values = dict(status=FAILED, finished_at=now)
+        with self.db.engine.begin() as conn:
+            conn.execute(t.update().where(t.c.id == job_id).values(error=error[:2000], locked_by=None, **values))
+
+    def recover(self):
+        """Requeues running jobs whose lease has expired (their worker died); returns how many."""
+        t = self.table
+        with self.db.engine.begin() as conn:
+            return conn.execute(t.update().where(
+                t.c.status == RUNNING, t.c.started_at < datetime.utcnow() - timedelta(seconds=self.lease)
+            ).values(status=QUEUED, locked_by=None, error="lease expired")).rowcount
+
+    def purge_expired(self):
+        """Deletes finished jobs older than `retention` seconds; returns how many."""
+        t = self.table
+        with self.db.engine.begin() as conn:
+            return conn.execute(t.delete().where(
+                t.c.status.in_((DONE, FAILED)),
+                t.c.finished_at < datetime.utcnow() - timedelta(seconds=self.retention),
+            )).rowcount
+
+    def stats(self, window=900, sample=1000, max_age=1.0):
+        """Depth per status, age of the oldest due job, and wait/run percentiles of recent jobs.
+
+        Reused for `max_age` seconds, so the /metrics gauges share one read per scrape.
+        """
+        read_at, cached = self._stats
+        if cached is not None and time.monotonic() - read_at < max_age:
+            return cached
+        t = self.table
+        now = datetime.utcnow()
+        with self.db.engine.connect() as conn:
+            counts = dict(conn.execute(select(t.c.status, func.count()).group_by(t.c.status)).all())
+            oldest = conn.execute(
+                select(func.min(t.c.run_at)).where(t.c.status == QUEUED, t.c.run_at <= now)).scalar()
+            recent = conn.execute(
+                select(t.c.created_at, t.c.started_at, t.c.finished_at)
+                .where(t.c.status == DONE, t.c.finished_at >= now - timedelta(seconds=window))
+                .order_by(t.c.finished_at.desc()).limit(sample)
+            ).all()
+        waits = [(r.started_at - r.created_at).total_seconds() for r in recent]
+        runs = [(r.finished_at - r.started_at).total_seconds() for r in recent]
+        stats = {
+            "depth": {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)},
+            "oldest_queued_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+            "latency": {
+                "wait": {"p50": _percentile(waits, 0.5), "p95": _percentile(waits, 0.95)},
+                "run": {"p50": _percentile(runs, 0.5), "p95": _percentile(runs, 0.95)},
+            },
+        }
+        self._stats = (time.monotonic(), stats)
+        return stats
+
+
+class Worker:
+    """Claims and runs jobs until stopped (SIGTERM/SIGINT let the current job finish)."""
+
+    def __init__(self, app, queue, poll_interval=0.5, maintenance_interval=60):
+        self.app = app
+        self.queue = queue
+        self.poll_interval = poll_interval
+        self.maintenance_interval = maintenance_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+        self.processed = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run_once(self):
+        """Runs one due job; returns False when there was none."""
+        with self.app.app_context():
+            claimed = self.queue.claim(self.worker_id)
+            if claimed is None:
+                return False
+            job_id, kind, payload, attempts, max_attempts = claimed
+            try:
+                fn = TASKS.get(kind)
+                if fn is None:
+                    raise UnknownTask(kind)
+                result = fn(**payload)
+            except Exception as e:
+                self.app.logger.warning("job %s (%s) attempt %s/%s failed: %r",
+                                        job_id, kind, attempts, max_attempts, e)
+                self.queue.fail(job_id, repr(e), attempts, max_attempts)
+            else:
+                self.queue.finish(job_id, result)
+            self.processed += 1
+            return True
+
+    def maintain(self):
+        with self.app.app_context():
+            recovered = self.queue.recover()
+            purged = self.queue.purge_expired()
+        if recovered or purged:
+            self.app.logger.info("jobs: requeued %s expired leases, purged %s old jobs", recovered, purged)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        last_maintenance = 0.0
+        while not self.stopping:
+            if time.monotonic() - last_maintenance >= self.maintenance_interval:
+                self.maintain()
+                last_maintenance = time.monotonic()
+            try:
+                busy = self.run_once()
+            except Exception as e:  # the database itself is unavailable
+                self.app.logger.error("job worker: %r", e)
+                busy = False
+            if not busy:
+                time.sleep(self.poll_interval)
+
+
+def _worker_process(app_factory):
+    app = app_factory()
+    Worker(app, app.extensions["jobs"], poll_interval=app.config["JOBS_POLL_INTERVAL"]).run()
+
+
+def run_workers(app, app_factory, processes):
+    """Runs `processes` workers: in this process for one, else in spawned children built by `app_factory()`."""
+    if processes <= 1:
+        Worker(app, app.extensions["jobs"], poll_interval=app.config["JOBS_POLL_INTERVAL"]).run()
+        return
+    # spawn, not fork: each child opens its own database connections
+    context = multiprocessing.get_context("spawn")
+    children = [context.Process(target=_worker_process, args=(app_factory,), name=f"job-worker-{i}")
+                for i in range(processes)]
+    for child in children:
+        child.start()
+
+    def forward(signum, frame):
+        for child in children:
+            if child.is_alive():
+                os.kill(child.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for child in children:
+        child.join()
@@ -0,0 +1,487 @@
+# llm_gateway.py
+#
+# Single entry point for every Gemini call made by the app.
+#
+# - model objects are created once and reused
+# - every call gets one deadline that covers all of its attempts; each attempt
+#   passes what is left of it as the request_options timeout
+# - transient failures are retried with jittered exponential backoff
+# - a semaphore caps concurrent upstream calls per worker
+# - a circuit breaker fails fast while the upstream is unhealthy; only
+#   transport errors, timeouts and 5xx count against it (a bad request or a
+#   safety block says nothing about upstream health), and once half-open it
+#   lets a single probe through
+#
+# Routes catch LLMUnavailable and answer with a canned reply instead of a 500.
+# Every call is timed and counted per operation and outcome (metrics.py).
+# The a*-methods are the asyncio equivalents used by the ASGI routes (main.py);
+# they share the breaker but have their own, much larger, concurrency cap.
+
+import asyncio
+import random
+import threading
+import time
+
+from metrics import LLM_RETRIES, record_llm
+
+_RETRYABLE = None
+_UNHEALTHY = None
+
+
+def _load_errors():
+    # google.api_core is imported lazily; it pulls in gRPC
+    global _RETRYABLE, _UNHEALTHY
+    transport = (TimeoutError, asyncio.TimeoutError, ConnectionError)
+    try:
+        from google.api_core import exceptions as api_exceptions
+        _RETRYABLE = transport + (
+            api_exceptions.ServiceUnavailable,
+            api_exceptions.DeadlineExceeded,
+            api_exceptions.ResourceExhausted,
+            api_exceptions.InternalServerError,
+            api_exceptions.TooManyRequests,
+        )
+        _UNHEALTHY = transport + (api_exceptions.ServerError,)
+    except ImportError:
+        _RETRYABLE = _UNHEALTHY = transport
+
+
+def retryable_errors():
+    """Transient error types worth retrying."""
+    if _RETRYABLE is None:
+        _load_errors()
+    return _RETRYABLE
+
+
+def unhealthy_errors():
+    """Error types that count against the circuit breaker: transport errors, timeouts and 5xx."""
+    if _UNHEALTHY is None:
+        _load_errors()
+    return _UNHEALTHY
+
+
+class LLMUnavailable(Exception):
+    """The upstream model could not produce an answer (after retries)."""
+
+
+class CircuitOpen(LLMUnavailable):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class GatewayBusy(LLMUnavailable):
+    """Raised when no concurrency slot frees up in time."""
+
+
+class CircuitBreaker:
+    """Classic closed -> open -> half-open breaker driven by consecutive failures."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        # half-open lets one probe through; its result closes or re-opens the breaker
+        with self._lock:
+            state = self.state
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return state == "closed"
+
+    def release(self):
+        """Frees the probe slot after a call that ended without a verdict on upstream health."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._probing = False
+            self.failures += 1
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class _Recorded:
+    """Times one model call (or a whole stream) and records its outcome and token usage."""
+
+    def __init__(self, op):
+        self.op = op
+        self.usage = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            outcome = "ok"
+        elif isinstance(exc, CircuitOpen):
+            outcome = "circuit_open"
+        elif isinstance(exc, GatewayBusy):
+            outcome = "busy"
+        elif isinstance(exc, LLMUnavailable):
+            outcome = "unavailable"
+        elif isinstance(exc, Exception):
+            outcome = "error"
+        else:
+            outcome = "cancelled"  # the client went away mid-stream
+        record_llm(self.op, self.started, outcome, self.usage)
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+class StubChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, message, stream=False, **kwargs):
+        reply = self.model.reply_for(message)
+        self.history.append({"role": "user", "parts": [message]})
+        self.history.append({"role": "model", "parts": [reply]})
+        if stream:
+            return self.model.chunks(reply)
+        time.sleep(self.model.latency)
+        return StubResponse(reply)
+
+    async def send_message_async(self, message, stream=False, **kwargs):
+        reply = self.model.reply_for(message)
+        self.history.append({"role": "user", "parts": [message]})
+        self.history.append({"role": "model", "parts": [reply]})
+        if stream:
+            return self.model.achunks(reply)
+        await asyncio.sleep(self.model.latency)
+        return StubResponse(reply)
+
+
+class StubModel:
+    """Offline stand-in for genai.GenerativeModel (LLM_BACKEND=stub), with fixed latency."""
+
+    def __init__(self, model_name=None, latency=0.0, **kwargs):
+        self.model_name = model_name
+        self.latency = latency
+
+    def reply_for(self, prompt):
+        if "one affirmation per line" in prompt:
+            return "\n".join(f"You are growing stronger every day ({random.randint(0, 10**6)})."
+                             for _ in range(5))
+        if "affirmation" in prompt:
+            return "You are doing better than you think."
+        return "Main samajh sakta hoon. Chalo, ek chhota step saath mein lete hain."
+
+    def chunks(self, text):
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.latency / max(1, len(words)))
+            yield StubResponse(word + (" " if i < len(words) - 1 else ""))
+
+    async def achunks(self, text):
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.latency / max(1, len(words)))
+            yield StubResponse(word + (" " if i < len(words) - 1 else ""))
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        reply = self.reply_for(prompt)
+        if stream:
+            return self.chunks(reply)
+        time.sleep(self.latency)
+        return StubResponse(reply)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        reply = self.reply_for(prompt)
+        if stream:
+            return self.achunks(reply)
+        await asyncio.sleep(self.latency)
+        return StubResponse(reply)
+
+    def start_chat(self, history=None):
+        return StubChat(self, history)
+
+
+class LLMGateway:
+    """Shared, bounded access to the generative model.
+
+    `model_factory(model_name)` builds the underlying model object; pass a
+    stub here (or use StubModel) to run without the real API.
+    """
+
+    def __init__(self, model_name="gemini-1.5-flash", model_factory=None, api_key=None, timeout=20,
+                 retries=2, backoff=0.5, max_concurrency=8, acquire_timeout=5, breaker=None,
+                 max_async_concurrency=256):
+        self.model_name = model_name
+        self.model_factory = model_factory
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.max_async_concurrency = max_async_concurrency
+        self._async_slots = None  # (event loop, asyncio.Semaphore)
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    if self.model_factory is None:
+                        self.model_factory = self._gemini_factory()
+                    self._model = self.model_factory(self.model_name)
+        return self._model
+
+    def _gemini_factory(self):
+        # the SDK (and its gRPC/protobuf stack) is only imported on first use
+        if not self.api_key:
+            raise LLMUnavailable("API key not found. Please set the GOOGLE_API_KEY environment variable.")
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel
+
+    def _request_options(self, deadline=None):
+        remaining = self.timeout if deadline is None else deadline - time.monotonic()
+        return {"timeout": max(0.001, remaining)}
+
+    def _failed(self, exc):
+        # only transport errors, timeouts and 5xx say the upstream is unhealthy
+        if isinstance(exc, unhealthy_errors()):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def _retry_pause(self, attempt, deadline):
+        """Backoff before the next attempt, or None when out of attempts or time."""
+        # full jitter: somewhere in [0, backoff * 2^attempt]
+        pause = random.uniform(0, self.backoff * (2 ** attempt))
+        if attempt >= self.retries or time.monotonic() + pause >= deadline:
+            return None
+        return pause
+
+    def _acquire(self, deadline):
+        if not self.breaker.allow():
+            raise CircuitOpen("LLM circuit is open")
+        if not self._slots.acquire(timeout=max(0, min(self.acquire_timeout, deadline - time.monotonic()))):
+            self.breaker.release()
+            raise GatewayBusy("Too many concurrent LLM calls")
+
+    def call(self, fn, op="call"):
+        """Runs `fn(request_options)` under the concurrency cap with retries and breaker accounting;
+        all attempts share one deadline of `timeout` seconds."""
+        deadline = time.monotonic() + self.timeout
+        with _Recorded(op) as recorded:
+            self._acquire(deadline)
+            try:
+                attempt = 0
+                while True:
+                    try:
+                        result = fn(self._request_options(deadline))
+                        self.breaker.record_success()
+                        recorded.usage = getattr(result, "usage_metadata", None)
+                        return result
+                    except retryable_errors() as e:
+                        pause = self._retry_pause(attempt, deadline)
+                        if pause is None:
+                            self._failed(e)
+                            raise LLMUnavailable(str(e) or "LLM deadline exceeded") from e
+                        LLM_RETRIES.inc(op=op)
+                        time.sleep(pause)
+                        attempt += 1
+                    except Exception as e:
+                        self._failed(e)
+                        raise
+                    except BaseException:
+                        self.breaker.release()
+                        raise
+            finally:
+                self._slots.release()
+
+    def stream(self, fn, op="stream"):
+        """Yields text chunks from `fn(request_options)` (a streaming call); no retries once chunks flow."""
+        with _Recorded(op) as recorded:
+            self._acquire(time.monotonic() + self.timeout)
+            try:
+                try:
+                    for chunk in fn(self._request_options()):
+                        recorded.usage = getattr(chunk, "usage_metadata", None) or recorded.usage
+                        if chunk.text:
+                            yield chunk.text
+                except retryable_errors() as e:
+                    self._failed(e)
+                    raise LLMUnavailable(str(e)) from e
+                except Exception as e:
+                    self._failed(e)
+                    raise
+                except BaseException:
+                    self.breaker.release()  # the client went away mid-stream
+                    raise
+                self.breaker.record_success()
+            finally:
+                self._slots.release()
+
+    def generate(self, prompt):
+        """Returns the generated text for a single prompt."""
+        return self.call(lambda options: self.model().generate_content(
+            prompt, request_options=options), op="generate").text
+
+    def generate_stream(self, prompt):
+        return self.stream(lambda options: self.model().generate_content(
+            prompt, stream=True, request_options=options), op="generate_stream")
+
+    def start_chat(self, history):
+        return GatewayChat(self, self.model().start_chat(history=history))
+
+    # ---- asyncio ------------------------------------------------------
+
+    def _loop_slots(self):
+        # asyncio primitives belong to one event loop
+        loop = asyncio.get_running_loop()
+        if self._async_slots is None or self._async_slots[0] is not loop:
+            self._async_slots = (loop, asyncio.Semaphore(self.max_async_concurrency))
+        return self._async_slots[1]
+
+    async def _aacquire(self, deadline):
+        if not self.breaker.allow():
+            raise CircuitOpen("LLM circuit is open")
+        slots = self._loop_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), max(0, min(self.acquire_timeout, deadline - time.monotonic())))
+        except asyncio.TimeoutError:
+            self.breaker.release()
+            raise GatewayBusy("Too many concurrent LLM calls")
+        return slots
+
+    async def acall(self, fn, op="call"):
+        """Async call(): `fn(request_options)` returns an awaitable, cancelled when the deadline passes."""
+        deadline = time.monotonic() + self.timeout
+        with _Recorded(op) as recorded:
+            slots = await self._aacquire(deadline)
+            try:
+                attempt = 0
+                while True:
+                    try:
+                        options = self._request_options(deadline)
+                        result = await asyncio.wait_for(fn(options), options["timeout"])
+                        self.breaker.record_success()
+                        recorded.usage = getattr(result, "usage_metadata", None)
+                        return result
+                    except retryable_errors() as e:
+                        pause = self._retry_pause(attempt, deadline)
+                        if pause is None:
+                            self._failed(e)
+                            raise LLMUnavailable(str(e) or "LLM deadline exceeded") from e
+                        LLM_RETRIES.inc(op=op)
+                        await asyncio.sleep(pause)
+                        attempt += 1
+                    except Exception as e:
+                        self._failed(e)
+                        raise
+                    except BaseException:
+                        self.breaker.release()  # cancelled
+                        raise
+            finally:
+                slots.release()
+
+    async def astream(self, fn, op="stream"):
+        """Async stream(): `await fn(request_options)` returns an async iterable of chunks."""
+        with _Recorded(op) as recorded:
+            slots = await self._aacquire(time.monotonic() + self.timeout)
+            try:
+                try:
+                    async for chunk in await fn(self._request_options()):
+                        recorded.usage = getattr(chunk, "usage_metadata", None) or recorded.usage
+                        if chunk.text:
+                            yield chunk.text
+                except retryable_errors() as e:
+                    self._failed(e)
+                    raise LLMUnavailable(str(e)) from e
+                except Exception as e:
+                    self._failed(e)
+                    raise
+                except BaseException:
+                    self.breaker.release()  # the client went away mid-stream
+                    raise
+                self.breaker.record_success()
+            finally:
+                slots.release()
+
+    async def agenerate(self, prompt):
+        response = await self.acall(lambda options: self.model().generate_content_async(
+            prompt, request_options=options), op="generate")
+        return response.text
+
+    def agenerate_stream(self, prompt):
+        return self.astream(lambda options: self.model().generate_content_async(
+            prompt, stream=True, request_options=options), op="generate_stream")
+
+
+class GatewayChat:
+    """A chat session whose sends go through the gateway."""
+
+    def __init__(self, gateway, chat):
+        self.gateway = gateway
+        self.chat = chat
+
+    @property
+    def history(self):
+        return self.chat.history
+
+    def send_message(self, message):
+        return self.gateway.call(lambda options: self.chat.send_message(
+            message, request_options=options), op="chat")
+
+    def send_message_stream(self, message):
+        return self.gateway.stream(lambda options: self.chat.send_message(
+            message, stream=True, request_options=options), op="chat_stream")
+
+    async def asend_message(self, message):
+        return await self.gateway.acall(lambda options: self.chat.send_message_async(
+            message, request_options=options), op="chat")
+
+    def asend_message_stream(self, message):
+        return self.gateway.astream(lambda options: self.chat.send_message_async(
+            message, stream=True, request_options=options), op="chat_stream")
+
+
+def create_gateway(config):
+    """Builds the gateway from app.config (LLM_* keys)."""
+    factory = None
+    if config.get("LLM_BACKEND") == "stub":
+        latency = config.get("LLM_STUB_LATENCY", 0.0)
+        factory = lambda name: StubModel(name, latency=latency)
+    return LLMGateway(
+        model_name=config.get("LLM_MODEL", "gemini-1.5-flash"),
+        model_factory=factory,
+        api_key=config.get("GOOGLE_API_KEY"),
+        timeout=config.get("LLM_TIMEOUT", 20),
+        retries=config.get("LLM_RETRIES", 2),
+        max_concurrency=config.get("LLM_MAX_CONCURRENCY", 8),
+        max_async_concurrency=config.get("LLM_ASYNC_MAX_CONCURRENCY", 256),
+        breaker=CircuitBreaker(
+            failure_threshold=config.get("LLM_BREAKER_THRESHOLD", 5),
+            reset_timeout=config.get("LLM_BREAKER_RESET", 30),
+        ),
+    )
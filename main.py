@@ -0,0 +1,455 @@
+# main.py
+#
+# ASGI entry point (render.yaml runs `uvicorn main:app`).
+#
+# The I/O-bound JSON routes -- /chat, /affirmation (plus their /stream
+# variants), /activities/*, /dashboard/{bootstrap,trends} and /jobs/<id> -- are async handlers
+# here: Gemini calls go through the gateway's async client and DB access
+# through an aiosqlite/asyncpg engine, so one process can keep hundreds of
+# chats in flight. Every other URL (pages, forms, login, static files) is the Flask
+# app from app.py, mounted as WSGI. Both halves share the same service
+# objects and the same server-side sessions (session_store.py) and report
+# into the same /metrics registry.
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import joinedload
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import (app as flask_app, CHAT_ERROR_MSG, FALLBACK_AFFIRMATIONS, FALLBACK_CHAT_REPLY, JOB_WAIT_MAX_ASYNC,
+                 affirmation_prompt_for, compact_history, initial_chat_history, job_payload, job_wait,
+                 queued_affirmation, rate_limit_payload, sse_event, streak_payload)
+from chat_store import SQLChatStore, serialize_history
+from db_utils import ainsert_ignore, create_async_twin
+from llm_gateway import LLMUnavailable
+from metrics import ASGIInstrumentation
+from models import db, passwords, Userdb, UserActivityCompletion
+from rate_limit import MemoryBucketStore
+from trends import category_names
+
+services = flask_app.extensions['mannkibaat']
+logger = flask_app.logger
+with flask_app.app_context():
+    engine = create_async_twin(db.engine, flask_app.config)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+# ---------------------------
+# Helpers
+# ---------------------------
+async def flask_session(request):
+    """The server-side session of this request, read from the store at most once per request.
+
+    Read-only: login/logout stay Flask routes.
+    """
+    if not hasattr(request.state, 'session'):
+        cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+        request.state.session = await in_app(flask_app.session_interface.load, flask_app, cookie) if cookie else {}
+    return request.state.session
+
+
+def in_app(fn, *args):
+    """Runs a blocking helper that needs the Flask app context on the threadpool."""
+    def call():
+        with flask_app.app_context():
+            return fn(*args)
+    return run_in_threadpool(call)
+
+
+async def request_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def sse_response(events):
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def unauthorized():
+    return JSONResponse({"error": "Authentication required. Please log in again."}, status_code=401)
+
+
+async def over_limit(email):
+    """Async twin of app.over_limit(): a 429 response once `email` is out of model calls, else None."""
+    limiter = services.rate_limiter
+    # the memory store is a dict update; the SQL/Redis stores do blocking I/O
+    if isinstance(limiter.store, MemoryBucketStore):
+        decision = limiter.hit(email)
+    else:
+        decision = await in_app(limiter.hit, email)
+    if decision.allowed:
+        return None
+    return JSONResponse(rate_limit_payload(decision), status_code=429,
+                        headers={"Retry-After": str(decision.retry_after)})
+
+
+# ---------------------------
+# Async loaders
+# ---------------------------
+async def load_user_rows(email):
+    """Async twin of app.load_user_rows()."""
+    async with Session() as s:
+        result = await s.execute(
+            select(Userdb)
+            .options(joinedload(Userdb.lifestyle), joinedload(Userdb.category_selections))
+            .filter_by(email=email)
+        )
+        user = result.unique().scalars().first()
+    if user is None:
+        return None
+    lifestyle = user.lifestyle[0] if user.lifestyle else None
+    return user, lifestyle, user.category_selections
+
+
+async def user_context(email):
+    return await services.user_context.aget(email, load_user_rows)
+
+
+async def load_affirmation_prompt(email):
+    return affirmation_prompt_for(await user_context(email))
+
+
+async def chat_store(method, *args):
+    # the memory store is a dict lookup; the SQL store does blocking I/O
+    if isinstance(services.chat_store, SQLChatStore):
+        return await in_app(method, *args)
+    return method(*args)
+
+
+async def load_chat_history(email):
+    history = await chat_store(services.chat_store.get, email)
+    if history is not None:
+        return history
+    return initial_chat_history(await user_context(email))
+
+
+async def start_user_chat(history, user_message):
+    # compaction may call the summarizer (a sync model call), so it runs off the loop
+    history, prompt_tokens = await in_app(compact_history, history, user_message)
+    return services.llm.start_chat(history), prompt_tokens
+
+
+# ---------------------------
+# Async routes
+# ---------------------------
+async def affirmation(request):
+    email = (await flask_session(request)).get('email')
+    if not email:
+        return unauthorized()
+    limited = await over_limit(email)
+    if limited:
+        return limited
+    if request.query_params.get('async'):
+        payload, status = await in_app(queued_affirmation, email)
+        return JSONResponse(payload, status_code=status,
+                            headers={"Location": payload["status_url"]} if status == 202 else None)
+
+    llm, pool = services.llm, services.affirmation_pool
+    try:
+        text = await pool.atake(email, lambda: load_affirmation_prompt(email), llm.agenerate)
+        if text is None:
+            prompt = await load_affirmation_prompt(email)
+            if prompt is None:
+                return JSONResponse({"error": "Could not retrieve user data to personalize affirmation."},
+                                    status_code=500)
+            text = await llm.agenerate(prompt)
+
+        return JSONResponse({"affirmation": text.strip()})
+
+    except LLMUnavailable as e:
+        logger.warning("LLM unavailable for affirmation, serving cached one: %s", e)
+        text = pool.recent(email) or random.choice(FALLBACK_AFFIRMATIONS)
+        return JSONResponse({"affirmation": text, "degraded": True})
+
+    except Exception:
+        logger.exception("Error generating affirmation")
+        return JSONResponse({"error": "Failed to generate affirmation."}, status_code=500)
+
+
+async def affirmation_stream(request):
+    email = (await flask_session(request)).get('email')
+    if not email:
+        return unauthorized()
+    limited = await over_limit(email)
+    if limited:
+        return limited
+
+    llm, pool = services.llm, services.affirmation_pool
+    try:
+        pooled = await pool.atake(email, lambda: load_affirmation_prompt(email), llm.agenerate)
+    except LLMUnavailable as e:
+        logger.warning("LLM unavailable for affirmation, serving cached one: %s", e)
+        pooled = pool.recent(email) or random.choice(FALLBACK_AFFIRMATIONS)
+    except Exception:
+        logger.exception("Affirmation pool error")
+        pooled = None
+    if pooled:
+        return sse_response(iter([sse_event({"delta": pooled.strip()}), sse_event({}, event="done")]))
+
+    prompt = await load_affirmation_prompt(email)
+    if prompt is None:
+        return JSONResponse({"error": "Could not retrieve user data to personalize affirmation."}, status_code=500)
+
+    async def events():
+        try:
+            async for text in llm.agenerate_stream(prompt):
+                yield sse_event({"delta": text})
+            yield sse_event({}, event="done")
+        except Exception:
+            logger.exception("Error streaming affirmation")
+            yield sse_event({"error": "Failed to generate affirmation."}, event="error")
+
+    return sse_response(events())
+
+
+async def chat(request):
+    email = (await flask_session(request)).get('email')
+    if not email:
+        return unauthorized()
+
+    user_message = (await request_json(request) or {}).get('message')
+    if not user_message:
+        return JSONResponse({"error": "Message cannot be empty."}, status_code=400)
+    limited = await over_limit(email)
+    if limited:
+        return limited
+
+    try:
+        history = await load_chat_history(email)
+        if history is None:
+            return JSONResponse({"error": "Could not retrieve user data to personalize chat."}, status_code=500)
+
+        user_chat, prompt_tokens = await start_user_chat(history, user_message)
+        response = await user_chat.asend_message(user_message)
+        await chat_store(services.chat_store.put, email, serialize_history(user_chat.history))
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and getattr(usage, "prompt_token_count", None):
+            prompt_tokens = usage.prompt_token_count
+
+        return JSONResponse({"reply": response.text, "prompt_tokens": prompt_tokens})
+
+    except LLMUnavailable as e:
+        logger.warning("LLM unavailable in /chat route: %s", e)
+        return JSONResponse({"reply": FALLBACK_CHAT_REPLY, "degraded": True})
+
+    except Exception:
+        logger.exception("An error occurred in /chat route")
+        return JSONResponse({"error": CHAT_ERROR_MSG}, status_code=500)
+
+
+async def chat_stream(request):
+    email = (await flask_session(request)).get('email')
+    if not email:
+        return unauthorized()
+
+    user_message = (await request_json(request) or {}).get('message')
+    if not user_message:
+        return JSONResponse({"error": "Message cannot be empty."}, status_code=400)
+    limited = await over_limit(email)
+    if limited:
+        return limited
+
+    history = await load_chat_history(email)
+    if history is None:
+        return JSONResponse({"error": "Could not retrieve user data to personalize chat."}, status_code=500)
+
+    async def events():
+        try:
+            user_chat, prompt_tokens = await start_user_chat(history, user_message)
+            async for text in user_chat.asend_message_stream(user_message):
+                yield sse_event({"delta": text})
+            await chat_store(services.chat_store.put, email, serialize_history(user_chat.history))
+            yield sse_event({"prompt_tokens": prompt_tokens}, event="done")
+        except LLMUnavailable as e:
+            logger.warning("LLM unavailable in /chat/stream route: %s", e)
+            yield sse_event({"delta": FALLBACK_CHAT_REPLY})
+            yield sse_event({"degraded": True}, event="done")
+        except Exception:
+            logger.exception("An error occurred in /chat/stream route")
+            yield sse_event({"error": CHAT_ERROR_MSG}, event="error")
+
+    return sse_response(events())
+
+
+def query_count(request):
+    try:
+        return int(request.query_params.get('count', 5))
+    except ValueError:
+        return 5
+
+
+async def activities_random(request):
+    # the catalog is in memory; only its periodic version check touches the (sync) DB
+    body = await in_app(services.activity_catalog.sample_json, query_count(request))
+    return Response(body, media_type='application/json')
+
+
+async def activities_recommended(request):
+    count = query_count(request)
+    email = (await flask_session(request)).get('email')
+    ctx = await user_context(email) if email else None
+    if ctx is None:
+        return await activities_random(request)
+    return JSONResponse(await recommended_activities(email, ctx, count))
+
+
+async def recommended_activities(email, ctx, count):
+    recommender = services.recommender
+    today = datetime.utcnow().date()
+    scores = recommender.cached(email)
+    if scores is None:
+        async with Session() as s:
+            result = await s.execute(
+                select(UserActivityCompletion.activity_id, UserActivityCompletion.completed_day)
+                .where(UserActivityCompletion.user_id == ctx.user_id,
+                       UserActivityCompletion.completed_day >= today - timedelta(days=30))
+            )
+            completions = result.all()
+        # the build reads the activity catalog, whose version check is a (sync) DB query
+        scores = await in_app(recommender.build, email, ctx.categories, ctx.lifestyle, completions, today)
+    return recommender.top(scores, count, today=today)
+
+
+async def activities_complete(request):
+    email = (await flask_session(request)).get('email')
+    if not email:
+        return JSONResponse({'error': 'login required'}, status_code=401)
+    ctx = await user_context(email)
+    if ctx is None:
+        return JSONResponse({'error': 'user not found'}, status_code=404)
+
+    payload = await request_json(request) or {}
+    activity_id = payload.get('activity_id') or payload.get('id')  # accept both keys
+    if not activity_id:
+        return JSONResponse({'error': 'missing activity_id'}, status_code=400)
+    try:
+        activity_id = int(activity_id)
+    except (TypeError, ValueError):
+        return JSONResponse({'error': 'invalid activity_id'}, status_code=400)
+
+    streaks = services.streaks
+    now = datetime.utcnow()
+    today = now.date()
+    async with Session() as s:
+        async with s.begin():
+            inserted = await ainsert_ignore(
+                s, UserActivityCompletion,
+                dict(user_id=ctx.user_id, activity_id=activity_id, completed_at=now, completed_day=today),
+                ['user_id', 'activity_id', 'completed_day'],
+            )
+            if inserted:
+                await streaks.arecord(s, ctx.user_id, today)
+                await services.trends.arecord_completion(s, ctx.user_id, category_names(ctx), today)
+        if not inserted:
+            return JSONResponse({'success': True, 'message': 'already completed today',
+                                 'new_streak': (await streaks.aget(s, ctx.user_id, today))['current']})
+
+        streaks.invalidate(ctx.user_id)
+        services.user_context.invalidate(email)
+        services.recommender.record_completion(email, activity_id, today=today)
+        return JSONResponse({'success': True, 'new_streak': (await streaks.aget(s, ctx.user_id, today))['current']})
+
+
+async def activities_streak(request):
+    email = (await flask_session(request)).get('email')
+    ctx = await user_context(email) if email else None
+    if ctx is None:
+        return JSONResponse({"streak": 0})
+
+    async with Session() as s:
+        stats = await services.streaks.aget(s, ctx.user_id, datetime.utcnow().date())
+    return JSONResponse(streak_payload(stats))
+
+
+async def dashboard_bootstrap(request):
+    """Async twin of app.dashboard_bootstrap()."""
+    email = (await flask_session(request)).get('email')
+    ctx = await user_context(email) if email else None
+    if ctx is None:
+        return unauthorized()
+
+    async with Session() as s:
+        stats = await services.streaks.aget(s, ctx.user_id, datetime.utcnow().date())
+    text = services.affirmation_pool.take_nowait(email, lambda: affirmation_prompt_for(ctx))
+    return JSONResponse({
+        "streak": streak_payload(stats),
+        "activities": await recommended_activities(email, ctx, query_count(request)),
+        "affirmation": (text or "").strip() or None,
+    }, headers={"Cache-Control": "private, no-store"})
+
+
+async def dashboard_trends(request):
+    """Async twin of app.dashboard_trends()."""
+    email = (await flask_session(request)).get('email')
+    ctx = await user_context(email) if email else None
+    if ctx is None:
+        return unauthorized()
+
+    async with Session() as s:
+        trends = await services.trends.aget(s, ctx.user_id, category_names(ctx), datetime.utcnow().date())
+    return JSONResponse(trends, headers={"Cache-Control": "private, no-store"})
+
+
+async def job_status(request):
+    """Async twin of app.job_status(); ?wait=N long-polls for up to 20s without holding a thread."""
+    email = (await flask_session(request)).get('email')
+    if not email:
+        return unauthorized()
+
+    job_id = request.path_params['job_id']
+    job = await in_app(services.jobs.get, job_id)
+    if job is None or job['owner'] != email:
+        return JSONResponse({"error": "Job not found."}, status_code=404)
+    deadline = time.monotonic() + job_wait(request.query_params.get('wait'), JOB_WAIT_MAX_ASYNC)
+    while job['status'] not in ('done', 'failed') and time.monotonic() < deadline:
+        await asyncio.sleep(0.25)
+        job = await in_app(services.jobs.get, job_id) or job
+    return JSONResponse(job_payload(job), headers={"Cache-Control": "no-store"})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+    await run_in_threadpool(passwords.close)
+
+
+app = Starlette(
+    routes=[
+        Route('/affirmation', affirmation),
+        Route('/affirmation/stream', affirmation_stream),
+        Route('/chat', chat, methods=['POST']),
+        Route('/chat/stream', chat_stream, methods=['POST']),
+        Route('/activities/random', activities_random),
+        Route('/activities/recommended', activities_recommended),
+        Route('/activities/complete', activities_complete, methods=['POST']),
+        Route('/activities/streak', activities_streak),
+        Route('/dashboard/bootstrap', dashboard_bootstrap),
+        Route('/dashboard/trends', dashboard_trends),
+        Route('/jobs/{job_id:int}', job_status),
+        # everything else (pages, forms, login, static files) is served by Flask
+        Mount('/', WSGIMiddleware(flask_app)),
+    ],
+    middleware=[
+        # times the async routes above; Flask requests are timed by its own hooks (metrics.py)
+        Middleware(ASGIInstrumentation, logger=flask_app.logger,
+                   slow_seconds=flask_app.config['SLOW_REQUEST_MS'] / 1000,
+                   enabled=flask_app.config['METRICS_ENABLED']),
+    ],
+    lifespan=lifespan,
+)
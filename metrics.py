@@ -0,0 +1,374 @@
+# metrics.py
+#
+# Request-level instrumentation, exposed in Prometheus text format on /metrics.
+#
+# - Counter/Gauge/Histogram are small in-process metrics (no client library).
+#   Values are per worker process; with several workers, scrape each one or
+#   sum in the query.
+# - Instrumentation hooks Flask's request cycle and SQLAlchemy's cursor events
+#   (on every Engine, so main.py's async twin is covered too): latency per
+#   route, DB queries and DB time per request, and a warning with the
+#   heaviest statements for requests slower than SLOW_REQUEST_MS.
+# - ASGIInstrumentation does the same for the async routes in main.py; URLs
+#   mounted from Flask are left to the Flask hooks.
+# - The LLM gateway and the password hasher record their own latency and
+#   outcome counters here (llm_*, password_*).
+#
+# The hot path is a perf_counter() pair, a dict lookup and a few additions
+# under a lock per metric; benchmarks/bench_instrumentation.py measures it.
+#
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>"; without a token
+# it only answers scrapes from the same host.
+
+import bisect
+import contextvars
+import hmac
+import threading
+import time
+
+from flask import Response, current_app, got_request_exception, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SLOW_QUERIES_LOGGED = 5
+LOOPBACK = ("127.0.0.1", "::1")
+
+
+# ---------------------------
+# Metric types
+# ---------------------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels[n] for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(Metric):
+    """Read at scrape time from `read()`: a number, or a dict of label tuple -> number."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, read, labels=()):
+        super().__init__(name, help, labels)
+        self.read = read
+
+    def render(self):
+        try:
+            value = self.read()
+        except Exception:
+            return []  # a broken reader must not break the whole scrape
+        items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, ([*s[0]], s[1], s[2])) for k, s in self._values.items())
+        lines = self.header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Adds `metric` (replacing one of the same name) and returns it."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, read, labels=()):
+        return self.register(Gauge(name, help, read, labels))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "Requests by route, method and status.",
+                                 ("route", "method", "status"))
+HTTP_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "Request latency by route.",
+                                  ("route", "method"))
+HTTP_EXCEPTIONS = REGISTRY.counter("http_request_exceptions_total", "Unhandled exceptions by route.",
+                                   ("route", "exception"))
+REQUEST_DB_QUERIES = REGISTRY.histogram("http_request_db_queries", "SQL statements per request.",
+                                        ("route",), buckets=COUNT_BUCKETS)
+REQUEST_DB_TIME = REGISTRY.histogram("http_request_db_seconds", "Time in SQL statements per request.",
+                                     ("route",))
+DB_QUERIES = REGISTRY.counter("db_queries_total", "SQL statements executed (inside or outside requests).")
+DB_LATENCY = REGISTRY.histogram("db_query_duration_seconds", "SQL statement latency.",
+                                buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+LLM_REQUESTS = REGISTRY.counter("llm_requests_total", "Model calls by operation and outcome.", ("op", "outcome"))
+LLM_LATENCY = REGISTRY.histogram("llm_request_duration_seconds", "Model call latency (streams: until the last chunk).",
+                                 ("op",))
+LLM_RETRIES = REGISTRY.counter("llm_retries_total", "Retried model calls.", ("op",))
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "Tokens reported by the model's usage metadata.",
+                              ("op", "kind"))
+PASSWORD_LATENCY = REGISTRY.histogram("password_hash_duration_seconds", "bcrypt hash/verify latency, queueing included.",
+                                      ("op",))
+
+
+# ---------------------------
+# Per-request accounting
+# ---------------------------
+class RequestStats:
+    __slots__ = ("started", "queries", "db_time", "statements", "llm_time")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = []  # (seconds, statement) for the slow-request log
+        self.llm_time = 0.0
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_stats():
+    """The RequestStats of the request being handled, or None."""
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_QUERIES.inc()
+    DB_LATENCY.observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+        stats.statements.append((elapsed, statement))
+
+
+def _listen_engines():
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def record_llm(op, started, outcome, usage=None):
+    """Called by the LLM gateway when a call (or a stream) finishes."""
+    elapsed = time.perf_counter() - started
+    LLM_REQUESTS.inc(op=op, outcome=outcome)
+    LLM_LATENCY.observe(elapsed, op=op)
+    if usage is not None:
+        for kind, attr in (("prompt", "prompt_token_count"), ("completion", "candidates_token_count")):
+            tokens = getattr(usage, attr, None)
+            if tokens:
+                LLM_TOKENS.inc(tokens, op=op, kind=kind)
+    stats = _current.get()
+    if stats is not None:
+        stats.llm_time += elapsed
+
+
+def finish_request(stats, route, method, status, logger, slow_seconds):
+    elapsed = time.perf_counter() - stats.started
+    HTTP_REQUESTS.inc(route=route, method=method, status=str(status))
+    HTTP_LATENCY.observe(elapsed, route=route, method=method)
+    REQUEST_DB_QUERIES.observe(stats.queries, route=route)
+    REQUEST_DB_TIME.observe(stats.db_time, route=route)
+    if slow_seconds and elapsed >= slow_seconds:
+        heaviest = sorted(stats.statements, key=lambda s: s[0], reverse=True)[:SLOW_QUERIES_LOGGED]
+        breakdown = "".join(f"\n  {t * 1000:7.1f}ms  {' '.join(sql.split())[:200]}" for t, sql in heaviest)
+        logger.warning("slow request %s %s %s: %.1fms (db %d queries %.1fms, llm %.1fms)%s",
+                       method, route, status, elapsed * 1000, stats.queries, stats.db_time * 1000,
+                       stats.llm_time * 1000, breakdown)
+
+
+# ---------------------------
+# Flask / ASGI hooks
+# ---------------------------
+class Instrumentation:
+    """Times every Flask request and serves /metrics (METRICS_ENABLED=0 turns both off)."""
+
+    def __init__(self, app=None, registry=REGISTRY):
+        self.registry = registry
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["metrics"] = self
+        if not app.config.get("METRICS_ENABLED", True):
+            return
+        self.slow_seconds = app.config.get("SLOW_REQUEST_MS", 1000) / 1000
+        self.token = app.config.get("METRICS_TOKEN")
+        _listen_engines()
+        app.before_request(self._before)
+        app.after_request(self._after)
+        got_request_exception.connect(self._exception, app, weak=False)
+        app.add_url_rule("/metrics", "metrics", self.view)
+
+    def _before(self):
+        request.environ["metrics.stats"] = stats = RequestStats()
+        request.environ["metrics.token"] = _current.set(stats)
+
+    def _after(self, response):
+        stats = request.environ.get("metrics.stats")
+        if stats is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        method, token = request.method, request.environ["metrics.token"]
+        logger = current_app.logger
+
+        def finish():
+            finish_request(stats, route, method, response.status_code, logger, self.slow_seconds)
+            try:
+                _current.reset(token)
+            except ValueError:
+                _current.set(None)  # closed from another context
+
+        if response.mimetype == "text/event-stream":
+            response.call_on_close(finish)  # SSE replies are timed to their last event
+        else:
+            finish()
+        return response
+
+    def _exception(self, sender, exception, **extra):
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        HTTP_EXCEPTIONS.inc(route=route, exception=type(exception).__name__)
+
+    def view(self):
+        if not self.token:
+            if request.remote_addr not in LOOPBACK:
+                return Response("not found\n", status=404, mimetype="text/plain")
+        elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {self.token}"):
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+        return Response(self.registry.render(), content_type=CONTENT_TYPE, headers={"Cache-Control": "no-store"})
+
+
+class ASGIInstrumentation:
+    """ASGI middleware timing the routes the Starlette app serves itself (see main.py)."""
+
+    def __init__(self, app, logger, slow_seconds=1.0, enabled=True):
+        self.app = app
+        self.logger = logger
+        self.slow_seconds = slow_seconds
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        except Exception as e:
+            HTTP_EXCEPTIONS.inc(route=self._route(scope), exception=type(e).__name__)
+            raise
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            if route is not None and hasattr(route, "endpoint"):  # not a Mount: Flask times its own
+                finish_request(stats, route.path, scope["method"], status[0], self.logger, self.slow_seconds)
+
+    def _route(self, scope):
+        route = scope.get("route")
+        return getattr(route, "path", "<unmatched>")
@@ -0,0 +1,174 @@
+# migrations.py
+#
+# Minimal, ordered schema migrations (replaces the bare db.create_all()).
+#
+# Each migration has an integer version and runs once; applied versions are
+# recorded in the `schema_migrations` table. Migrations must be idempotent
+# on a fresh database, where version 1 already creates the current models.
+#
+# Run them with `flask --app app migrate` or run_migrations(db) in an app context.
+
+from datetime import datetime
+
+from sqlalchemy import Date, DateTime, inspect, literal, select, text
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def _has_column(conn, table, column):
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+@migration(1, "baseline tables")
+def _baseline(db, conn):
+    db.metadata.create_all(conn)
+
+
+@migration(2, "completion day column, unique completion index and lookup indexes")
+def _completion_indexes(db, conn):
+    if not _has_column(conn, "user_activity_completion", "completed_day"):
+        conn.execute(text("ALTER TABLE user_activity_completion ADD COLUMN completed_day DATE"))
+        if conn.dialect.name == "sqlite":
+            conn.execute(text("UPDATE user_activity_completion SET completed_day = date(completed_at)"))
+        else:
+            conn.execute(text("UPDATE user_activity_completion SET completed_day = CAST(completed_at AS DATE)"))
+
+    # keep the first completion of each (user, activity, day) so the unique index can be built
+    conn.execute(text(
+        "DELETE FROM user_activity_completion WHERE id NOT IN ("
+        " SELECT MIN(id) FROM user_activity_completion"
+        " GROUP BY user_id, activity_id, completed_day)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_completion_user_activity_day "
+        "ON user_activity_completion (user_id, activity_id, completed_day)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_completion_user_day "
+        "ON user_activity_completion (user_id, completed_day)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_user_category_selection_user_id "
+        "ON user_category_selection (user_id)"
+    ))
+
+
+@migration(3, "activity tags for recommendations")
+def _activity_tags(db, conn):
+    if not _has_column(conn, "activity", "tags"):
+        conn.execute(text("ALTER TABLE activity ADD COLUMN tags VARCHAR(200)"))
+
+
+@migration(4, "longest activity streak")
+def _longest_streak(db, conn):
+    if not _has_column(conn, "userdb", "longest_streak"):
+        conn.execute(text("ALTER TABLE userdb ADD COLUMN longest_streak INTEGER DEFAULT 0"))
+        conn.execute(text("UPDATE userdb SET longest_streak = COALESCE(activity_streak, 0)"))
+
+
+@migration(5, "activity content key and hash for catalog sync")
+def _activity_keys(db, conn):
+    from catalog_sync import activity_key
+
+    if not _has_column(conn, "activity", "key"):
+        conn.execute(text("ALTER TABLE activity ADD COLUMN key VARCHAR(64)"))
+    if not _has_column(conn, "activity", "content_hash"):
+        conn.execute(text("ALTER TABLE activity ADD COLUMN content_hash VARCHAR(40)"))
+
+    rows = conn.execute(text("SELECT id, title FROM activity WHERE key IS NULL ORDER BY id")).fetchall()
+    taken = {r[0] for r in conn.execute(text("SELECT key FROM activity WHERE key IS NOT NULL"))}
+    updates = []
+    for activity_id, title in rows:
+        key = activity_key(title or "")
+        if key in taken:
+            # duplicate titles keep their own row
+            key = f"{key}-{activity_id}"
+        taken.add(key)
+        updates.append({"k": key, "i": activity_id})
+    if updates:
+        conn.execute(text("UPDATE activity SET key = :k WHERE id = :i"), updates)
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_activity_key ON activity (key)"))
+
+
+@migration(6, "server-side session table")
+def _web_sessions(db, conn):
+    db.metadata.tables["web_session"].create(conn, checkfirst=True)
+
+
+@migration(7, "rate limit buckets")
+def _rate_limit_buckets(db, conn):
+    db.metadata.tables["rate_limit_bucket"].create(conn, checkfirst=True)
+
+
+@migration(8, "background job queue")
+def _jobs(db, conn):
+    db.metadata.tables["job"].create(conn, checkfirst=True)
+
+
+@migration(9, "lifestyle snapshots and trend rollups")
+def _trends(db, conn):
+    db.metadata.tables["lifestyle_snapshot"].create(conn, checkfirst=True)
+    db.metadata.tables["trend_rollup"].create(conn, checkfirst=True)
+    # each user's current answers become their first snapshot; init_db() then backfills the rollups
+    snapshots, lifestyle = db.metadata.tables["lifestyle_snapshot"], db.metadata.tables["lifestyle"]
+    columns = ["user_id", "diet", "physicalActivity", "socialInteraction", "relaxHabit",
+               "screenTime", "stressLevel", "sleepHrs"]
+    now = datetime.utcnow()
+    conn.execute(snapshots.insert().from_select(
+        columns + ["recorded_at", "recorded_day"],
+        select(*[lifestyle.c[c] for c in columns], literal(now, DateTime), literal(now.date(), Date))
+        .where(lifestyle.c.user_id.not_in(select(snapshots.c.user_id))),
+    ))
+
+
+@migration(10, "activity updated_at for the catalog version probe")
+def _activity_updated_at(db, conn):
+    if not _has_column(conn, "activity", "updated_at"):
+        conn.execute(text("ALTER TABLE activity ADD COLUMN updated_at TIMESTAMP"))
+    conn.execute(text("UPDATE activity SET updated_at = created_at WHERE updated_at IS NULL"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_activity_updated_at ON activity (updated_at)"))
+
+
+def _ensure_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER PRIMARY KEY,"
+        " description VARCHAR(200) NOT NULL,"
+        " applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_versions(conn):
+    _ensure_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def run_migrations(db):
+    """Applies pending migrations in order; returns the list of versions applied."""
+    applied = []
+    with db.engine.begin() as conn:
+        done = applied_versions(conn)
+        for version, description, fn in MIGRATIONS:
+            if version in done:
+                continue
+            fn(db, conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) "
+                     "VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.utcnow()},
+            )
+            applied.append(version)
+    return applied
+
+
+def current_version(db):
+    with db.engine.begin() as conn:
+        return max(applied_versions(conn), default=0)
@@ -0,0 +1,194 @@
+# models.py
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+from password_hashing import PasswordHasher
+
+db = SQLAlchemy()
+
+# bcrypt hashing pool, configured from app.config in create_app()
+passwords = PasswordHasher()
+
+# ---------------------------
+# MODELS
+# ---------------------------
+
+class Userdb(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    firstName = db.Column(db.String(50), nullable=False)
+    lastName = db.Column(db.String(50), nullable=False)
+    email = db.Column(db.String(50), nullable=False, unique=True)
+    phone = db.Column(db.String(15), nullable=False)
+    password = db.Column(db.String(128), nullable=False)  # hashed password
+    gender = db.Column(db.String(7), nullable=False)
+    birthDate = db.Column(db.Date, nullable=False)
+    eduLevel = db.Column(db.String(30), nullable=False)
+    fieldOfStudy = db.Column(db.String(30), nullable=False)
+
+    # Activity streak fields
+    activity_streak = db.Column(db.Integer, default=0)
+    longest_streak = db.Column(db.Integer, default=0)
+    last_activity_date = db.Column(db.Date, nullable=True)
+
+    # initializer and password check
+    def __init__(self, firstName, lastName, email, phone, password, gender, birthDate, eduLevel, fieldOfStudy):
+        self.firstName = firstName
+        self.lastName = lastName
+        self.email = email
+        self.phone = phone
+        # store hashed password (bcrypt, computed in the password pool)
+        self.password = passwords.hash(password)
+        self.gender = gender
+        self.birthDate = birthDate
+        self.eduLevel = eduLevel
+        self.fieldOfStudy = fieldOfStudy
+
+    def check_password(self, password):
+        return passwords.verify(password, self.password)
+
+    def rehash_if_needed(self, password):
+        """Re-hashes with the configured work factor; returns True if the hash changed."""
+        if not passwords.needs_rehash(self.password):
+            return False
+        self.password = passwords.hash(password)
+        return True
+
+# Table for lifestyle data...
+
+class Activity(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    est_time = db.Column(db.String(50), nullable=True)   # e.g. "2-5 min"
+    tags = db.Column(db.String(200), nullable=True)      # comma-separated keys of categories_data.categories
+    key = db.Column(db.String(64), nullable=True)        # stable content key used by catalog_sync
+    content_hash = db.Column(db.String(40), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # bumped by catalog_sync and ORM edits; part of the catalog version probe (app.activity_table_version)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('uq_activity_key', 'key', unique=True),
+        db.Index('ix_activity_updated_at', 'updated_at'),
+    )
+
+
+class UserActivityCompletion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('userdb.id'), nullable=False)
+    activity_id = db.Column(db.Integer, db.ForeignKey('activity.id'), nullable=False)
+    completed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # stored day of completed_at, so per-day lookups can use an index (see migrations.py)
+    completed_day = db.Column(db.Date, default=lambda: datetime.utcnow().date())
+
+    __table_args__ = (
+        db.Index('uq_completion_user_activity_day', 'user_id', 'activity_id', 'completed_day', unique=True),
+        db.Index('ix_completion_user_day', 'user_id', 'completed_day'),
+    )
+
+    user = db.relationship('Userdb', backref='completions')
+    activity = db.relationship('Activity')
+
+
+# If the rest of your app expects 'Lifestyle', reintroduce it (original file had it commented).
+class Lifestyle(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('userdb.id'), nullable=False, unique=True)
+    diet = db.Column(db.String(50), nullable=False)
+    physicalActivity = db.Column(db.String(50), nullable=False)
+    socialInteraction = db.Column(db.String(50), nullable=False)
+    relaxHabit = db.Column(db.String(50), nullable=False)
+    screenTime = db.Column(db.Integer, nullable=False)
+    stressLevel = db.Column(db.Integer, nullable=False)
+    sleepHrs = db.Column(db.Integer, nullable=False)
+
+    user = db.relationship("Userdb", backref="lifestyle")
+
+
+class LifestyleSnapshot(db.Model):
+    # append-only history of /lifestyle answers (Lifestyle keeps only the latest); see trends.py
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('userdb.id'), nullable=False)
+    diet = db.Column(db.String(50), nullable=False)
+    physicalActivity = db.Column(db.String(50), nullable=False)
+    socialInteraction = db.Column(db.String(50), nullable=False)
+    relaxHabit = db.Column(db.String(50), nullable=False)
+    screenTime = db.Column(db.Integer, nullable=False)
+    stressLevel = db.Column(db.Integer, nullable=False)
+    sleepHrs = db.Column(db.Integer, nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    recorded_day = db.Column(db.Date, nullable=False, default=lambda: datetime.utcnow().date())
+
+    __table_args__ = (
+        db.Index('ix_lifestyle_snapshot_user_day', 'user_id', 'recorded_day'),
+    )
+
+
+class TrendRollup(db.Model):
+    # running totals per user or category and day or week (trends.TrendService); averages = sum / checkins
+    scope = db.Column(db.String(10), primary_key=True)     # "user" or "category"
+    subject = db.Column(db.String(60), primary_key=True)   # user id, or a key of categories_data.categories
+    period = db.Column(db.String(4), primary_key=True)     # "day" or "week"
+    period_start = db.Column(db.Date, primary_key=True)    # the day, or the Monday of the week
+    checkins = db.Column(db.Integer, nullable=False, default=0)  # lifestyle snapshots
+    stress_sum = db.Column(db.Integer, nullable=False, default=0)
+    sleep_sum = db.Column(db.Integer, nullable=False, default=0)
+    screen_sum = db.Column(db.Integer, nullable=False, default=0)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UserCategorySelection(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('userdb.id'), nullable=False, index=True)
+    category = db.Column(db.String(50), nullable=False)
+    subcategory = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    user = db.relationship("Userdb", backref="category_selections")
+
+
+class ChatHistory(db.Model):
+    # serialized Gemini chat history, used when CHAT_STORE=sql
+    email = db.Column(db.String(50), primary_key=True)
+    history = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class WebSession(db.Model):
+    # server-side Flask session data (session_store.SQLSessionStore)
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class RateLimitBucket(db.Model):
+    # per-user token bucket (rate_limit.SQLBucketStore); times are epoch seconds
+    key = db.Column(db.String(120), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False, index=True)
+
+
+class Job(db.Model):
+    # background job queue (jobs.JobQueue); a worker claims the highest-priority queued job due now
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    owner = db.Column(db.String(50), nullable=True, index=True)  # email allowed to poll it, if any
+    dedupe_key = db.Column(db.String(120), nullable=True, index=True)
+    status = db.Column(db.String(10), nullable=False, default="queued")  # queued/running/done/failed
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(64), nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    __table_args__ = (
+        db.Index('ix_job_claim', 'status', 'priority', 'run_at'),
+    )
@@ -0,0 +1,190 @@
+# page_cache.py
+#
+# Rendered-output caching for templates whose HTML doesn't change per request.
+#
+# - PageCache keeps whole anonymous pages (/, /login, /register, /lifestyle,
+#   /category) as bytes with a content ETag and a Last-Modified stamp, and
+#   answers conditional GETs with 304.
+# - Shells are pages with per-user holes (the dashboard): the template is
+#   rendered once with a placeholder per slot and split around it, so a
+#   request only joins cached bytes with the user's cached fragments.
+# - Pages are sent brotli/gzip-compressed when the client accepts it; the
+#   encoded body is kept on the CachedPage, so shared pages compress once.
+# - precompile() compiles every template at startup through Jinja's bytecode
+#   cache, so workers don't parse templates on their first requests.
+#
+# Everything is bypassed while templates auto-reload (debug), so edits show
+# up immediately in development.
+
+import gzip
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+
+from flask import Response, current_app, render_template, request
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+MIN_COMPRESS = 1024  # bytes; smaller bodies go out as-is
+
+
+def digest(data):
+    return hashlib.sha1(data if isinstance(data, bytes) else data.encode("utf-8")).hexdigest()
+
+
+class CachedPage:
+    def __init__(self, body, last_modified=None, mimetype="text/html", etag=None):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag or digest(body)
+        self.last_modified = last_modified or datetime.now(timezone.utc).replace(microsecond=0)
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        """The body compressed with `encoding` ("br" or "gzip"), computed once; None if unavailable."""
+        if encoding not in self._encoded:
+            self._encoded[encoding] = _compress(self.body, encoding)
+        return self._encoded[encoding]
+
+
+def _compress(data, encoding):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=5)  # cheap enough for per-request dashboard pages
+
+
+def templates_mtime(app):
+    """Newest template file's mtime, so every worker sends the same Last-Modified."""
+    newest = 0
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for name in files:
+            newest = max(newest, os.stat(os.path.join(root, name)).st_mtime)
+    return datetime.fromtimestamp(int(newest), timezone.utc)
+
+
+class Shell:
+    """A rendered page split around named slots."""
+
+    def __init__(self, parts, slots):
+        self.parts = parts  # len(slots) + 1 byte strings
+        self.slots = slots
+        self.etag = digest(b"".join(parts))
+
+    def fill(self, **fragments):
+        """CachedPage with each slot filled by a Fragment; nothing is re-hashed."""
+        out = [self.parts[0]]
+        etag = [self.etag]
+        for slot, part in zip(self.slots, self.parts[1:]):
+            out.append(fragments[slot].body)
+            out.append(part)
+            etag.append(fragments[slot].etag)
+        return CachedPage(b"".join(out), etag=digest("-".join(etag)))
+
+
+class Fragment:
+    """Rendered HTML for one Shell slot, encoded and hashed once."""
+
+    def __init__(self, html):
+        self.body = str(html).encode("utf-8")
+        self.etag = digest(self.body)
+
+
+def _placeholder(slot):
+    return f"\x00slot:{slot}\x00"
+
+
+class PageCache:
+    def __init__(self, cache_control="no-cache"):
+        self.cache_control = cache_control
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def enabled(self):
+        return not current_app.jinja_env.auto_reload
+
+    def _get(self, key, build):
+        entry = self._pages.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None:
+                self.misses += 1
+                entry = self._pages[key] = build()
+        return entry
+
+    def page(self, key, template, **context):
+        """The rendered template as a CachedPage (rendered once per process)."""
+        def build():
+            return CachedPage(render_template(template, **context).encode("utf-8"),
+                              last_modified=templates_mtime(current_app))
+
+        if not self.enabled():
+            return build()
+        return self._get(("page", key), build)
+
+    def shell(self, key, template, slots, **context):
+        """The template rendered with a placeholder in each slot, split into a Shell."""
+        def build():
+            html = render_template(template, **context, **{s: Markup(_placeholder(s)) for s in slots})
+            parts, rest = [], html
+            for slot in slots:
+                head, rest = rest.split(_placeholder(slot), 1)
+                parts.append(head.encode("utf-8"))
+            parts.append(rest.encode("utf-8"))
+            return Shell(parts, slots)
+
+        if not self.enabled():
+            return build()
+        return self._get(("shell", key), build)
+
+    def fragment(self, template, **context):
+        return Fragment(render_template(template, **context))
+
+    def respond(self, page, cache_control=None):
+        """200 with ETag/Last-Modified (compressed if accepted), or 304 when the client's copy is current."""
+        body, etag, encoding = page.body, page.etag, None
+        if len(body) >= MIN_COMPRESS:
+            for candidate in ("br", "gzip"):
+                if request.accept_encodings[candidate] and page.encoded(candidate) is not None:
+                    body, etag, encoding = page.encoded(candidate), f"{page.etag}-{candidate}", candidate
+                    break
+        response = Response(body, mimetype=page.mimetype)
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add("Accept-Encoding")
+        response.set_etag(etag)
+        response.last_modified = page.last_modified
+        response.headers["Cache-Control"] = cache_control or self.cache_control
+        return response.make_conditional(request)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        return {"entries": len(self._pages), "hits": self.hits, "misses": self.misses}
+
+
+def init_bytecode_cache(app, directory=None):
+    """Stores compiled templates under instance/jinja_cache (shared by workers and restarts)."""
+    directory = directory or os.path.join(app.instance_path, "jinja_cache")
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(directory)}
+
+
+def precompile(app):
+    """Compiles (or loads the bytecode of) every template; returns how many were loaded."""
+    env = app.jinja_env
+    names = [n for n in env.list_templates() if n.endswith(".html")]
+    for name in names:
+        env.get_template(name)
+    return len(names)
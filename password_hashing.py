@@ -0,0 +1,160 @@
+# password_hashing.py
+#
+# bcrypt work off the request thread.
+#
+# Hashing and checking run in a small process pool (created lazily in each
+# worker process, so it is never inherited across a Gunicorn fork). Its
+# processes come from a fork server (spawned where there is none), never from
+# fork(): forking the multithreaded server can copy a lock held by another
+# thread into a child that then deadlocks. An admission limit rejects new
+# work when too many calls are already queued, instead of letting a login
+# burst starve every other route; a call that times out or loses its pool
+# worker is reported the same way (and counted as failed, not completed). Latency (queueing included) goes to
+# password_hash_duration_seconds (metrics.py).
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+from metrics import PASSWORD_LATENCY
+
+
+class HasherBusy(Exception):
+    """Raised when the password pool already has `max_pending` calls queued, or a call
+    did not finish within `timeout` seconds."""
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+def hash_rounds(hashed):
+    """Work factor stored in a bcrypt hash ('$2b$12$...' -> 12)."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _mp_context():
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # forks start with bcrypt and this module already imported
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+class PasswordHasher:
+    """bcrypt hashing/verification with a bounded process pool and queue metrics.
+
+    pool_size=0 runs bcrypt inline on the calling thread.
+    """
+
+    def __init__(self, rounds=12, pool_size=2, max_pending=32, timeout=30):
+        self.rounds = rounds
+        self.pool_size = pool_size
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0  # timed out, lost its pool worker or raised
+
+    def init_app(self, app):
+        """Applies BCRYPT_ROUNDS / PASSWORD_POOL_SIZE / PASSWORD_MAX_PENDING from app.config."""
+        self.rounds = app.config.get("BCRYPT_ROUNDS", self.rounds)
+        self.pool_size = app.config.get("PASSWORD_POOL_SIZE", self.pool_size)
+        self.max_pending = app.config.get("PASSWORD_MAX_PENDING", self.max_pending)
+        app.extensions["passwords"] = self
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_size, mp_context=_mp_context())
+                self._pid = os.getpid()
+            return self._executor
+
+    def _discard(self, executor):
+        # a pool worker died; the next call starts a fresh pool
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if self.pool_size <= 0:
+            result = fn(*args)
+            with self._lock:
+                self.completed += 1
+            return result
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HasherBusy("password hashing queue is full")
+            self.pending += 1
+        done = False
+        try:
+            executor = self._pool()
+            future = executor.submit(fn, *args)
+            result = future.result(timeout=self.timeout)
+            done = True
+            return result
+        except FutureTimeout:
+            future.cancel()
+            raise HasherBusy("password hashing timed out")
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise HasherBusy("password hashing pool broke")
+        finally:
+            with self._lock:
+                self.pending -= 1
+                if done:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def _timed(self, op, fn, *args):
+        started = time.perf_counter()
+        try:
+            return self._run(fn, *args)
+        finally:
+            PASSWORD_LATENCY.observe(time.perf_counter() - started, op=op)
+
+    def hash(self, password):
+        return self._timed("hash", _hashpw, password.encode("utf-8"), self.rounds)
+
+    def verify(self, password, hashed):
+        return self._timed("verify", _checkpw, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def close(self):
+        """Shuts the process pool down (its workers would outlive a server killed by a signal)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "queue_depth": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
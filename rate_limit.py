@@ -0,0 +1,178 @@
+# rate_limit.py
+#
+# Per-user token buckets for the model-backed routes (/chat, /affirmation
+# and their /stream variants).
+#
+# Each user gets `burst` tokens that refill at `per_minute` per minute; a
+# call costs one token and is answered with 429 + Retry-After once the
+# bucket is empty. Bucket state lives in a shared store (the app database
+# or any Redis-compatible server, like session_store.py) and is updated in
+# one atomic statement, so the limit holds across workers and processes.
+# A store error lets the call through: losing the limiter must not take
+# chat down with it.
+
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import case, select
+
+logger = logging.getLogger(__name__)
+
+Decision = namedtuple("Decision", "allowed remaining retry_after")
+
+
+class BucketStore:
+    """take(key, capacity, rate, cost) -> (allowed, tokens left); `rate` is tokens per second."""
+
+    def take(self, key, capacity, rate, cost):
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Removes buckets that have refilled completely; returns how many were removed."""
+        return 0
+
+
+class MemoryBucketStore(BucketStore):
+    """Buckets in a dict: per process, for development and single-worker setups."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost):
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens
+
+
+class SQLBucketStore(BucketStore):
+    """Buckets in a database table (`model` has key, tokens and updated_at columns).
+
+    A take is one upsert that refills, checks and spends in the database, so
+    concurrent workers cannot both spend the last token. Rows whose bucket
+    has refilled are deleted by purge_expired() (a missing row is a full
+    bucket).
+    """
+
+    def __init__(self, db, model, idle_seconds=3600):
+        self.db = db
+        self.model = model
+        self.idle_seconds = idle_seconds
+
+    def take(self, key, capacity, rate, cost):
+        from db_utils import dialect_insert
+
+        table = self.model.__table__
+        now = time.time()
+        refilled = table.c.tokens + (now - table.c.updated_at) * rate
+        refilled = case((refilled > capacity, capacity), else_=refilled)
+        with self.db.engine.begin() as conn:
+            stmt = dialect_insert(conn, table).values(key=key, tokens=capacity - cost, updated_at=now)
+            row = conn.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={"tokens": refilled - cost, "updated_at": now},
+                where=refilled >= cost,
+            ).returning(table.c.tokens)).first()
+            if row is not None:
+                return True, row.tokens
+            tokens = conn.execute(select(refilled).where(table.c.key == key)).scalar()
+        return False, tokens or 0.0
+
+    def purge_expired(self):
+        table = self.model.__table__
+        with self.db.engine.begin() as conn:
+            return conn.execute(
+                table.delete().where(table.c.updated_at < time.time() - self.idle_seconds)
+            ).rowcount
+
+
+# KEYS[1] bucket; ARGV capacity, rate, cost, now, ttl
+_REDIS_TAKE = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local capacity, rate, cost, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore(BucketStore):
+    """Buckets in Redis (or Valkey/KeyDB), updated by a Lua script; keys expire once refilled."""
+
+    def __init__(self, client, prefix="ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(_REDIS_TAKE)
+
+    def take(self, key, capacity, rate, cost):
+        ttl = max(1, math.ceil(capacity / rate))
+        allowed, tokens = self._take(keys=[self.prefix + key], args=[capacity, rate, cost, time.time(), ttl])
+        return bool(allowed), float(tokens)
+
+
+class RateLimiter:
+    """Token bucket per key: `burst` calls back to back, then `per_minute` calls a minute.
+
+    burst=0 turns limiting off.
+    """
+
+    def __init__(self, store, burst=10, per_minute=20):
+        self.store = store
+        self.burst = burst
+        self.rate = per_minute / 60
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+
+    def hit(self, key, cost=1):
+        """Spends `cost` tokens of `key`'s bucket; returns a Decision."""
+        if self.burst <= 0 or self.rate <= 0:
+            return Decision(True, None, 0)
+        try:
+            allowed, tokens = self.store.take(key, self.burst, self.rate, cost)
+        except Exception as e:
+            logger.warning("Rate limiter unavailable, letting the call through: %s", e)
+            self.errors += 1
+            return Decision(True, None, 0)
+        if allowed:
+            self.allowed += 1
+            return Decision(True, int(tokens), 0)
+        self.limited += 1
+        return Decision(False, 0, max(1, math.ceil((cost - tokens) / self.rate)))
+
+    def stats(self):
+        return {"allowed": self.allowed, "limited": self.limited, "errors": self.errors}
+
+
+def create_rate_limiter(config, db=None, model=None):
+    """Builds the limiter from app.config (RATE_LIMIT_STORE is 'sql', 'redis' or 'memory')."""
+    burst, per_minute = config.get("RATE_LIMIT_BURST", 10), config.get("RATE_LIMIT_PER_MINUTE", 20)
+    backend = config.get("RATE_LIMIT_STORE", "sql")
+    if backend == "redis":
+        import redis
+
+        store = RedisBucketStore(redis.Redis.from_url(config["RATE_LIMIT_REDIS_URL"]))
+    elif backend == "memory":
+        store = MemoryBucketStore()
+    else:
+        # a bucket idle for burst / rate seconds is full again, so its row can go
+        idle = math.ceil(burst / (per_minute / 60)) if per_minute > 0 else 3600
+        store = SQLBucketStore(db, model, idle_seconds=idle)
+    return RateLimiter(store, burst=burst, per_minute=per_minute)
@@ -0,0 +1,210 @@
+# recommender.py
+#
+# Personalized activity ranking for /activities/recommended.
+#
+# Every activity is tagged with category keys from categories_data (taken
+# from the "tags" metadata in activities.json, or inferred from keywords),
+# giving an activities x categories matrix. A user's interest vector comes
+# from their category selections plus lifestyle signals; the base score is
+# one matrix-vector product. Recently completed activities are pushed down
+# by an exponentially decaying recency vector.
+#
+# Per-user scores and the ranked top-k are cached and updated incrementally
+# when the user completes an activity, so a request is a cached lookup.
+# The cache is an LRU of at most `max_users` users whose entries are rebuilt
+# after `ttl` seconds; each entry's arrays are only touched under its lock.
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+
+from categories_data import categories
+
+CATEGORY_KEYS = list(categories)
+
+KEYWORDS = {
+    "Spirituality": ("meditat", "gratitude", "grateful", "nature", "sky", "prayer", "mindful"),
+    "Mindset": ("breath", "gratitude", "journal", "mindful", "doodle", "thought", "song"),
+    "Health": ("walk", "stretch", "water", "hydrate", "sleep", "exercise", "phone", "body"),
+    "Personality": ("draw", "doodle", "song", "creative", "express"),
+    "Relationships": ("friend", "family", "compliment", "kind"),
+    "Network": ("connect", "message", "reach out", "meet"),
+    "Career": ("plan", "goal", "study", "skill", "learn"),
+    "Money": ("budget", "expense", "saving", "spend"),
+}
+
+
+def activity_tags(item):
+    """Category keys for an activity: explicit tags if present, else keyword matches."""
+    tags = item.get("tags")
+    if isinstance(tags, str):
+        tags = [t.strip() for t in tags.split(",") if t.strip()]
+    if tags:
+        return [t for t in tags if t in CATEGORY_KEYS]
+    text = f"{item.get('title', '')} {item.get('description', '')}".lower()
+    return [key for key, words in KEYWORDS.items() if any(w in text for w in words)]
+
+
+def interest_vector(selections, lifestyle):
+    """User interest per category from selections (weight 1 each) and lifestyle signals."""
+    vec = np.zeros(len(CATEGORY_KEYS), dtype=np.float32)
+    index = {k: i for i, k in enumerate(CATEGORY_KEYS)}
+
+    def boost(key, amount):
+        vec[index[key]] += amount
+
+    for sel in selections:
+        if sel.category in index:
+            boost(sel.category, 1.0)
+
+    if lifestyle is not None:
+        if (lifestyle.stressLevel or 0) >= 7:
+            boost("Mindset", 0.5)
+            boost("Spirituality", 0.3)
+        if (lifestyle.sleepHrs or 0) < 6:
+            boost("Health", 0.5)
+        if (lifestyle.screenTime or 0) >= 6:
+            boost("Health", 0.3)
+        if lifestyle.physicalActivity == "Rarely Move":
+            boost("Health", 0.3)
+        if lifestyle.diet == "Mostly Junk Food":
+            boost("Health", 0.2)
+        if lifestyle.socialInteraction in ("Sometimes Lonely", "Mostly Isolated"):
+            boost("Relationships", 0.4)
+            boost("Network", 0.3)
+    return vec
+
+
+class _Matrix:
+    """Tag matrix for one catalog snapshot."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        items = snapshot.items
+        self.tags = np.zeros((len(items), len(CATEGORY_KEYS)), dtype=np.float32)
+        index = {k: i for i, k in enumerate(CATEGORY_KEYS)}
+        for row, item in enumerate(items):
+            for tag in activity_tags(item):
+                self.tags[row, index[tag]] = 1.0
+        self.id_index = {item.get("id"): row for row, item in enumerate(items)}
+
+
+class _UserScores:
+    def __init__(self, matrix, base, recency, day):
+        self.matrix = matrix
+        self.base = base
+        self.recency = recency
+        self.day = day
+        self.ranking = None
+        self.built = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class Recommender:
+    """Caches per-user scores over an ActivityCatalog and serves top-k lookups."""
+
+    def __init__(self, catalog, half_life_days=3.0, recency_weight=2.0, top_k=50,
+                 max_users=5000, ttl=3600):
+        self.catalog = catalog
+        self.decay = math.log(2) / half_life_days
+        self.recency_weight = recency_weight
+        self.top_k = top_k
+        self.max_users = max_users
+        self.ttl = ttl
+        self._matrix = None
+        self._users = OrderedDict()  # key -> _UserScores, least recently used first
+        self._lock = threading.Lock()
+
+    def matrix(self):
+        snap = self.catalog.snapshot()
+        m = self._matrix
+        if m is None or m.snapshot is not snap:
+            m = _Matrix(snap)
+            self._matrix = m
+        return m
+
+    def _rank(self, scores):
+        final = scores.base - self.recency_weight * scores.recency
+        k = min(self.top_k, len(final))
+        if k == 0:
+            return []
+        top = np.argpartition(-final, k - 1)[:k]
+        return top[np.argsort(-final[top], kind="stable")].tolist()
+
+    def _age(self, scores, today):
+        # caller holds scores.lock; decay the recency vector lazily, once per elapsed day
+        days = (today - scores.day).days
+        if days > 0:
+            scores.recency *= math.exp(-self.decay * days)
+            scores.day = today
+            scores.ranking = None
+
+    def build(self, key, selections, lifestyle, completions, today=None):
+        """(Re)computes scores for `key`; `completions` is an iterable of (activity_id, day)."""
+        today = today or date.today()
+        m = self.matrix()
+        # small constant so untagged activities still appear after the tagged ones
+        base = m.tags @ interest_vector(selections, lifestyle) + 0.05
+        recency = np.zeros(len(base), dtype=np.float32)
+        for activity_id, day in completions:
+            row = m.id_index.get(activity_id)
+            if row is not None:
+                recency[row] += math.exp(-self.decay * max(0, (today - day).days))
+        scores = _UserScores(m, base, recency, today)
+        with self._lock:
+            self._users[key] = scores
+            self._users.move_to_end(key)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return scores
+
+    def _get(self, key):
+        with self._lock:
+            scores = self._users.get(key)
+            if scores is None:
+                return None
+            if time.monotonic() - scores.built > self.ttl:
+                del self._users[key]
+                return None
+            self._users.move_to_end(key)
+            return scores
+
+    def cached(self, key):
+        scores = self._get(key)
+        if scores is None or scores.matrix is not self.matrix():
+            return None
+        return scores
+
+    def top(self, scores, count, today=None):
+        """Returns the `count` best activity dicts for precomputed `scores`."""
+        with scores.lock:
+            self._age(scores, today or date.today())
+            if scores.ranking is None:
+                scores.ranking = self._rank(scores)
+            ranking = scores.ranking[:count]
+        items = scores.matrix.snapshot.items
+        return [items[i] for i in ranking]
+
+    def record_completion(self, key, activity_id, today=None):
+        """Incrementally pushes a just-completed activity down the user's ranking."""
+        scores = self._get(key)
+        if scores is None:
+            return
+        row = scores.matrix.id_index.get(activity_id)
+        with scores.lock:
+            self._age(scores, today or date.today())
+            if row is not None:
+                scores.recency[row] += 1.0
+                scores.ranking = None
+
+    def invalidate(self, key):
+        with self._lock:
+            self._users.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._users)
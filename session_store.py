@@ -0,0 +1,268 @@
+# session_store.py
+#
+# Server-side Flask sessions.
+#
+# The cookie only carries a random session id signed with SECRET_KEY; the
+# session data lives in a shared store (a database table, or any
+# Redis-compatible server), so every worker and every restart sees the same
+# sessions. Expiry is sliding: a session idle for `ttl` seconds is gone. To
+# avoid a write per request, the expiry is only pushed forward once less
+# than half of it remains. Expired rows are reaped in bulk by a background
+# sweep (SessionSweeper) or `flask --app app purge-sessions`.
+
+import hashlib
+import os
+import random
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+serializer = TaggedJSONSerializer()
+
+
+def load_secret_key(instance_path, env_value=None):
+    """SECRET_KEY from the environment, else one generated once and kept in instance/secret_key.
+
+    The file fallback keeps development sessions valid across restarts and
+    workers on one machine; production should set SECRET_KEY.
+    """
+    if env_value:
+        return env_value
+    path = os.path.join(instance_path, "secret_key")
+    os.makedirs(instance_path, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        key = secrets.token_hex(32)
+        f.write(key)
+    return key
+
+
+class SessionStore:
+    """get(sid) -> (data, expires_at) or None; set(sid, data, expires_at); delete(sid)."""
+
+    def get(self, sid):
+        raise NotImplementedError
+
+    def set(self, sid, data, expires_at):
+        raise NotImplementedError
+
+    def delete(self, sid):
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Removes expired sessions in bulk; returns how many were removed."""
+        return 0
+
+
+class SQLSessionStore(SessionStore):
+    """Sessions in a database table (`model` has id, data and expires_at columns).
+
+    Uses its own short transactions on db.engine, so saving a session never
+    commits (or rolls back) the request's db.session.
+    """
+
+    def __init__(self, db, model):
+        self.db = db
+        self.model = model
+
+    def get(self, sid):
+        table = self.model.__table__
+        with self.db.engine.connect() as conn:
+            row = conn.execute(
+                table.select().where(table.c.id == sid, table.c.expires_at > datetime.utcnow())
+            ).first()
+        if row is None:
+            return None
+        return serializer.loads(row.data), row.expires_at
+
+    def set(self, sid, data, expires_at):
+        from db_utils import dialect_insert
+
+        table = self.model.__table__
+        with self.db.engine.begin() as conn:
+            stmt = dialect_insert(conn, table).values(id=sid, data=serializer.dumps(data), expires_at=expires_at)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={"data": stmt.excluded.data, "expires_at": stmt.excluded.expires_at},
+            ))
+
+    def delete(self, sid):
+        table = self.model.__table__
+        with self.db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.id == sid))
+
+    def purge_expired(self):
+        table = self.model.__table__
+        with self.db.engine.begin() as conn:
+            return conn.execute(table.delete().where(table.c.expires_at <= datetime.utcnow())).rowcount
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions in Redis (or Valkey/KeyDB); keys expire on their own."""
+
+    def __init__(self, client, prefix="session:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, sid):
+        key = self.prefix + sid
+        pipe = self.client.pipeline()
+        pipe.get(key)
+        pipe.ttl(key)
+        blob, ttl = pipe.execute()
+        if blob is None:
+            return None
+        return serializer.loads(blob.decode("utf-8")), datetime.utcnow() + timedelta(seconds=max(ttl, 0))
+
+    def set(self, sid, data, expires_at):
+        ttl = max(1, int((expires_at - datetime.utcnow()).total_seconds()))
+        self.client.set(self.prefix + sid, serializer.dumps(data), ex=ttl)
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires_at=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = new
+        self.modified = False
+        self.regenerated_from = None
+
+    def regenerate(self):
+        """Gives the session a fresh id (call on login to prevent session fixation)."""
+        if not self.new:
+            self.regenerated_from = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface storing data in a SessionStore behind a signed id cookie."""
+
+    salt = "mannkibaat-session"
+
+    def __init__(self, store, ttl=7 * 24 * 3600, skip_prefixes=("/static/", "/assets/")):
+        self.store = store
+        self.ttl = ttl
+        self.skip_prefixes = skip_prefixes
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt, key_derivation="hmac", digest_method=hashlib.sha256)
+
+    def sign(self, app, sid):
+        return self._signer(app).sign(sid).decode("utf-8")
+
+    def unsign(self, app, cookie):
+        try:
+            return self._signer(app).unsign(cookie).decode("utf-8")
+        except BadSignature:
+            return None
+
+    def load(self, app, cookie):
+        """Returns a ServerSession for a raw cookie value (one store read at most)."""
+        sid = self.unsign(app, cookie) if cookie else None
+        stored = self.store.get(sid) if sid else None
+        if stored is None:
+            return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+        data, expires_at = stored
+        return ServerSession(data, sid=sid, expires_at=expires_at)
+
+    def open_session(self, app, request):
+        if request.path.startswith(self.skip_prefixes):
+            # static files never read the session, so don't touch the store
+            return self.make_null_session(app)
+        return self.load(app, request.cookies.get(self.get_cookie_name(app)))
+
+    def save_session(self, app, session, response):
+        if not isinstance(session, ServerSession):
+            return
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.regenerated_from:
+            self.store.delete(session.regenerated_from)
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = datetime.utcnow()
+        stale = session.expires_at is None or session.expires_at - now < timedelta(seconds=self.ttl / 2)
+        if not (session.modified or stale):
+            return
+        self.store.set(session.sid, dict(session), now + timedelta(seconds=self.ttl))
+        if session.new or session.modified:
+            response.vary.add("Cookie")
+        response.set_cookie(
+            name,
+            self.sign(app, session.sid),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+class SessionSweeper:
+    """Background thread that calls store.purge_expired() every `interval` seconds.
+
+    start() is safe to call on every request: one thread per process, and a
+    forked worker starts its own.
+    """
+
+    def __init__(self, store, interval=600):
+        self.store = store
+        self.interval = interval
+        self.removed = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self, app):
+        if self._pid == os.getpid() or self.interval <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, args=(app,), name="session-sweeper", daemon=True).start()
+
+    def _run(self, app):
+        # workers started together shouldn't all sweep at the same moment
+        time.sleep(random.uniform(0, self.interval))
+        while True:
+            try:
+                with app.app_context():
+                    self.removed += self.store.purge_expired()
+            except Exception:
+                app.logger.exception("Session sweep failed")
+            time.sleep(self.interval)
+
+
+def create_session_store(config, db=None, model=None):
+    """Builds the store selected by app.config['SESSION_STORE'] ('sql' or 'redis')."""
+    if config.get("SESSION_STORE", "sql") == "redis":
+        import redis
+
+        return RedisSessionStore(redis.Redis.from_url(config["SESSION_REDIS_URL"]))
+    return SQLSessionStore(db, model)
@@ -0,0 +1,76 @@
+# single_flight.py
+#
+# Request coalescing: while a call for `key` is running, other callers with
+# the same key wait for it and share its result instead of starting their
+# own. Used by the affirmation pool so a double-clicked /affirmation (or two
+# tabs) on a cold pool costs one model call, not two.
+#
+# do() is for threads (Flask routes, the pool's refill threads) and ado()
+# for coroutines (main.py); the two keep separate in-flight tables.
+
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self.shared = 0  # callers served by someone else's call
+
+    def do(self, key, fn):
+        """Runs fn() unless a call for `key` is in flight, in which case waits for its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn):
+        """Async do(): `fn` is a coroutine function.
+
+        The call runs as its own task, so a caller that gives up (a closed
+        connection) does not cancel it for the others.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every caller went away
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls) + len(self._tasks)
@@ -0,0 +1,71 @@
+// activities.js -- suggested activities in the lifestyle view and the user's streak.
+
+import { getJSON, postJSON } from './api.js';
+
+const container = document.getElementById('activitiesContainer');
+
+function renderStreak(streak) {
+    ['streakCounter', 'streakBadge'].forEach(id => {
+        const el = document.getElementById(id);
+        if (el) el.textContent = streak ?? 0;
+    });
+}
+
+// Checking an activity records it (which may extend the streak) and fades the card out.
+async function complete(activity, card) {
+    card.classList.add('completed');
+    setTimeout(() => card.style.display = 'none', 500);
+    if (activity.id == null) return;  // catalog not synced to the DB yet
+    try {
+        const result = await postJSON('/activities/complete', { activity_id: activity.id });
+        renderStreak(result.new_streak);
+    } catch (error) {
+        console.error("Error completing activity:", error);
+    }
+}
+
+function renderActivities(activities) {
+    container.innerHTML = '';
+    activities.forEach(a => {
+        const col = document.createElement('div');
+        col.className = 'col-md-6 col-lg-4';
+        col.innerHTML = `
+            <label class="activity-card">
+                <input type="checkbox" class="activity-checkbox">
+                <div class="card-body">
+                    <h5 class="card-title"></h5>
+                    <p class="card-text"></p>
+                </div>
+            </label>
+        `;
+        col.querySelector('.card-title').textContent = a.title;
+        col.querySelector('.card-text').textContent = a.description;
+        const card = col.querySelector('.activity-card');
+        col.querySelector('.activity-checkbox').addEventListener('change', function() {
+            if (this.checked) complete(a, card);
+        });
+        container.appendChild(col);
+    });
+}
+
+function loadActivities(url) {
+    return getJSON(url)
+        .then(renderActivities)
+        .catch(err => console.error("Error loading activities:", err));
+}
+
+// Personalized picks and the streak come with the dashboard bootstrap; "Surprise Me!" loads random ones.
+export function initActivities(initialState) {
+    if (!container) return;
+    initialState.then(state => {
+        if (state.activities) renderActivities(state.activities);
+        else loadActivities('/activities/recommended?count=5');
+        if (state.streak) renderStreak(state.streak.streak);
+        else getJSON('/activities/streak').then(data => renderStreak(data.streak)).catch(() => {});
+    });
+
+    const surpriseBtn = document.getElementById('surpriseMeBtn');
+    if (surpriseBtn) {
+        surpriseBtn.addEventListener('click', () => loadActivities('/activities/random?count=5'));
+    }
+}
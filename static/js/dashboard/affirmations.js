@@ -0,0 +1,171 @@
+// affirmations.js -- daily affirmations (streamed from the server), likes and saved favorites.
+
+import { RateLimitError, getJSON, streamEvents } from './api.js';
+
+const affirmationImages = [
+    "https://images.unsplash.com/photo-1506905925346-21bda4d32df4?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=1350&q=80",
+    "https://images.unsplash.com/photo-1472214103451-9374bd1c798e?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=1350&q=80",
+    "https://images.unsplash.com/photo-1418065460487-3e41a6c84dc5?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=1350&q=80",
+    "https://images.unsplash.com/photo-1441974231531-c6227db76b6e?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=1350&q=80",
+    "https://images.unsplash.com/photo-1506744038136-46273834b3fb?ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D&auto=format&fit=crop&w=1350&q=80"
+];
+const DAILY_LIMIT = 5;
+
+const affirmationImage = document.getElementById('affirmationImage');
+const affirmationText = document.getElementById('affirmationText');
+const likeBtn = document.getElementById('likeAffirmation');
+const saveBtn = document.getElementById('saveAffirmation');
+const favoritesContainer = document.getElementById('favoritesContainer');
+const emptyFavorites = document.getElementById('emptyFavorites');
+
+const todaysAffirmations = [];
+let likedAffirmations = JSON.parse(localStorage.getItem('likedAffirmations')) || [];
+let savedAffirmations = JSON.parse(localStorage.getItem('savedAffirmations')) || [];
+let currentCategory = 'all';
+let currentAffirmation = null;
+let affirmationRequestInProgress = false;
+let prefetched = null;  // promise of the affirmation from the dashboard bootstrap
+
+function getRandomAffirmationImage() {
+    return affirmationImages[Math.floor(Math.random() * affirmationImages.length)];
+}
+
+function displayAffirmation(affirmation) {
+    if (affirmationImage && affirmationText) {
+        affirmationImage.style.backgroundImage = `url(${affirmation.image})`;
+        affirmationText.textContent = affirmation.text;
+        updateButtonStates();
+    }
+}
+
+async function fetchAffirmationText(image) {
+    let url = '/affirmation';
+    if (currentCategory && currentCategory !== 'all') {
+        url += `?category=${encodeURIComponent(currentCategory)}`;
+    }
+    try {
+        // Show the words as they are generated
+        const streamUrl = url.replace('/affirmation', '/affirmation/stream');
+        return await streamEvents(streamUrl, {}, (delta, fullText) => {
+            displayAffirmation({ text: fullText, image: image });
+        });
+    } catch (streamError) {
+        if (streamError instanceof RateLimitError) throw streamError;  // /affirmation would be refused too
+        console.warn('Affirmation stream failed, falling back to /affirmation:', streamError);
+        return (await getJSON(url)).affirmation;
+    }
+}
+
+// Shows the next affirmation; the first one comes from the bootstrap response when it had one.
+export async function showNextAffirmation() {
+    if (affirmationRequestInProgress) return;
+    if (todaysAffirmations.length >= DAILY_LIMIT) {
+        alert("You have reached the maximum of 5 affirmations for today. Please come back tomorrow for more!");
+        return;
+    }
+
+    affirmationRequestInProgress = true;
+    const image = getRandomAffirmationImage();
+    try {
+        let text = prefetched ? await prefetched : null;
+        prefetched = null;
+        if (!text) text = await fetchAffirmationText(image);
+
+        currentAffirmation = { text: text.trim(), image: image };
+        todaysAffirmations.push(currentAffirmation);
+        displayAffirmation(currentAffirmation);
+    } catch (error) {
+        if (error instanceof RateLimitError) {
+            // keep the current affirmation; the next click after Retry-After gets a new one
+            if (affirmationText) affirmationText.textContent = `${error.message} (${error.retryAfter}s)`;
+            setTimeout(() => currentAffirmation && displayAffirmation(currentAffirmation), error.retryAfter * 1000);
+            return;
+        }
+        console.error("Error fetching affirmation:", error);
+        currentAffirmation = { text: "Keep going! You are doing great.", image: getRandomAffirmationImage() };
+        displayAffirmation(currentAffirmation);
+    } finally {
+        affirmationRequestInProgress = false;
+    }
+}
+
+function toggleIn(list, storageKey) {
+    const index = list.findIndex(a => a.text === currentAffirmation.text);
+    if (index === -1) list.push(currentAffirmation);
+    else list.splice(index, 1);
+    localStorage.setItem(storageKey, JSON.stringify(list));
+}
+
+function toggleLike() {
+    if (!currentAffirmation) return;
+    toggleIn(likedAffirmations, 'likedAffirmations');
+    updateButtonStates();
+}
+
+function toggleSave() {
+    if (!currentAffirmation) return;
+    toggleIn(savedAffirmations, 'savedAffirmations');
+    updateButtonStates();
+}
+
+function updateButtonStates() {
+    if (!currentAffirmation) return;
+    const isLiked = likedAffirmations.some(a => a.text === currentAffirmation.text);
+    if (likeBtn) {
+        likeBtn.classList.toggle('active', isLiked);
+        likeBtn.innerHTML = isLiked ? '<i class="bi bi-heart-fill"></i>' : '<i class="bi bi-heart"></i>';
+    }
+
+    const isSaved = savedAffirmations.some(a => a.text === currentAffirmation.text);
+    if (saveBtn) {
+        saveBtn.classList.toggle('active', isSaved);
+        saveBtn.innerHTML = isSaved ? '<i class="bi bi-bookmark-fill"></i>' : '<i class="bi bi-bookmark"></i>';
+    }
+}
+
+export function renderFavorites() {
+    if (!favoritesContainer) return;
+    favoritesContainer.innerHTML = '';
+    if (savedAffirmations.length === 0) {
+        if (emptyFavorites) {
+            favoritesContainer.appendChild(emptyFavorites);
+            emptyFavorites.classList.remove('d-none');
+        }
+        return;
+    }
+    if (emptyFavorites) emptyFavorites.classList.add('d-none');
+    savedAffirmations.forEach((affirmation, index) => {
+        const favoriteItem = document.createElement('div');
+        favoriteItem.className = 'favorite-item';
+        favoriteItem.innerHTML = `
+            <img src="${affirmation.image}" alt="Affirmation" class="favorite-image">
+            <div class="favorite-overlay">
+                <p class="favorite-quote"></p>
+            </div>
+            <button class="remove-favorite" data-index="${index}">
+                <i class="bi bi-x"></i>
+            </button>
+        `;
+        favoriteItem.querySelector('.favorite-quote').textContent = affirmation.text;
+        favoriteItem.querySelector('.remove-favorite').addEventListener('click', () => {
+            savedAffirmations.splice(index, 1);
+            localStorage.setItem('savedAffirmations', JSON.stringify(savedAffirmations));
+            renderFavorites();
+            updateButtonStates();
+        });
+        favoritesContainer.appendChild(favoriteItem);
+    });
+}
+
+// `initialState` is the (pending) dashboard bootstrap response.
+export function initAffirmations(initialState) {
+    prefetched = initialState.then(state => state.affirmation || null);
+
+    ['refreshAffirmation', 'prevAffirmation', 'nextAffirmation', 'prevAffirmationSide', 'nextAffirmationSide']
+        .forEach(id => {
+            const button = document.getElementById(id);
+            if (button) button.addEventListener('click', showNextAffirmation);
+        });
+    if (likeBtn) likeBtn.addEventListener('click', toggleLike);
+    if (saveBtn) saveBtn.addEventListener('click', toggleSave);
+}
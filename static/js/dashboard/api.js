@@ -0,0 +1,105 @@
+// api.js -- requests shared by the dashboard modules.
+
+// Thrown for a 429 reply, and without a request while that endpoint's Retry-After has not passed.
+export class RateLimitError extends Error {
+    constructor(message, retryAfter) {
+        super(message);
+        this.name = 'RateLimitError';
+        this.retryAfter = retryAfter;  // seconds
+    }
+}
+
+// endpoint ('/chat', '/affirmation', ...; the /stream variants share it) -> time it may be called again
+const retryAt = new Map();
+
+function endpoint(url) {
+    return new URL(url, location.href).pathname.replace(/\/stream$/, '');
+}
+
+function checkRetryAfter(url) {
+    const until = retryAt.get(endpoint(url));
+    if (until && until > Date.now()) {
+        throw new RateLimitError("You're going a little fast. Please wait a few seconds and try again.",
+                                 Math.ceil((until - Date.now()) / 1000));
+    }
+}
+
+async function rateLimited(url, response) {
+    const data = await response.json().catch(() => ({}));
+    const seconds = parseInt(response.headers.get('Retry-After'), 10) || data.retry_after || 5;
+    retryAt.set(endpoint(url), Date.now() + seconds * 1000);
+    return new RateLimitError(data.error || 'Too many requests.', seconds);
+}
+
+// JSON from `url`; rejects with the server's `error` message on a non-2xx reply.
+export async function getJSON(url, options) {
+    checkRetryAfter(url);
+    const response = await fetch(url, options);
+    if (response.status === 429) throw await rateLimited(url, response);
+    if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `The server returned an error (${response.status}).`);
+    }
+    return response.json();
+}
+
+export function postJSON(url, body) {
+    return getJSON(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+}
+
+// Reads a Server-Sent Events stream, calling onDelta for every text chunk.
+// Resolves with the full text; rejects if streaming is unavailable or fails
+// (with a RateLimitError on 429, which callers should not retry right away).
+export async function streamEvents(url, options, onDelta) {
+    checkRetryAfter(url);
+    const response = await fetch(url, options);
+    if (response.status === 429) throw await rateLimited(url, response);
+    if (!response.ok || !response.body) {
+        throw new Error('Streaming not available.');
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let fullText = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            const payload = data ? JSON.parse(data) : {};
+            if (event === 'error') throw new Error(payload.error || 'The server returned an error.');
+            if (event === 'done') return fullText;
+            if (payload.delta) {
+                fullText += payload.delta;
+                onDelta(payload.delta, fullText);
+            }
+        }
+    }
+    return fullText;
+}
+
+// Streak, activities and an affirmation in one request (the page preloads it).
+// Never rejects: each module falls back to its own endpoint for missing data.
+let initialState = null;
+export function loadInitialState() {
+    if (!initialState) {
+        initialState = getJSON('/dashboard/bootstrap').catch(error => {
+            console.warn('Dashboard bootstrap failed:', error);
+            return {};
+        });
+    }
+    return initialState;
+}
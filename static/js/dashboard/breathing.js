@@ -0,0 +1,57 @@
+// breathing.js -- the 4-7-8 breathing exercise.
+
+const PHASES = { inhale: ['Inhale', 4, 'hold'], hold: ['Hold', 7, 'exhale'], exhale: ['Exhale', 8, 'inhale'] };
+
+const breathingCircle = document.getElementById('breathingCircle');
+const breathCount = document.getElementById('breathCount');
+const breathPhase = document.getElementById('breathPhase');
+
+let phase = 'inhale';
+let count = 4;
+let interval = null;
+
+function updateBreathingUI() {
+    if (!(breathCount && breathPhase && breathingCircle)) return;
+    breathCount.textContent = count;
+    breathPhase.textContent = PHASES[phase][0];
+    breathingCircle.classList.toggle('breathing-in', phase === 'inhale');
+    breathingCircle.classList.toggle('breathing-out', phase === 'exhale');
+}
+
+function start() {
+    phase = 'inhale';
+    count = PHASES[phase][1];
+    updateBreathingUI();
+    interval = setInterval(() => {
+        count--;
+        if (count <= 0) {
+            phase = PHASES[phase][2];
+            count = PHASES[phase][1];
+        }
+        updateBreathingUI();
+    }, 1000);
+}
+
+function stop() {
+    clearInterval(interval);
+    interval = null;
+    if (breathingCircle && breathCount && breathPhase) {
+        breathingCircle.classList.remove('breathing-in', 'breathing-out');
+        breathCount.textContent = '4';
+        breathPhase.textContent = 'Inhale';
+    }
+}
+
+export function initBreathing() {
+    const button = document.getElementById('startBreathing');
+    if (!button) return;
+    button.addEventListener('click', function() {
+        if (interval === null) {
+            this.innerHTML = '<i class="bi bi-pause-circle me-2"></i> Pause Exercise';
+            start();
+        } else {
+            this.innerHTML = '<i class="bi bi-play-circle me-2"></i> Start Exercise';
+            stop();
+        }
+    });
+}
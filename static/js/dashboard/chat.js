@@ -0,0 +1,150 @@
+// chat.js -- the chatbot view: replies stream in over SSE, with /chat as the fallback.
+
+import { RateLimitError, postJSON, streamEvents } from './api.js';
+
+const messagesContainer = document.getElementById('messagesContainer');
+const quickMessages = {
+    "I need to talk": "I need someone to talk to right now.",
+    "Tell me a story": "Could you tell me an uplifting story?",
+    "I'm feeling anxious": "I'm feeling anxious and could use some support."
+};
+
+function scrollToBottom() {
+    if (messagesContainer) {
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    }
+}
+
+function renderMessage(message) {
+    if (!messagesContainer) return null;
+
+    const messageEl = document.createElement('div');
+    messageEl.className = `message ${message.sender} animate-fade-in`;
+
+    const messageText = document.createElement('p');
+    messageText.className = 'mb-1';
+    messageText.textContent = message.text;
+
+    const timestamp = document.createElement('small');
+    timestamp.className = 'opacity-75';
+    timestamp.textContent = message.timestamp.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+
+    messageEl.appendChild(messageText);
+    messageEl.appendChild(timestamp);
+
+    messagesContainer.appendChild(messageEl);
+    scrollToBottom();
+    return messageEl;
+}
+
+function renderTypingIndicator() {
+    if (!messagesContainer) return;
+
+    const typingEl = document.createElement('div');
+    typingEl.className = 'typing-indicator';
+    typingEl.id = 'typingIndicator';
+
+    for (let i = 0; i < 3; i++) {
+        const dot = document.createElement('div');
+        dot.className = 'typing-dot animate-bounce';
+        dot.style.animationDelay = `${i * 0.2}s`;
+        typingEl.appendChild(dot);
+    }
+
+    messagesContainer.appendChild(typingEl);
+    scrollToBottom();
+}
+
+function removeTypingIndicator() {
+    const typingIndicator = document.getElementById('typingIndicator');
+    if (typingIndicator) typingIndicator.remove();
+}
+
+function botMessage(text) {
+    return { id: Date.now() + 1, text: text, sender: "bot", timestamp: new Date() };
+}
+
+// Out of messages for now: say so and keep the send button off until Retry-After has passed.
+function showRateLimited(error) {
+    removeTypingIndicator();
+    renderMessage(botMessage(`${error.message} (${error.retryAfter}s)`));
+    const sendMessageBtn = document.getElementById('sendMessage');
+    if (sendMessageBtn) {
+        sendMessageBtn.disabled = true;
+        setTimeout(() => sendMessageBtn.disabled = false, error.retryAfter * 1000);
+    }
+}
+
+export async function sendMessage(text) {
+    if (!text || !text.trim()) return;
+
+    const userMessage = { id: Date.now(), text: text.trim(), sender: "user", timestamp: new Date() };
+    renderMessage(userMessage);
+    renderTypingIndicator();
+
+    // Stream the reply into one bubble as it arrives
+    let botEl = null;
+    try {
+        await streamEvents('/chat/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ message: userMessage.text })
+        }, (delta, fullText) => {
+            if (!botEl) {
+                removeTypingIndicator();
+                botEl = renderMessage(botMessage(''));
+            }
+            botEl.querySelector('p').textContent = fullText;
+            scrollToBottom();
+        });
+        if (botEl) return;
+    } catch (streamError) {
+        if (streamError instanceof RateLimitError) {
+            showRateLimited(streamError);
+            return;
+        }
+        console.warn('Chat stream failed, falling back to /chat:', streamError);
+        if (botEl) {
+            botEl.remove();
+            renderTypingIndicator();
+        }
+    }
+
+    try {
+        const data = await postJSON('/chat', { message: userMessage.text });
+        removeTypingIndicator();
+        renderMessage(botMessage(data.reply));
+    } catch (error) {
+        if (error instanceof RateLimitError) {
+            showRateLimited(error);
+            return;
+        }
+        console.error('Chat API Error:', error);
+        removeTypingIndicator();
+        renderMessage(botMessage(
+            `Sorry, I couldn't connect to my brain. Please check the connection and try again. (${error.message})`));
+    }
+}
+
+export function initChat() {
+    document.querySelectorAll('.quick-action').forEach(action => {
+        action.addEventListener('click', function() {
+            sendMessage(quickMessages[this.getAttribute('data-action')]);
+        });
+    });
+
+    const messageInput = document.getElementById('messageInput');
+    const sendMessageBtn = document.getElementById('sendMessage');
+    if (sendMessageBtn && messageInput) {
+        const send = () => {
+            if (messageInput.value.trim()) {
+                sendMessage(messageInput.value);
+                messageInput.value = '';
+            }
+        };
+        sendMessageBtn.addEventListener('click', send);
+        messageInput.addEventListener('keypress', e => {
+            if (e.key === 'Enter') send();
+        });
+    }
+}
@@ -0,0 +1,23 @@
+// main.js -- dashboard entry point (a deferred module: the DOM is parsed when this runs).
+
+import { loadInitialState } from './api.js';
+import { initActivities } from './activities.js';
+import { initAffirmations, renderFavorites, showNextAffirmation } from './affirmations.js';
+import { initBreathing } from './breathing.js';
+import { initChat } from './chat.js';
+import { showTrends } from './trends.js';
+import { initNavigation, initTheme, onView, showView } from './views.js';
+
+const initialState = loadInitialState();
+
+initTheme();
+initNavigation();
+initChat();
+initBreathing();
+initAffirmations(initialState);
+initActivities(initialState);
+
+onView('affirmations', showNextAffirmation);
+onView('favorites', renderFavorites);
+onView('profile', showTrends);
+showView('home');
@@ -0,0 +1,59 @@
+// trends.js -- weekly stress, sleep, screen time and activities in the profile view.
+
+import { getJSON } from './api.js';
+
+const container = document.getElementById('trendsContainer');
+
+function cell(value, suffix = '') {
+    return value == null ? '–' : `${value}${suffix}`;
+}
+
+function tableHtml(weeks) {
+    const rows = weeks.slice().reverse().map(w => `
+        <tr>
+            <td>${new Date(w.start).toLocaleDateString(undefined, { day: 'numeric', month: 'short' })}</td>
+            <td>${cell(w.stress)}</td>
+            <td>${cell(w.sleep, 'h')}</td>
+            <td>${cell(w.screen, 'h')}</td>
+            <td>${w.completions}</td>
+        </tr>`).join('');
+    return `
+        <table class="table table-sm table-dark table-borderless mb-0">
+            <thead><tr><th>Week of</th><th>Stress</th><th>Sleep</th><th>Screen</th><th>Activities</th></tr></thead>
+            <tbody>${rows}</tbody>
+        </table>`;
+}
+
+// weeks with a check-in or an activity (oldest first, like the API)
+function active(weeks) {
+    return weeks.filter(w => w.checkins || w.completions);
+}
+
+function render(trends) {
+    const weeks = active(trends.user.week);
+    if (!weeks.length) {
+        container.innerHTML = '<p class="text-muted">Update your lifestyle answers or complete an activity to start your trends.</p>';
+        return;
+    }
+    container.innerHTML = tableHtml(weeks);
+    Object.entries(trends.categories).forEach(([name, series]) => {
+        const latest = series.week[series.week.length - 1];
+        if (!latest.checkins && !latest.completions) return;
+        const p = document.createElement('p');
+        p.className = 'small text-muted mt-2 mb-0';
+        p.textContent = `Everyone working on ${name} this week: stress ${cell(latest.stress)}, `
+            + `sleep ${cell(latest.sleep, 'h')}, ${latest.completions} activities done.`;
+        container.appendChild(p);
+    });
+}
+
+// Fetched every time the profile is shown, so completions from this visit are included.
+export async function showTrends() {
+    if (!container) return;
+    try {
+        render(await getJSON('/dashboard/trends'));
+    } catch (error) {
+        console.error('Error loading trends:', error);
+        container.innerHTML = '<p class="text-muted">Trends are not available right now.</p>';
+    }
+}
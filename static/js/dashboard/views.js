@@ -0,0 +1,110 @@
+// views.js -- sidebar navigation between the dashboard's views, dropdowns and theme.
+
+const views = {
+    home: document.getElementById('homeView'),
+    chatbot: document.getElementById('chatbotView'),
+    crisis: document.getElementById('crisisView'),
+    profile: document.getElementById('profileView'),
+    affirmations: document.getElementById('affirmationsView'),
+    favorites: document.getElementById('favoritesView'),
+    lifestyle: document.getElementById('lifestyleView')
+};
+const onShow = {};  // view name -> callback run every time it is shown
+
+export function onView(name, callback) {
+    onShow[name] = callback;
+}
+
+function closeDropdowns(except) {
+    document.querySelectorAll('.dropdown-menu.show').forEach(menu => {
+        if (menu === except) return;
+        menu.classList.remove('show');
+        const toggle = menu.previousElementSibling;
+        if (toggle) toggle.setAttribute('aria-expanded', 'false');
+    });
+}
+
+export function showView(name) {
+    const view = views[name];
+    if (view) {
+        Object.values(views).forEach(v => v && v.classList.add('d-none'));
+        view.classList.remove('d-none');
+        if (onShow[name]) onShow[name]();
+    }
+
+    // Update active nav state
+    document.querySelectorAll('.nav-item').forEach(nav => nav.classList.remove('active'));
+    const activeNav = document.querySelector(`.nav-item[data-view="${name}"]`);
+    if (activeNav) activeNav.classList.add('active');
+
+    closeDropdowns();
+}
+
+export function initNavigation() {
+    document.querySelectorAll('.nav-item, .feature-card').forEach(item => {
+        item.addEventListener('click', function() {
+            if (this.dataset.view) showView(this.dataset.view);
+        });
+    });
+
+    document.querySelectorAll('.dropdown-item[data-view]').forEach(item => {
+        item.addEventListener('click', function(e) {
+            e.preventDefault();
+            showView(this.dataset.view);
+        });
+    });
+
+    ['backToHome', 'backToHomeCrisis'].forEach(id => {
+        const button = document.getElementById(id);
+        if (button) button.addEventListener('click', () => showView('home'));
+    });
+
+    // Bootstrap's dropdown plugin when it is loaded, a manual toggle otherwise
+    const toggle = document.querySelector('.dropdown-toggle[data-bs-toggle="dropdown"]');
+    if (typeof bootstrap !== 'undefined' && bootstrap.Dropdown) {
+        document.querySelectorAll('[data-bs-toggle="dropdown"]').forEach(t => new bootstrap.Dropdown(t));
+    } else if (toggle) {
+        toggle.addEventListener('click', function() {
+            const menu = this.nextElementSibling;
+            if (!menu || !menu.classList.contains('dropdown-menu')) return;
+            const isShown = menu.classList.contains('show');
+            closeDropdowns(menu);
+            menu.classList.toggle('show', !isShown);
+            this.setAttribute('aria-expanded', String(!isShown));
+        });
+        document.addEventListener('click', e => {
+            const inside = [...document.querySelectorAll('.dropdown-toggle')].some(t =>
+                t.contains(e.target) || (t.nextElementSibling && t.nextElementSibling.contains(e.target)));
+            if (!inside) closeDropdowns();
+        });
+    }
+
+    const sidebarToggle = document.getElementById('sidebarToggle');
+    if (sidebarToggle) {
+        sidebarToggle.addEventListener('click', function() {
+            document.getElementById('sidebar').classList.toggle('collapsed');
+            document.getElementById('mainContent').classList.toggle('expanded');
+            document.getElementById('mobileOverlay').classList.toggle('active');
+        });
+    }
+}
+
+function applyTheme(theme) {
+    document.documentElement.setAttribute('data-theme', theme);
+    const icon = document.querySelector('#themeToggle i');
+    if (icon) icon.className = theme === 'dark' ? 'bi bi-sun fs-5' : 'bi bi-moon fs-5';
+}
+
+export function initTheme() {
+    const savedTheme = localStorage.getItem('theme');
+    if (savedTheme) applyTheme(savedTheme);
+
+    const themeToggle = document.getElementById('themeToggle');
+    if (themeToggle) {
+        themeToggle.addEventListener('click', () => {
+            const newTheme = document.documentElement.getAttribute('data-theme') === 'dark' ? 'light' : 'dark';
+            applyTheme(newTheme);
+            localStorage.setItem('theme', newTheme);
+        });
+    }
+}
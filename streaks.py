@@ -0,0 +1,198 @@
+# streaks.py
+#
+# Activity streaks: current streak, longest streak and this week's total.
+#
+# Updates are one conditional UPDATE per completion, so two concurrent
+# completions can never double-increment or lose an update: only the first
+# one of the day matches `last_activity_date < today`. Reads come from an
+# in-process cache, so they cost no DB hit. Callers invalidate it once the
+# write has committed, and a read that overlapped an invalidation is not
+# cached, so the cache never keeps a value from before the commit.
+#
+# rebuild_all() recomputes every user's streaks from UserActivityCompletion
+# in one vectorized NumPy pass (e.g. after a backfill or data repair).
+
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import case, func, select, update
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+class StreakService:
+    def __init__(self, db, user_model, completion_model, ttl=300):
+        self.db = db
+        self.User = user_model
+        self.Completion = completion_model
+        self.ttl = ttl
+        self._cache = {}  # user id -> (stats dict, loaded_at)
+        self._invalidations = 0  # bumped by invalidate(); loads that overlap one are not cached
+        self._lock = threading.Lock()
+
+    # ---- writes -------------------------------------------------------
+
+    def record(self, user_id, today):
+        """Counts a completion on `today`; call in the same transaction as the insert,
+        and invalidate(user_id) after the commit."""
+        self.db.session.execute(self._record_stmt(user_id, today))
+
+    async def arecord(self, session, user_id, today):
+        """record() on an AsyncSession (ASGI routes)."""
+        await session.execute(self._record_stmt(user_id, today))
+
+    def _record_stmt(self, user_id, today):
+        U = self.User
+        yesterday = today - timedelta(days=1)
+        new_streak = case(
+            (U.last_activity_date == yesterday, func.coalesce(U.activity_streak, 0) + 1),
+            else_=1,
+        )
+        longest = func.coalesce(U.longest_streak, 0)
+        return (
+            update(U)
+            .where(U.id == user_id)
+            .where((U.last_activity_date.is_(None)) | (U.last_activity_date < today))
+            .values(
+                activity_streak=new_streak,
+                longest_streak=case((new_streak > longest, new_streak), else_=longest),
+                last_activity_date=today,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    # ---- reads --------------------------------------------------------
+
+    def _load_stmts(self, user_id, today):
+        U, C = self.User, self.Completion
+        return (
+            select(U.activity_streak, U.longest_streak, U.last_activity_date).where(U.id == user_id),
+            select(func.count(C.id)).where(C.user_id == user_id, C.completed_day >= week_start(today)),
+        )
+
+    def _load(self, user_id, today):
+        row_stmt, week_stmt = self._load_stmts(user_id, today)
+        row = self.db.session.execute(row_stmt).one_or_none()
+        if row is None:
+            return None
+        return self._stats(row, self.db.session.execute(week_stmt).scalar(), today)
+
+    async def _aload(self, session, user_id, today):
+        row_stmt, week_stmt = self._load_stmts(user_id, today)
+        row = (await session.execute(row_stmt)).one_or_none()
+        if row is None:
+            return None
+        return self._stats(row, (await session.execute(week_stmt)).scalar(), today)
+
+    def _stats(self, row, week, today):
+        return {
+            "stored": row.activity_streak or 0,
+            "longest": row.longest_streak or 0,
+            "last_date": row.last_activity_date,
+            "week_start": week_start(today),
+            "week": week or 0,
+        }
+
+    def _cached(self, user_id, today, now):
+        with self._lock:
+            entry = self._cache.get(user_id)
+        if entry is None or now - entry[1] > self.ttl or entry[0]["week_start"] != week_start(today):
+            return None
+        return entry[0]
+
+    def _remember(self, user_id, stats, now, seen):
+        # `seen` is the invalidation count from before the load
+        if stats is not None:
+            with self._lock:
+                if self._invalidations == seen:
+                    self._cache[user_id] = (stats, now)
+        return stats
+
+    def get(self, user_id, today=None):
+        """Returns {'current', 'longest', 'week'} for a user (cached)."""
+        today = today or date.today()
+        now, seen = time.monotonic(), self._invalidations
+        stats = self._cached(user_id, today, now) or \
+            self._remember(user_id, self._load(user_id, today), now, seen)
+        return self._view(stats, today)
+
+    async def aget(self, session, user_id, today=None):
+        """get() on an AsyncSession (ASGI routes)."""
+        today = today or date.today()
+        now, seen = time.monotonic(), self._invalidations
+        stats = self._cached(user_id, today, now) or \
+            self._remember(user_id, await self._aload(session, user_id, today), now, seen)
+        return self._view(stats, today)
+
+    def _view(self, stats, today):
+        if stats is None:
+            return {"current": 0, "longest": 0, "week": 0}
+        last = stats["last_date"]
+        # a streak is only alive if the last completion was today or yesterday
+        current = stats["stored"] if last and last >= today - timedelta(days=1) else 0
+        return {"current": current, "longest": stats["longest"], "week": stats["week"]}
+
+    def invalidate(self, user_id):
+        """Drops a user's cached stats; call after the commit that changed them."""
+        with self._lock:
+            self._invalidations += 1
+            self._cache.pop(user_id, None)
+
+    # ---- batch rebuild -----------------------------------------------
+
+    def rebuild_all(self, chunk_size=10000):
+        """Recomputes current/longest streaks for all users from completions; returns users updated."""
+        import numpy as np  # only the CLI rebuild needs it; keeps it out of worker startup
+
+        C = self.Completion
+        rows = self.db.session.query(C.user_id, C.completed_day).distinct() \
+            .filter(C.completed_day.isnot(None)) \
+            .order_by(C.user_id, C.completed_day).all()
+
+        updates = []
+        if rows:
+            users = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+            days = np.fromiter((r[1].toordinal() for r in rows), dtype=np.int64, count=len(rows))
+
+            # a new run starts where the user changes or the day isn't consecutive
+            starts = np.ones(len(rows), dtype=bool)
+            starts[1:] = (users[1:] != users[:-1]) | (days[1:] - days[:-1] != 1)
+            run_ids = np.cumsum(starts) - 1
+            run_len = np.bincount(run_ids)
+            run_start = np.flatnonzero(starts)
+            run_user = users[run_start]
+            run_last_day = days[np.r_[run_start[1:] - 1, len(rows) - 1]]
+
+            # per-user aggregates over runs (runs are grouped by user)
+            user_first_run = np.flatnonzero(np.r_[True, run_user[1:] != run_user[:-1]])
+            longest = np.maximum.reduceat(run_len, user_first_run)
+            user_last_run = np.r_[user_first_run[1:] - 1, len(run_len) - 1]
+            last_len = run_len[user_last_run]
+            last_day = run_last_day[user_last_run]
+
+            for uid, lng, cur, day in zip(run_user[user_first_run].tolist(), longest.tolist(),
+                                          last_len.tolist(), last_day.tolist()):
+                updates.append({
+                    "id": uid,
+                    "activity_streak": cur,
+                    "longest_streak": lng,
+                    "last_activity_date": date.fromordinal(day),
+                })
+
+        # users without any completion have no streak
+        self.db.session.execute(
+            update(self.User)
+            .where(self.User.id.not_in(self.db.session.query(C.user_id).distinct()))
+            .values(activity_streak=0, longest_streak=0, last_activity_date=None)
+            .execution_options(synchronize_session=False)
+        )
+        for i in range(0, len(updates), chunk_size):
+            self.db.session.execute(update(self.User), updates[i:i + chunk_size])
+        self.db.session.commit()
+        with self._lock:
+            self._invalidations += 1
+            self._cache.clear()
+        return len(updates)
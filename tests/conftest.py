@@ -0,0 +1,19 @@
+# tests/conftest.py
+#
+# Runs the app offline: a throwaway SQLite database, the stub model and
+# cheap password hashing, set before anything imports app.py.
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.update({
+    "DATABASE_URL": "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db"),
+    "AUTO_MIGRATE": "1",
+    "LLM_BACKEND": "stub",
+    "PASSWORD_POOL_SIZE": "0",
+    "BCRYPT_ROUNDS": "4",
+})
@@ -0,0 +1,112 @@
+# tests/test_jobs.py
+#
+# The job queue on the test database -- claim order, retries, lease
+# recovery -- and the owner-scoped, long-polling /jobs/<id> route.
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import JOB_WAIT_MAX, app, job_wait
+from jobs import FAILED, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, QUEUED, RUNNING, JobQueue, task
+from models import db, Job
+
+
+@task("tests.echo")
+def echo(**payload):
+    return payload
+
+
+@pytest.fixture
+def queue():
+    with app.app_context():
+        db.session.execute(db.delete(Job))
+        db.session.commit()
+        yield JobQueue(db, Job, lease=60, retry_delay=5)
+
+
+def move(job_id, **values):
+    """Shifts a job's timestamps, standing in for time passing."""
+    db.session.execute(db.update(Job).where(Job.id == job_id).values(**values))
+    db.session.commit()
+
+
+# ---------------------------
+# queue
+# ---------------------------
+
+def test_claims_by_priority_then_age(queue):
+    first = queue.enqueue("tests.echo", priority=PRIORITY_BACKGROUND)
+    urgent = queue.enqueue("tests.echo", priority=PRIORITY_INTERACTIVE)
+    second = queue.enqueue("tests.echo", priority=PRIORITY_BACKGROUND)
+    assert [queue.claim("w")[0] for _ in range(3)] == [urgent, first, second]
+    assert queue.claim("w") is None
+
+
+def test_failed_attempt_backs_off_then_fails_for_good(queue):
+    job_id = queue.enqueue("tests.echo", max_attempts=2)
+    _, _, _, attempts, max_attempts = queue.claim("w")
+    queue.fail(job_id, "boom", attempts, max_attempts)
+
+    job = queue.get(job_id)
+    assert job["status"] == QUEUED
+    assert job["run_at"] >= datetime.utcnow() + timedelta(seconds=4)
+    assert queue.claim("w") is None
+
+    move(job_id, run_at=datetime.utcnow() - timedelta(seconds=1))
+    _, _, _, attempts, max_attempts = queue.claim("w")
+    assert attempts == 2
+    queue.fail(job_id, "boom again", attempts, max_attempts)
+    job = queue.get(job_id)
+    assert job["status"] == FAILED
+    assert job["error"] == "boom again"
+
+
+def test_expired_lease_is_requeued(queue):
+    job_id = queue.enqueue("tests.echo", {"n": 1})
+    queue.claim("dead-worker")
+    assert queue.recover() == 0
+    assert queue.get(job_id)["status"] == RUNNING
+
+    move(job_id, started_at=datetime.utcnow() - timedelta(seconds=61))
+    assert queue.recover() == 1
+    assert queue.get(job_id)["status"] == QUEUED
+    assert queue.claim("w") == (job_id, "tests.echo", {"n": 1}, 2, 3)
+
+
+# ---------------------------
+# routes
+# ---------------------------
+
+def test_job_status_is_scoped_to_its_owner(queue):
+    job_id = queue.enqueue("tests.echo", owner="owner@example.com")
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["email"] = "someone-else@example.com"
+    assert client.get(f"/jobs/{job_id}").status_code == 404
+    assert client.get(f"/jobs/{job_id + 1000}").status_code == 404
+
+    with client.session_transaction() as sess:
+        sess["email"] = "owner@example.com"
+    response = client.get(f"/jobs/{job_id}")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == QUEUED
+
+
+# ---------------------------
+# long-poll
+# ---------------------------
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 0),
+    ("", 0),
+    ("1.5", 1.5),
+    ("-3", 0),
+    ("99", JOB_WAIT_MAX),
+    ("soon", 0),
+    ("nan", 0),
+    ("inf", 0),
+    ("-inf", 0),
+])
+def test_job_wait_is_clamped(value, expected):
+    assert job_wait(value, JOB_WAIT_MAX) == expected
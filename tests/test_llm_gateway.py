@@ -0,0 +1,193 @@
+# tests/test_llm_gateway.py
+#
+# Retries, deadline and circuit breaker of the LLM gateway, driven by
+# StubModel, plus the canned reply a route serves while the breaker is open.
+
+import asyncio
+import time
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from llm_gateway import CircuitBreaker, CircuitOpen, LLMGateway, LLMUnavailable, StubModel, StubResponse
+
+
+def gateway(**kwargs):
+    kwargs.setdefault("model_factory", StubModel)
+    kwargs.setdefault("backoff", 0)
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    return LLMGateway(**kwargs)
+
+
+def failing(*errors):
+    """A call that raises `errors` in turn, then answers."""
+    errors = list(errors)
+    calls = []
+
+    def fn(options):
+        calls.append(options)
+        if errors:
+            raise errors.pop(0)
+        return StubResponse("ok")
+    fn.calls = calls
+    return fn
+
+
+# ---------------------------
+# retries and deadline
+# ---------------------------
+
+def test_generate_uses_stub_model():
+    assert gateway().generate("Give me an affirmation") == "You are doing better than you think."
+
+
+def test_transient_errors_are_retried():
+    gw = gateway(retries=2)
+    fn = failing(ConnectionError("reset"), api_exceptions.ServiceUnavailable("503"))
+    assert gw.call(fn).text == "ok"
+    assert len(fn.calls) == 3
+    assert gw.breaker.failures == 0
+
+
+def test_exhausted_retries_raise_unavailable_and_count_once():
+    gw = gateway(retries=1)
+    fn = failing(*[ConnectionError("reset")] * 3)
+    with pytest.raises(LLMUnavailable):
+        gw.call(fn)
+    assert len(fn.calls) == 2
+    assert gw.breaker.failures == 1
+
+
+@pytest.mark.parametrize("error", [
+    ValueError("bad prompt"),
+    api_exceptions.InvalidArgument("400"),
+    api_exceptions.PermissionDenied("invalid API key"),
+])
+def test_client_errors_are_not_retried_or_counted(error):
+    gw = gateway(retries=2)
+    fn = failing(error)
+    with pytest.raises(type(error)):
+        gw.call(fn)
+    assert len(fn.calls) == 1
+    assert gw.breaker.failures == 0
+
+
+def test_rate_limits_are_retried_but_not_counted():
+    gw = gateway(retries=0)
+    with pytest.raises(LLMUnavailable):
+        gw.call(failing(api_exceptions.TooManyRequests("429")))
+    assert gw.breaker.failures == 0
+
+
+def test_one_deadline_covers_all_attempts():
+    gw = gateway(timeout=0.3, retries=10)
+
+    def slow(options):
+        slow.timeouts.append(options["timeout"])
+        time.sleep(0.1)
+        raise TimeoutError("slow upstream")
+    slow.timeouts = []
+
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailable):
+        gw.call(slow)
+    assert time.monotonic() - started < 0.5
+    assert len(slow.timeouts) <= 3
+    assert slow.timeouts == sorted(slow.timeouts, reverse=True)
+
+
+def test_async_deadline_cancels_the_attempt():
+    gw = gateway(timeout=0.2, retries=5)
+
+    async def hang(options):
+        await asyncio.sleep(5)
+
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(gw.acall(hang))
+    assert time.monotonic() - started < 1
+    assert gw.breaker.failures == 1
+
+
+# ---------------------------
+# circuit breaker
+# ---------------------------
+
+def test_breaker_opens_after_threshold():
+    gw = gateway(retries=0)
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            gw.call(failing(ConnectionError("down")))
+    assert gw.breaker.state == "open"
+    fn = failing()
+    with pytest.raises(CircuitOpen):
+        gw.call(fn)
+    assert fn.calls == []
+
+
+def test_half_open_admits_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes_the_breaker():
+    gw = gateway(retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+    with pytest.raises(LLMUnavailable):
+        gw.call(failing(ConnectionError("down")))
+    time.sleep(0.06)
+    assert gw.call(failing()).text == "ok"
+    assert gw.breaker.state == "closed"
+    assert gw.breaker.allow() and gw.breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker():
+    gw = gateway(retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+    with pytest.raises(LLMUnavailable):
+        gw.call(failing(ConnectionError("down")))
+    time.sleep(0.06)
+    with pytest.raises(LLMUnavailable):
+        gw.call(failing(ConnectionError("still down")))
+    assert gw.breaker.state == "open"
+
+
+def test_probe_without_verdict_frees_the_slot():
+    gw = gateway(retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+    with pytest.raises(LLMUnavailable):
+        gw.call(failing(ConnectionError("down")))
+    time.sleep(0.06)
+    with pytest.raises(ValueError):
+        gw.call(failing(ValueError("bad prompt")))
+    assert gw.breaker.state == "half-open"
+    assert gw.breaker.allow()
+
+
+# ---------------------------
+# fallback
+# ---------------------------
+
+def test_affirmation_falls_back_while_circuit_is_open():
+    from app import FALLBACK_AFFIRMATIONS, app
+
+    client = app.test_client()
+    client.post("/register", data=dict(
+        firstName="Test", lastName="User", email="breaker@example.com", phone="1", password="pw",
+        gender="M", birthDate="2000-01-01", eduLevel="UG", fieldOfStudy="CS"))
+    with client.session_transaction() as sess:
+        sess["email"] = "breaker@example.com"
+    client.post("/lifestyle", data=dict(
+        diet="veg", physicalActivity="low", socialInteraction="low", relaxHabit="music",
+        screenTime=5, stressLevel=6, sleepHrs=7))
+
+    breaker = app.extensions["mannkibaat"].llm.breaker
+    breaker.opened_at = time.monotonic()
+    try:
+        body = client.get("/affirmation").get_json()
+    finally:
+        breaker.record_success()
+    assert body["degraded"] is True
+    assert body["affirmation"] in FALLBACK_AFFIRMATIONS
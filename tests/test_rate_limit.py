@@ -0,0 +1,115 @@
+# tests/test_rate_limit.py
+#
+# Token buckets in memory and in the app database (SQLite), on a fake clock,
+# plus the 429 a model-backed route answers once a bucket is empty.
+
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from app import app
+from models import db, RateLimitBucket
+from rate_limit import MemoryBucketStore, RateLimiter, SQLBucketStore
+
+_keys = itertools.count()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1_000_000.0)
+    clock.time = lambda: clock.now
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sql"])
+def store(request):
+    if request.param == "memory":
+        yield MemoryBucketStore()
+        return
+    with app.app_context():
+        yield SQLBucketStore(db, RateLimitBucket, idle_seconds=60)
+
+
+def new_key():
+    return f"limit{next(_keys)}@example.com"
+
+
+class BrokenStore(rate_limit.BucketStore):
+    def take(self, key, capacity, rate, cost):
+        raise ConnectionError("store down")
+
+
+# ---------------------------
+# buckets
+# ---------------------------
+
+def test_burst_is_exhausted(store, clock):
+    limiter, key = RateLimiter(store, burst=3, per_minute=30), new_key()
+    assert [limiter.hit(key).remaining for _ in range(3)] == [2, 1, 0]
+    decision = limiter.hit(key)
+    assert not decision.allowed
+    assert limiter.stats() == {"allowed": 3, "limited": 1, "errors": 0}
+
+
+def test_retry_after_is_time_to_next_token(store, clock):
+    limiter, key = RateLimiter(store, burst=1, per_minute=30), new_key()  # a token every 2 s
+    limiter.hit(key)
+    assert limiter.hit(key).retry_after == 2
+    clock.now += 1
+    assert limiter.hit(key).retry_after == 1
+
+
+def test_bucket_refills_over_time_up_to_burst(store, clock):
+    limiter, key = RateLimiter(store, burst=2, per_minute=30), new_key()
+    limiter.hit(key)
+    limiter.hit(key)
+    assert not limiter.hit(key).allowed
+    clock.now += 2
+    assert limiter.hit(key).allowed
+    assert not limiter.hit(key).allowed
+    clock.now += 3600
+    assert [limiter.hit(key).allowed for _ in range(3)] == [True, True, False]
+
+
+def test_sql_purge_expired_removes_idle_buckets(clock):
+    with app.app_context():
+        store = SQLBucketStore(db, RateLimitBucket, idle_seconds=60)
+        idle, active = new_key(), new_key()
+        store.take(idle, 2, 0.5, 1)
+        clock.now += 61
+        store.take(active, 2, 0.5, 1)
+        assert store.purge_expired() >= 1
+        assert db.session.get(RateLimitBucket, idle) is None
+        assert db.session.get(RateLimitBucket, active) is not None
+        # a purged bucket is a full one
+        assert store.take(idle, 2, 0.5, 1) == (True, 1)
+
+
+def test_store_error_lets_the_call_through():
+    limiter = RateLimiter(BrokenStore(), burst=1, per_minute=30)
+    assert all(limiter.hit("anyone").allowed for _ in range(3))
+    assert limiter.stats()["errors"] == 3
+
+
+# ---------------------------
+# routes
+# ---------------------------
+
+def test_route_answers_429_with_retry_after(clock):
+    services = app.extensions["mannkibaat"]
+    original = services.rate_limiter
+    services.rate_limiter = RateLimiter(MemoryBucketStore(), burst=1, per_minute=30)
+    try:
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["email"] = new_key()
+        client.get("/affirmation")
+        response = client.get("/affirmation")
+    finally:
+        services.rate_limiter = original
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert response.get_json()["retry_after"] == 2
@@ -0,0 +1,124 @@
+# tests/test_streaks.py
+#
+# StreakService against the test database: the once-a-day conditional
+# update, the NumPy rebuild and the read cache.
+
+import itertools
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import app
+from models import db, Activity, Userdb, UserActivityCompletion
+from streaks import StreakService
+
+DAY = date(2024, 3, 4)  # a Monday
+_ids = itertools.count()
+
+
+@pytest.fixture
+def streaks():
+    with app.app_context():
+        yield StreakService(db, Userdb, UserActivityCompletion)
+        db.session.rollback()
+
+
+def new_user():
+    user = Userdb(firstName="Streak", lastName="User", email=f"streak{next(_ids)}@example.com", phone="1",
+                  password="pw", gender="F", birthDate=date(2000, 1, 1), eduLevel="UG", fieldOfStudy="CS")
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def new_activity():
+    activity = Activity(title=f"Streak activity {next(_ids)}")
+    db.session.add(activity)
+    db.session.commit()
+    return activity.id
+
+
+def complete(streaks, user_id, activity_id, day):
+    """What /complete_activity does: the completion row plus the streak update, then invalidate."""
+    db.session.add(UserActivityCompletion(user_id=user_id, activity_id=activity_id, completed_day=day))
+    streaks.record(user_id, day)
+    db.session.commit()
+    streaks.invalidate(user_id)
+
+
+@contextmanager
+def recorded_queries():
+    statements = []
+
+    def before(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", before)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before)
+
+
+# ---------------------------
+# incremental updates
+# ---------------------------
+
+def test_two_completions_on_one_day_count_once(streaks):
+    user = new_user()
+    complete(streaks, user, new_activity(), DAY)
+    complete(streaks, user, new_activity(), DAY)
+    assert streaks.get(user, DAY) == {"current": 1, "longest": 1, "week": 2}
+
+
+def test_consecutive_days_increment_and_a_gap_resets(streaks):
+    user, activity = new_user(), new_activity()
+    complete(streaks, user, activity, DAY)
+    complete(streaks, user, activity, DAY + timedelta(days=1))
+    assert streaks.get(user, DAY + timedelta(days=1))["current"] == 2
+
+    # nothing on day 3: the streak is broken before the next completion is even recorded
+    assert streaks.get(user, DAY + timedelta(days=3))["current"] == 0
+    complete(streaks, user, activity, DAY + timedelta(days=3))
+    assert streaks.get(user, DAY + timedelta(days=3)) == {"current": 1, "longest": 2, "week": 3}
+
+
+# ---------------------------
+# batch rebuild
+# ---------------------------
+
+def test_rebuild_all_matches_incremental_updates(streaks):
+    activity = new_activity()
+    histories = [[0, 1, 2, 5, 6], [0, 2, 3, 4, 5, 9], [4], [0, 1, 2, 3, 6, 7]]
+    users = []
+    for offsets in histories:
+        user = new_user()
+        for offset in offsets:
+            complete(streaks, user, activity, DAY + timedelta(days=offset))
+        users.append(user)
+    today = DAY + timedelta(days=7)
+    incremental = [streaks.get(user, today) for user in users]
+
+    db.session.execute(db.update(Userdb).where(Userdb.id.in_(users))
+                       .values(activity_streak=0, longest_streak=0, last_activity_date=None))
+    db.session.commit()
+    streaks.rebuild_all(chunk_size=2)
+    assert [streaks.get(user, today) for user in users] == incremental
+
+
+# ---------------------------
+# read cache
+# ---------------------------
+
+def test_cached_read_makes_no_query(streaks):
+    user = new_user()
+    complete(streaks, user, new_activity(), DAY)
+    first = streaks.get(user, DAY)
+
+    with recorded_queries() as statements:
+        assert streaks.get(user, DAY) == first
+        assert statements == []
+        streaks.invalidate(user)
+        assert streaks.get(user, DAY) == first
+        assert statements
@@ -0,0 +1,137 @@
+# tests/test_trends.py
+#
+# TrendService against the test database: the rollup upserts of live
+# writes, the credit a newly selected category gets, and a chunked backfill
+# that must land on the same totals. Each test writes to its own dates, so
+# the shared category rows of one test don't leak into another.
+
+import itertools
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import app
+from models import db, Activity, LifestyleSnapshot, TrendRollup, UserActivityCompletion, UserCategorySelection, Userdb
+from trends import TrendService
+
+_ids = itertools.count()
+
+
+@pytest.fixture
+def trends():
+    with app.app_context():
+        yield TrendService(db, TrendRollup, LifestyleSnapshot, UserActivityCompletion, UserCategorySelection)
+        db.session.rollback()
+
+
+def new_user():
+    user = Userdb(firstName="Trend", lastName="User", email=f"trend{next(_ids)}@example.com", phone="1",
+                  password="pw", gender="F", birthDate=date(2000, 1, 1), eduLevel="UG", fieldOfStudy="CS")
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def check_in(trends, user_id, day, stress, sleep=7, screen=4):
+    """What POST /lifestyle does: a snapshot counted towards the user's current categories."""
+    trends.record_lifestyle(user_id, trends.categories(user_id), dict(
+        diet="veg", physicalActivity="low", socialInteraction="low", relaxHabit="music",
+        screenTime=screen, stressLevel=stress, sleepHrs=sleep), now=datetime.combine(day, datetime.min.time()))
+    db.session.commit()
+
+
+def complete(trends, user_id, day):
+    """What /complete_activity does: the completion row and its count in one transaction."""
+    activity = Activity(title=f"Trend activity {next(_ids)}")
+    db.session.add(activity)
+    db.session.flush()
+    db.session.add(UserActivityCompletion(user_id=user_id, activity_id=activity.id, completed_day=day))
+    trends.record_completion(user_id, trends.categories(user_id), day)
+    db.session.commit()
+
+
+def pick_category(trends, user_id, category):
+    """What POST /category does: credit the category, then add the selection."""
+    trends.select_category(user_id, category)
+    db.session.add(UserCategorySelection(user_id=user_id, category=category, subcategory="any"))
+    db.session.commit()
+
+
+def point(series, period, start):
+    return next(p for p in series[period] if p["start"] == start.isoformat())
+
+
+# ---------------------------
+# live writes
+# ---------------------------
+
+def test_writes_add_to_day_and_week_totals(trends):
+    day = date(2023, 1, 4)  # a Wednesday
+    user = new_user()
+    check_in(trends, user, day, stress=6, sleep=8)
+    check_in(trends, user, day, stress=3, sleep=5)
+    check_in(trends, user, day + timedelta(days=1), stress=9)
+    complete(trends, user, day)
+
+    series = trends.get(user, [], day + timedelta(days=1))["user"]
+    assert point(series, "day", day) == {"start": day.isoformat(), "checkins": 2, "stress": 4.5, "sleep": 6.5,
+                                         "screen": 4.0, "completions": 1}
+    week = point(series, "week", date(2023, 1, 2))
+    assert (week["checkins"], week["stress"], week["completions"]) == (3, 6.0, 1)
+
+
+def test_writes_count_towards_selected_categories_only(trends):
+    day = date(2023, 3, 8)
+    user = new_user()
+    pick_category(trends, user, "Health")
+    pick_category(trends, user, "not a category")
+    check_in(trends, user, day, stress=5)
+    complete(trends, user, day)
+
+    view = trends.get(user, ["Health", "not a category"], day)
+    assert list(view["categories"]) == ["Health"]
+    assert point(view["categories"]["Health"], "day", day)["checkins"] == 1
+    assert point(view["categories"]["Health"], "day", day)["completions"] == 1
+
+
+# ---------------------------
+# selecting a category
+# ---------------------------
+
+def test_selecting_a_category_credits_the_users_history_once(trends):
+    day = date(2023, 5, 10)
+    user = new_user()
+    check_in(trends, user, day, stress=4)
+    complete(trends, user, day + timedelta(days=1))
+    pick_category(trends, user, "Mindset")
+    pick_category(trends, user, "Mindset")  # a second subcategory of the same category
+
+    mindset = trends.get(user, ["Mindset"], day + timedelta(days=1))["categories"]["Mindset"]
+    assert point(mindset, "day", day)["checkins"] == 1
+    assert point(mindset, "day", day)["stress"] == 4.0
+    assert point(mindset, "day", day + timedelta(days=1))["completions"] == 1
+
+
+# ---------------------------
+# backfill
+# ---------------------------
+
+def test_chunked_backfill_matches_live_totals(trends):
+    day = date(2023, 7, 3)
+    users = [new_user() for _ in range(3)]
+    check_in(trends, users[0], day, stress=7)
+    pick_category(trends, users[0], "Spirituality")
+    pick_category(trends, users[1], "Spirituality")
+    for offset in range(5):
+        check_in(trends, users[offset % 3], day + timedelta(days=offset), stress=offset + 1, sleep=6 + offset % 2)
+        complete(trends, users[(offset + 1) % 3], day + timedelta(days=offset))
+    pick_category(trends, users[2], "Relationships")
+    check_in(trends, users[2], day + timedelta(days=6), stress=2)
+
+    today = day + timedelta(days=6)
+    categories = ["Spirituality", "Relationships"]
+    live = [trends.get(user, categories, today) for user in users]
+
+    result = trends.backfill(chunk_size=2)
+    assert result["snapshots"] >= 7 and result["completions"] >= 5
+    assert [trends.get(user, categories, today) for user in users] == live
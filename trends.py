@@ -0,0 +1,258 @@
+# trends.py
+#
+# Lifestyle and wellbeing trends for the dashboard.
+#
+# Every /lifestyle answer is appended to LifestyleSnapshot (Lifestyle only
+# keeps the latest), and every write -- a snapshot or an activity
+# completion -- adds to running totals in TrendRollup: one row per
+# (scope, subject, period, period_start), where the scope is the user or one
+# of the categories (categories_data) they are working on, and the period a
+# day or a week. Selecting a category credits it with the user's history so
+# far, so category totals always cover every selected user's whole history,
+# the same as a backfill. A write is one upsert of those few rows in the same
+# transaction as the row it counts, so its cost does not grow with history,
+# and the dashboard reads a user's series plus their categories' with one
+# query of primary-key ranges.
+#
+# backfill() rebuilds all totals from the raw tables one id range at a
+# time, so it runs in bounded memory on millions of rows; writes pause only
+# while it clears the old totals.
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Date, and_, bindparam, func, or_, select, text
+
+from categories_data import categories as CATEGORIES
+from streaks import week_start
+
+COUNTERS = ("checkins", "stress_sum", "sleep_sum", "screen_sum", "completions")
+
+
+def category_names(ctx):
+    """The category names a UserContext's selections point at."""
+    return [c.category for c in ctx.categories] if ctx is not None else []
+
+
+def _subjects(user_id, categories):
+    # unknown category names (free text, renamed categories) only count towards the user
+    return [("user", str(user_id))] + [("category", c) for c in sorted(set(categories)) if c in CATEGORIES]
+
+
+def _periods(day):
+    return [("day", day), ("week", week_start(day))]
+
+
+def _average(total, count):
+    return round(total / count, 1) if count else None
+
+
+class TrendService:
+    def __init__(self, db, rollup_model, snapshot_model, completion_model, selection_model, days=14, weeks=12):
+        self.db = db
+        self.Rollup = rollup_model
+        self.Snapshot = snapshot_model
+        self.Completion = completion_model
+        self.Selection = selection_model
+        self.days = days
+        self.weeks = weeks
+        # built once: constructing these statements costs more than running them
+        self._read_stmts = {}  # number of subjects -> select
+        self._add_stmt = self._build_add_stmt()
+        self._credit_stmt = self._build_credit_stmt()
+
+    # ---- writes -------------------------------------------------------
+
+    def categories(self, user_id):
+        """Names of the categories a user has selected (for writes outside a UserContext)."""
+        S = self.Selection
+        return self.db.session.execute(select(S.category).where(S.user_id == user_id).distinct()).scalars().all()
+
+    def record_lifestyle(self, user_id, categories, values, now=None):
+        """Appends a snapshot of `values` (Lifestyle columns) and counts it; call before the commit."""
+        now = now or datetime.utcnow()
+        self.db.session.execute(self.Snapshot.__table__.insert().values(
+            user_id=user_id, recorded_at=now, recorded_day=now.date(), **values))
+        self.db.session.execute(self._add_stmt, self._rows(
+            user_id, categories, now.date(), checkins=1, stress_sum=values["stressLevel"],
+            sleep_sum=values["sleepHrs"], screen_sum=values["screenTime"]))
+
+    def record_completion(self, user_id, categories, day):
+        """Counts an activity completion on `day`; call in the same transaction as the insert."""
+        self.db.session.execute(self._add_stmt, self._rows(user_id, categories, day, completions=1))
+
+    async def arecord_completion(self, session, user_id, categories, day):
+        """record_completion() on an AsyncSession (ASGI routes)."""
+        await session.execute(self._add_stmt, self._rows(user_id, categories, day, completions=1))
+
+    def select_category(self, user_id, category):
+        """Credits `category` with the user's history when they select it for the first time;
+        call before the new selection is added."""
+        if category not in CATEGORIES or category in self.categories(user_id):
+            return
+        self.db.session.execute(self._credit_stmt, {"category": category, "user": str(user_id)})
+
+    def _rows(self, user_id, categories, day, **counts):
+        counts = {c: counts.get(c, 0) for c in COUNTERS}
+        # sorted, so concurrent writers lock shared (category) rows in the same order
+        return [dict(scope=scope, subject=subject, period=period, period_start=start, **counts)
+                for scope, subject in _subjects(user_id, categories) for period, start in _periods(day)]
+
+    def _build_add_stmt(self):
+        """Upsert adding a row's counters to the stored ones, executed with a list of rows (executemany).
+
+        Written as text: the syntax is the same on SQLite and Postgres, and
+        unlike the dialect insert() constructs it is compiled only once.
+        """
+        table = self.Rollup.__table__.name
+        keys = ("scope", "subject", "period", "period_start")
+        return text(
+            f"INSERT INTO {table} ({', '.join(keys + COUNTERS)})"
+            f" VALUES ({', '.join(':' + c for c in keys + COUNTERS)})"
+            f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+            + ", ".join(f"{c} = {table}.{c} + excluded.{c}" for c in COUNTERS)
+        ).bindparams(bindparam("period_start", type_=Date))
+
+    def _build_credit_stmt(self):
+        """Upsert adding a user's rollup rows to a category's (same dialect note as _build_add_stmt)."""
+        table = self.Rollup.__table__.name
+        keys = ("scope", "subject", "period", "period_start")
+        return text(
+            f"INSERT INTO {table} ({', '.join(keys + COUNTERS)})"
+            f" SELECT 'category', :category, period, period_start, {', '.join(COUNTERS)} FROM {table}"
+            f" WHERE scope = 'user' AND subject = :user"
+            f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+            + ", ".join(f"{c} = {table}.{c} + excluded.{c}" for c in COUNTERS)
+        )
+
+    # ---- reads --------------------------------------------------------
+
+    def _read(self, subjects, today):
+        """(statement, parameters) reading the series of `subjects`: one primary-key range per subject and period."""
+        stmt = self._read_stmts.get(len(subjects))
+        if stmt is None:
+            t = self.Rollup.__table__
+            stmt = self._read_stmts[len(subjects)] = select(t).where(or_(*[
+                and_(t.c.scope == bindparam(f"scope{i}"), t.c.subject == bindparam(f"subject{i}"),
+                     t.c.period == period, t.c.period_start >= bindparam(f"first_{period}"))
+                for i in range(len(subjects)) for period in ("day", "week")
+            ]))
+        params = {"first_day": today - timedelta(days=self.days - 1),
+                  "first_week": week_start(today) - timedelta(weeks=self.weeks - 1)}
+        for i, (scope, subject) in enumerate(subjects):
+            params[f"scope{i}"], params[f"subject{i}"] = scope, subject
+        return stmt, params
+
+    def get(self, user_id, categories, today=None):
+        """The user's and their categories' daily and weekly series (see _view)."""
+        today = today or date.today()
+        subjects = _subjects(user_id, categories)
+        rows = self.db.session.execute(*self._read(subjects, today)).all()
+        return self._view(rows, subjects, today)
+
+    async def aget(self, session, user_id, categories, today=None):
+        """get() on an AsyncSession (ASGI routes)."""
+        today = today or date.today()
+        subjects = _subjects(user_id, categories)
+        rows = (await session.execute(*self._read(subjects, today))).all()
+        return self._view(rows, subjects, today)
+
+    def _view(self, rows, subjects, today):
+        """{"user": series, "categories": {name: series}}; a series is {"day": [...], "week": [...]},
+        oldest first with empty periods filled in, each point holding averages and completions."""
+        found = {(r.scope, r.subject, r.period, r.period_start): r for r in rows}
+        starts = {
+            "day": [today - timedelta(days=n) for n in range(self.days - 1, -1, -1)],
+            "week": [week_start(today) - timedelta(weeks=n) for n in range(self.weeks - 1, -1, -1)],
+        }
+
+        def point(key, start):
+            r = found.get(key + (start,))
+            checkins = r.checkins if r else 0
+            return {
+                "start": start.isoformat(),
+                "checkins": checkins,
+                "stress": _average(r.stress_sum, checkins) if r else None,
+                "sleep": _average(r.sleep_sum, checkins) if r else None,
+                "screen": _average(r.screen_sum, checkins) if r else None,
+                "completions": r.completions if r else 0,
+            }
+
+        series = {(scope, subject): {period: [point((scope, subject, period), s) for s in days]
+                                     for period, days in starts.items()}
+                  for scope, subject in subjects}
+        return {
+            "user": series[subjects[0]],
+            "categories": {subject: s for (scope, subject), s in series.items() if scope == "category"},
+        }
+
+    # ---- batch backfill ---------------------------------------------
+
+    def backfill(self, chunk_size=10000):
+        """Rebuilds every rollup from snapshots and completions; returns row counts.
+
+        The totals are cleared and the newest snapshot/completion ids read in
+        one transaction; rows after those ids are counted by the live writes,
+        so the app can keep serving while this runs. That transaction must not
+        interleave with a live write, or the write's totals are deleted while
+        its row lies past the ids read (lost) or they survive while it is
+        counted again: SQLite serializes writers anyway, on Postgres the tables
+        are locked so in-flight writes finish first and new ones wait for the
+        (short) clear.
+        """
+        S, C, R = self.Snapshot, self.Completion, self.Rollup
+        with self.db.engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # same order as the writers (raw row, then totals), so this cannot deadlock with them
+                conn.execute(text(f"LOCK TABLE {S.__tablename__}, {C.__tablename__} IN SHARE MODE"))
+                conn.execute(text(f"LOCK TABLE {R.__tablename__} IN EXCLUSIVE MODE"))
+            conn.execute(R.__table__.delete())
+            last_snapshot = conn.execute(select(func.max(S.id))).scalar() or 0
+            last_completion = conn.execute(select(func.max(C.id))).scalar() or 0
+
+        snapshots = self._backfill_chunks(
+            S.id, S.user_id, S.recorded_day, last_snapshot, chunk_size,
+            checkins=func.count(), stress_sum=func.sum(S.stressLevel), sleep_sum=func.sum(S.sleepHrs),
+            screen_sum=func.sum(S.screenTime))
+        completions = self._backfill_chunks(
+            C.id, C.user_id, C.completed_day, last_completion, chunk_size, completions=func.count())
+        with self.db.engine.connect() as conn:
+            rollups = conn.execute(select(func.count()).select_from(R.__table__)).scalar()
+        return {"snapshots": snapshots, "completions": completions, "rollups": rollups}
+
+    def _backfill_chunks(self, id_column, user_column, day_column, last_id, chunk_size, **counters):
+        """Adds the rows with ids up to `last_id`, one id range of `chunk_size` per transaction; returns how many.
+
+        `counters` maps rollup columns to aggregates; the database sums each
+        chunk per (user, day), Python spreads those totals over weeks and
+        categories.
+        """
+        S = self.Selection
+        totals_query = select(user_column.label("user_id"), day_column.label("day"),
+                              func.count().label("rows"), *[agg.label(c) for c, agg in counters.items()]) \
+            .where(day_column.isnot(None)).group_by(user_column, day_column)
+        done = 0
+        for start in range(0, last_id, chunk_size):
+            with self.db.engine.begin() as conn:
+                days = conn.execute(totals_query.where(
+                    id_column > start, id_column <= min(start + chunk_size, last_id))).all()
+                if not days:
+                    continue
+                selected = {}
+                for user_id, category in conn.execute(select(S.user_id, S.category).distinct()
+                                                      .where(S.user_id.in_({d.user_id for d in days}))):
+                    selected.setdefault(user_id, []).append(category)
+
+                # one upserted row per (subject, period) the chunk touches
+                totals = {}
+                for d in days:
+                    counts = {c: d._mapping[c] or 0 for c in counters}
+                    for row in self._rows(d.user_id, selected.get(d.user_id, ()), d.day, **counts):
+                        key = (row["scope"], row["subject"], row["period"], row["period_start"])
+                        total = totals.setdefault(key, dict.fromkeys(COUNTERS, 0))
+                        for c in counters:
+                            total[c] += row[c]
+                conn.execute(self._add_stmt, [
+                    dict(zip(("scope", "subject", "period", "period_start"), key), **total)
+                    for key, total in sorted(totals.items())])
+                done += sum(d.rows for d in days)
+        return done
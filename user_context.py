@@ -0,0 +1,115 @@
+# user_context.py
+#
+# Cached, read-only snapshot of everything the dashboard, chat and
+# affirmation routes need about a user: the Userdb row, their Lifestyle row
+# and their UserCategorySelection rows, loaded with a single joined query.
+#
+# Snapshots are plain objects (not ORM instances), so they are safe to keep
+# across requests. Routes that write user data call invalidate() so the next
+# read reloads; the TTL bounds staleness between Gunicorn workers.
+
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+_versions = itertools.count(1)
+
+
+def snapshot(row):
+    """Copies the column values of an ORM row into a plain attribute object."""
+    if row is None:
+        return None
+    return SimpleNamespace(**{c.key: getattr(row, c.key) for c in row.__table__.columns})
+
+
+class UserContext:
+    """Immutable view of one user's data plus memoized prompts built from it."""
+
+    def __init__(self, user, lifestyle, categories):
+        self.user = snapshot(user)
+        self.lifestyle = snapshot(lifestyle)
+        self.categories = tuple(snapshot(c) for c in categories)
+        self.version = next(_versions)
+        self._memo = {}
+
+    @property
+    def user_id(self):
+        return self.user.id
+
+    @property
+    def email(self):
+        return self.user.email
+
+    def memo(self, key, build):
+        """Returns build(self) once per snapshot (e.g. rendered prompt text)."""
+        if key not in self._memo:
+            self._memo[key] = build(self)
+        return self._memo[key]
+
+
+class UserContextCache:
+    """Email -> UserContext cache with TTL, size bound and per-user invalidation.
+
+    `loader(email)` returns (user, lifestyle, categories) or None.
+    """
+
+    def __init__(self, loader, ttl=300, max_entries=5000):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # email -> (context, loaded_at)
+        self._emails = {}   # user id -> email, so writes keyed by id can invalidate
+        self._lock = threading.Lock()
+
+    def _cached(self, email, now):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None and now - entry[1] <= self.ttl:
+                return entry[0]
+        return None
+
+    def get(self, email):
+        now = time.monotonic()
+        context = self._cached(email, now)
+        if context is not None:
+            return context
+        return self._store(email, self.loader(email), now)
+
+    async def aget(self, email, loader):
+        """Async get(): `loader(email)` is a coroutine function (used by the ASGI routes)."""
+        now = time.monotonic()
+        context = self._cached(email, now)
+        if context is not None:
+            return context
+        return self._store(email, await loader(email), now)
+
+    def _store(self, email, loaded, now):
+        if loaded is None:
+            return None
+        context = UserContext(*loaded)
+
+        with self._lock:
+            if email not in self._entries and len(self._entries) >= self.max_entries:
+                # drop the oldest load; dict order is insertion order
+                old_email, (old_ctx, _) = next(iter(self._entries.items()))
+                del self._entries[old_email]
+                self._emails.pop(old_ctx.user_id, None)
+            self._entries[email] = (context, now)
+            self._emails[context.user_id] = email
+        return context
+
+    def email_for(self, user_id):
+        return self._emails.get(user_id)
+
+    def invalidate(self, email):
+        with self._lock:
+            entry = self._entries.pop(email, None)
+            if entry is not None:
+                self._emails.pop(entry[0].user_id, None)
+
+    def invalidate_user(self, user_id):
+        email = self.email_for(user_id)
+        if email is not None:
+            self.invalidate(email)
+        return email